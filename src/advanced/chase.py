@@ -0,0 +1,301 @@
+import math
+import time
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logger import bot_logger
+from limit_orders import LimitOrderManager
+from config import Config
+from rate_limiter import order_rate_limiter
+from order_records import StrategyArchive
+
+# Limit-order chasing - keep a passive order at the top of the book.
+# Cancel/replace costs two round-trips, loses queue position and burns twice the order count,
+# so we amend the resting order in place (PUT /fapi/v1/order) instead.
+# Every chased order lives on one asyncio loop: book updates come in from the market stream,
+# amends go out through a small thread pool, and a debounce stops us chasing every flicker.
+
+# Order is gone - filled or cancelled before our amend got there
+ORDER_GONE_CODES = (-2011, -2013)
+# Amend to the price it already has
+NO_CHANGE_CODE = -5027
+
+
+class ChaseOrderManager:
+    def __init__(self, client: Client, limit_orders: LimitOrderManager):
+        self.client = client
+        self.limit_orders = limit_orders  # Places the first order - same validation, risk and tracking
+        self.validator = limit_orders.validator
+        self.position_book = limit_orders.position_book
+        self.market_stream = None  # Best bid/ask feed - attach before chasing
+        self.active_chases = {}
+        self.archive = StrategyArchive()
+        self.books = {}  # symbol -> (best bid, best ask)
+        self._by_symbol = defaultdict(dict)  # symbol -> {chase_id: info}
+        self._by_order = {}  # order id -> chase_id, for user stream updates
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._executor = ThreadPoolExecutor(max_workers=Config.CHASE_WORKERS, thread_name_prefix='chase')
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._loop.run_forever, name='chase-loop')
+            thread.daemon = True
+            thread.start()
+
+    def attach_market_stream(self, stream):
+        self.market_stream = stream
+        for symbol in self._by_symbol:
+            stream.subscribe(symbol, 'bookTicker', self.on_book_ticker)
+
+    def attach_user_stream(self, user_stream):
+        """Stop chasing as soon as the exchange says an order is done - no polling"""
+        user_stream.subscribe('ORDER_TRADE_UPDATE', self.on_order_update)
+
+    def chase_limit_order(self, symbol: str, side: str, quantity: float, offset_ticks: int = None,
+                          max_reprices: int = None, debounce: float = None) -> dict:
+        """
+        Start a chased limit order - it is placed on the first book update and then
+        follows the best bid (BUY) or best ask (SELL), offset_ticks behind it.
+        """
+        try:
+            symbol, side = symbol.upper(), side.upper()
+            offset_ticks = Config.CHASE_OFFSET_TICKS if offset_ticks is None else offset_ticks
+            max_reprices = Config.CHASE_MAX_REPRICES if max_reprices is None else max_reprices
+            debounce = Config.CHASE_DEBOUNCE if debounce is None else debounce
+
+            is_valid, errors = self.validator.validate_order(symbol, side, 'LIMIT', quantity)
+            if offset_ticks < 0 or max_reprices < 0 or debounce < 0:
+                errors.append("offset, max reprices and debounce must not be negative")
+            if errors:
+                error_msg = f"Chase validation failed: {', '.join(errors)}"
+                bot_logger.log_error(error_msg)
+                return {'success': False, 'error': error_msg}
+            if self.market_stream is None:
+                return {'success': False, 'error': "Chasing needs a market stream for best bid/ask"}
+
+            self._ensure_loop()
+            chase_id = f"{symbol}_CHASE_{int(time.time())}_{next(self._ids)}"
+            info = {
+                'symbol': symbol,
+                'side': side,
+                'quantity': quantity,
+                'offset_ticks': offset_ticks,
+                'tick_size': self.validator.tick_size(symbol) or Config.CHASE_FALLBACK_TICK_SIZE,
+                'max_reprices': max_reprices,
+                'debounce': debounce,
+                'order_id': None,
+                'price': None,
+                'reprices': 0,
+                'errors': 0,  # Consecutive failed amends - the chase gives up at CHASE_MAX_ERRORS
+                'start_time': time.time(),
+                'last_amend': 0.0,  # Loop time of the last place/amend
+                'busy': False,  # An API call for this order is in flight
+                'timer': None,  # Debounced reprice waiting to fire
+                'status': 'WAITING'  # Placed on the first book update
+            }
+            self.active_chases[chase_id] = info
+
+            is_new_symbol = symbol not in self._by_symbol
+            self._loop.call_soon_threadsafe(self._by_symbol[symbol].__setitem__, chase_id, info)
+            if is_new_symbol:
+                self.market_stream.subscribe(symbol, 'bookTicker', self.on_book_ticker)
+            if symbol in self.books:
+                # Already have a book for this symbol - no need to wait for the next tick
+                self._loop.call_soon_threadsafe(self._maybe_reprice, chase_id, info)
+
+            bot_logger.log_order('CHASE_START', symbol, quantity,
+                               f"Offset:{offset_ticks} ticks, Max reprices:{max_reprices}", 'STARTING')
+            return {
+                'success': True,
+                'chase_id': chase_id,
+                'symbol': symbol,
+                'side': side,
+                'quantity': quantity,
+                'offset_ticks': offset_ticks,
+                'max_reprices': max_reprices,
+                'debounce': debounce,
+                'type': 'CHASE'
+            }
+
+        except Exception as e:
+            error_msg = "Failed to start chase order"
+            bot_logger.log_error(error_msg, e)
+            return {'success': False, 'error': error_msg}
+
+    # --- event loop side ---------------------------------------------------
+
+    def on_book_ticker(self, symbol: str, data: dict):
+        """Market stream callback - hands the update over to the chase loop"""
+        self._loop.call_soon_threadsafe(self._on_book, symbol, float(data['b']), float(data['a']))
+
+    def _on_book(self, symbol: str, bid: float, ask: float):
+        self.books[symbol] = (bid, ask)
+        for chase_id, info in list(self._by_symbol.get(symbol, {}).items()):
+            self._maybe_reprice(chase_id, info)
+
+    def target_price(self, info: dict, bid: float, ask: float) -> float:
+        """Best bid minus the offset for buys, best ask plus the offset for sells - rounded away from the touch"""
+        tick = info['tick_size']
+        if info['side'] == 'BUY':
+            price = math.floor(round(bid / tick, 6)) * tick - info['offset_ticks'] * tick
+        else:
+            price = math.ceil(round(ask / tick, 6)) * tick + info['offset_ticks'] * tick
+        return round(price, 8)
+
+    def _maybe_reprice(self, chase_id: str, info: dict):
+        if info['busy'] or info['status'] not in ('WAITING', 'ACTIVE') or info['symbol'] not in self.books:
+            return  # Anything in flight re-checks the book when it completes
+        target = self.target_price(info, *self.books[info['symbol']])
+        if target == info['price'] or target <= 0:
+            return
+
+        if info['status'] == 'ACTIVE':
+            if info['reprices'] >= info['max_reprices']:
+                self._finish(chase_id, 'MAX_REPRICES')
+                return
+            wait = info['last_amend'] + info['debounce'] - self._loop.time()
+            if wait > 0:
+                if info['timer'] is None:
+                    info['timer'] = self._loop.call_later(wait, self._debounced, chase_id, info)
+                return
+
+        info['busy'] = True
+        self._loop.create_task(self._submit(chase_id, info, target))
+
+    def _debounced(self, chase_id: str, info: dict):
+        info['timer'] = None
+        self._maybe_reprice(chase_id, info)
+
+    async def _submit(self, chase_id: str, info: dict, price: float):
+        send = self._place if info['status'] == 'WAITING' else self._amend
+        try:
+            status = await self._loop.run_in_executor(self._executor, send, info, price)
+        except Exception as e:
+            bot_logger.log_error(f"Chase {chase_id} call failed", e)
+            info['error'] = str(e)
+            status = 'ERROR'
+        info['busy'] = False
+        info['last_amend'] = self._loop.time()
+
+        # A persistent error (bad tick, no margin) would otherwise be retried at the debounce rate forever
+        info['errors'] = info['errors'] + 1 if status == 'ERROR' else 0
+        if info['errors'] >= Config.CHASE_MAX_ERRORS:
+            status = 'FAILED'
+
+        if status in ('FAILED', 'GONE'):
+            self._finish(chase_id, status)
+        elif status == 'PLACED':
+            info['status'] = 'ACTIVE'
+            self._by_order[info['order_id']] = chase_id
+        elif status == 'AMENDED':
+            info['reprices'] += 1
+        # The book may have moved while we were waiting on the API
+        self._maybe_reprice(chase_id, info)
+
+    def _finish(self, chase_id: str, status: str):
+        info = self.active_chases.pop(chase_id, None)
+        if info is None:
+            return
+        if info['timer'] is not None:
+            info['timer'].cancel()
+            info['timer'] = None
+        info['status'] = status
+        info['end_time'] = time.time()
+        self._by_symbol[info['symbol']].pop(chase_id, None)
+        self._by_order.pop(info['order_id'], None)
+        self.archive.add(chase_id, info)
+        bot_logger.log_order('CHASE_COMPLETE', info['symbol'], info['quantity'],
+                           f"{info['price']} after {info['reprices']} reprices", status)
+
+    # --- executor side (blocking REST calls) -------------------------------
+
+    def _place(self, info: dict, price: float) -> str:
+        order_rate_limiter.acquire()
+        result = self.limit_orders.place_limit_order(info['symbol'], info['side'], info['quantity'], price)
+        if not result['success']:
+            info['error'] = result['error']
+            return 'FAILED'
+        info['order_id'] = result['order_id']
+        info['price'] = price
+        return 'PLACED'
+
+    def _amend(self, info: dict, price: float) -> str:
+        """Modify the resting order in place - keeps the order id, one request instead of two"""
+        order_rate_limiter.acquire()
+        if self.client is not None:
+            try:
+                # python-binance has no wrapper for the futures modify endpoint
+                self.client._request_futures_api('put', 'order', True, data={
+                    'symbol': info['symbol'],
+                    'orderId': info['order_id'],
+                    'side': info['side'],
+                    'quantity': info['quantity'],
+                    'price': price
+                })
+            except BinanceAPIException as e:
+                if e.code in ORDER_GONE_CODES:
+                    return 'GONE'
+                if e.code == NO_CHANGE_CODE:
+                    info['price'] = price  # Already resting there - not a reprice
+                    return 'UNCHANGED'
+                bot_logger.log_error(f"Failed to amend order {info['order_id']}: {e.message}", e)
+                info['error'] = e.message
+                return 'ERROR'
+
+        if self.position_book is not None:
+            self.position_book.track_order(info['symbol'], info['order_id'], info['side'], info['quantity'], price)
+        info['price'] = price
+        bot_logger.log_order('CHASE_AMEND', info['symbol'], info['quantity'], price,
+                           'AMENDED (DEMO)' if self.client is None else 'AMENDED')
+        return 'AMENDED'
+
+    # --- control -----------------------------------------------------------
+
+    def on_order_update(self, msg: dict):
+        """User stream callback - a fill or cancel ends the chase"""
+        o = msg['o']
+        if o['X'] in ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'):
+            chase_id = self._by_order.get(o['i'])
+            if chase_id is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(self._finish, chase_id, o['X'])
+
+    def cancel_chase(self, chase_id: str, cancel_order: bool = True) -> dict:
+        """Stop chasing - and cancel the resting order unless cancel_order is False"""
+        info = self.active_chases.get(chase_id)
+        if info is None:
+            return {'success': False, 'error': 'Chase ID not found'}
+
+        status = 'STOPPED'
+        if cancel_order and info['order_id'] is not None:
+            if self.client is not None:
+                result = self.limit_orders.cancel_order(info['symbol'], info['order_id'])
+                if not result['success']:
+                    return result
+            elif self.position_book is not None:
+                self.position_book.untrack_order(info['symbol'], info['order_id'])
+            status = 'CANCELLED'
+
+        asyncio.run_coroutine_threadsafe(self._finish_async(chase_id, status), self._loop).result()
+        bot_logger.logger.info(f"CHASE_{status}: {chase_id}")
+        return {'success': True, 'chase_id': chase_id, 'order_id': info['order_id'], 'status': status}
+
+    async def _finish_async(self, chase_id: str, status: str):
+        self._finish(chase_id, status)
+
+    def get_chase_status(self, chase_id: str) -> dict:
+        info = self.active_chases.get(chase_id) or self.archive.get(chase_id)
+        if info is None:
+            return {'success': False, 'error': 'Chase ID not found'}
+        return {'success': True, 'chase_info': info}
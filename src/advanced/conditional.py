@@ -0,0 +1,458 @@
+import time
+import bisect
+import itertools
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from logger import bot_logger
+from config import Config
+from market_orders import MarketOrderManager
+from limit_orders import LimitOrderManager
+from order_records import StrategyArchive
+from advanced.volume_profile import SliceScheduler
+
+# Client-side conditional orders - trailing stops, price-cross and time triggers.
+# The exchange only knows a fixed stopPrice on the same symbol; these live here instead.
+# Triggers sit in per-symbol sorted indexes keyed so that the ones a price crosses are
+# always a suffix: one bisect finds them, one slice removes them. A tick costs
+# O(log n + fired), however many thousands of triggers are armed.
+
+
+class Trigger:
+    __slots__ = ('trigger_id', 'kind', 'watch_symbol', 'symbol', 'side', 'quantity', 'order_type',
+                 'limit_price', 'level', 'callback_rate', 'bucket', 'status', 'armed_at', 'fired_at',
+                 'fire_price', 'order_id', 'error')
+
+    def __init__(self, trigger_id, kind, watch_symbol, symbol, side, quantity, limit_price=None,
+                 level=None, callback_rate=None):
+        self.trigger_id = trigger_id
+        self.kind = kind  # ABOVE, BELOW, TRAILING or TIME
+        self.watch_symbol = watch_symbol  # Price that arms it - may differ from the symbol traded
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.order_type = 'MARKET' if limit_price is None else 'LIMIT'
+        self.limit_price = limit_price
+        self.level = level  # Cross price, or due timestamp for TIME
+        self.callback_rate = callback_rate
+        self.bucket = None  # Trailing stops: shared extreme-price bucket
+        self.status = 'ARMED'
+        self.armed_at = time.time()
+        self.fired_at = None
+        self.fire_price = None
+        self.order_id = None
+        self.error = None
+
+    @property
+    def stop_price(self) -> float:
+        """Current trigger level - for trailing stops this moves with the market"""
+        if self.kind != 'TRAILING':
+            return self.level
+        if self.bucket is None:
+            return None
+        return self.bucket.stop_price()
+
+    def to_dict(self) -> dict:
+        info = {name: getattr(self, name) for name in self.__slots__ if name != 'bucket'}
+        info['stop_price'] = self.stop_price
+        return info
+
+
+class _CrossIndex:
+    """
+    Price-cross triggers for one symbol and direction. Keys are sign * level, with the sign
+    chosen so a price crossing a level means key >= sign * price - crossed triggers are a suffix.
+    """
+
+    def __init__(self, sign: int):
+        self.sign = sign  # -1 fires at or above the level, +1 at or below
+        self.keys = []
+        self.triggers = []
+        self.cancelled = 0  # Cancelled triggers still in the lists - dropped when crossed or by compact()
+
+    def add(self, trigger: Trigger):
+        key = self.sign * trigger.level
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.triggers.insert(i, trigger)
+
+    def crossed(self, price: float) -> list:
+        i = bisect.bisect_left(self.keys, self.sign * price)
+        if i == len(self.keys):
+            return []
+        fired = self.triggers[i:]
+        del self.keys[i:]
+        del self.triggers[i:]
+        self.cancelled -= sum(1 for t in fired if t.status == 'CANCELLED')
+        return fired
+
+    def compact(self):
+        keep = [i for i, t in enumerate(self.triggers) if t.status != 'CANCELLED']
+        self.keys = [self.keys[i] for i in keep]
+        self.triggers = [self.triggers[i] for i in keep]
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class _Bucket:
+    """Trailing stops that share an extreme price - merged buckets point at the survivor"""
+    __slots__ = ('key', 'triggers', 'parent', 'owner')
+
+    def __init__(self, key, owner):
+        self.key = key
+        self.triggers = []
+        self.parent = None
+        self.owner = owner
+
+    def root(self):
+        bucket = self
+        while bucket.parent is not None:
+            bucket = bucket.parent
+        return bucket
+
+    def stop_price(self) -> float:
+        root = self.root()
+        return root.owner.sign * root.key * root.owner.divisor
+
+
+class _TrailingClass:
+    """
+    Trailing stops on one symbol with the same side and callback rate. Keys are the extreme
+    price since arming (the peak for SELL stops, the negated trough for BUY stops), so:
+      - a new extreme x collapses every key below x into one bucket - a prefix merge
+      - a stop fires when key >= x / (1 - sign * rate) - a suffix
+    Each stop is merged into a bigger bucket at most O(log n) times, so ticks stay cheap.
+    """
+
+    def __init__(self, sign: int, rate: float):
+        self.sign = sign  # +1 SELL (long stop), -1 BUY (short stop)
+        self.rate = rate
+        self.divisor = 1 - sign * rate
+        self.keys = []
+        self.buckets = []
+        self.start = 0  # keys[:start] are merged-away buckets, dropped in one go by _compact
+        self.count = 0
+        self.cancelled = 0  # Cancelled stops still in buckets - dropped when they fire or by compact()
+
+    def add(self, trigger: Trigger, price: float):
+        key = self.sign * price
+        i = bisect.bisect_left(self.keys, key, self.start)
+        if i < len(self.keys) and self.keys[i] == key:
+            bucket = self.buckets[i]
+        else:
+            bucket = _Bucket(key, self)
+            self.keys.insert(i, key)
+            self.buckets.insert(i, bucket)
+        bucket.triggers.append(trigger)
+        trigger.bucket = bucket
+        self.count += 1
+
+    def on_price(self, price: float) -> list:
+        x = self.sign * price
+        # New extreme for every stop keyed below x
+        j = bisect.bisect_right(self.keys, x, self.start)
+        if j - self.start > 1 or (j - self.start == 1 and self.keys[self.start] != x):
+            merged = self.buckets[self.start:j]
+            survivor = max(merged, key=lambda b: len(b.triggers))
+            for bucket in merged:
+                if bucket is not survivor:
+                    survivor.triggers.extend(bucket.triggers)
+                    bucket.triggers = []
+                    bucket.parent = survivor
+            survivor.key = x
+            # Survivor takes the last merged slot; the rest of the prefix is skipped, not deleted
+            self.keys[j - 1] = x
+            self.buckets[j - 1] = survivor
+            self.buckets[self.start:j - 1] = [None] * (j - 1 - self.start)
+            self.start = j - 1
+            self._compact()
+
+        i = bisect.bisect_left(self.keys, x / self.divisor, self.start)
+        if i == len(self.keys):
+            return []
+        fired = [t for bucket in self.buckets[i:] for t in bucket.triggers]
+        del self.keys[i:]
+        del self.buckets[i:]
+        if i == self.start:
+            self.start = 0
+            self.keys.clear()
+            self.buckets.clear()
+        self.count -= len(fired)
+        self.cancelled -= sum(1 for t in fired if t.status == 'CANCELLED')
+        return fired
+
+    def compact(self):
+        """Drop cancelled stops, and buckets left empty by them"""
+        keys, buckets = [], []
+        for key, bucket in zip(self.keys[self.start:], self.buckets[self.start:]):
+            bucket.triggers = [t for t in bucket.triggers if t.status != 'CANCELLED']
+            if bucket.triggers:
+                keys.append(key)
+                buckets.append(bucket)
+        self.keys, self.buckets, self.start = keys, buckets, 0
+        self.count -= self.cancelled
+        self.cancelled = 0
+
+    def _compact(self):
+        # Deleting from the front is O(n) - only do it once the dead prefix outweighs the live part
+        if self.start > 64 and self.start * 2 > len(self.keys):
+            del self.keys[:self.start]
+            del self.buckets[:self.start]
+            self.start = 0
+
+
+class ConditionalOrderManager:
+    def __init__(self, client: Client, market_orders: MarketOrderManager, limit_orders: LimitOrderManager):
+        self.client = client
+        self.market_orders = market_orders  # Fired triggers go through the normal managers -
+        self.limit_orders = limit_orders    # same validation, risk checks and logging
+        self.validator = market_orders.validator
+        self.market_stream = None
+        self.triggers = {}  # Armed triggers by id
+        self.archive = StrategyArchive()  # Fired and cancelled triggers
+        self.last_price = {}
+        self._watched = set()  # Symbols subscribed on the market stream
+        self._cross = {}  # watch symbol -> (ABOVE index, BELOW index)
+        self._trailing = defaultdict(dict)  # symbol -> {(sign, rate): _TrailingClass}
+        self._unarmed_trailing = defaultdict(list)  # Trailing stops waiting for a first price
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=Config.CONDITIONAL_WORKERS, thread_name_prefix='conditional')
+        self._scheduler = None  # Time triggers - created on first use
+        self.ticks = 0
+        self.fired = 0
+        self.tick_to_submit = deque(maxlen=Config.CONDITIONAL_LATENCY_SAMPLES)  # Tick seen -> order sent
+        self.tick_to_ack = deque(maxlen=Config.CONDITIONAL_LATENCY_SAMPLES)  # Tick seen -> exchange answered
+
+    def attach_market_stream(self, stream):
+        self.market_stream = stream
+        for symbol in self._watched:
+            stream.subscribe(symbol, Config.CONDITIONAL_PRICE_STREAM, self.on_trade)
+
+    def _watch(self, symbol: str):
+        if symbol not in self._watched:
+            self._watched.add(symbol)
+            if self.market_stream is not None:
+                self.market_stream.subscribe(symbol, Config.CONDITIONAL_PRICE_STREAM, self.on_trade)
+
+    def _new_trigger(self, kind: str, watch_symbol: str, symbol: str, side: str, quantity: float,
+                     limit_price: float = None, level: float = None, callback_rate: float = None):
+        """Validate and build a trigger - returns (trigger, error)"""
+        symbol, side, watch_symbol = symbol.upper(), side.upper(), (watch_symbol or symbol).upper()
+        is_valid, errors = self.validator.validate_order(symbol, side, 'MARKET' if limit_price is None else 'LIMIT',
+                                                         quantity, limit_price)
+        if not self.validator.validate_symbol(watch_symbol):
+            errors.append(f"Invalid symbol: {watch_symbol}")
+        if errors:
+            error_msg = f"Conditional order validation failed: {', '.join(errors)}"
+            bot_logger.log_error(error_msg)
+            return None, error_msg
+        trigger_id = f"{symbol}_{kind}_{int(time.time())}_{next(self._ids)}"
+        return Trigger(trigger_id, kind, watch_symbol, symbol, side, quantity, limit_price, level, callback_rate), None
+
+    def _armed(self, trigger: Trigger) -> dict:
+        self.triggers[trigger.trigger_id] = trigger
+        bot_logger.log_order(f"COND_{trigger.kind}", trigger.symbol, trigger.quantity,
+                           f"Watch:{trigger.watch_symbol} Level:{trigger.level or trigger.callback_rate}", 'ARMED')
+        return {
+            'success': True,
+            'trigger_id': trigger.trigger_id,
+            'kind': trigger.kind,
+            'watch_symbol': trigger.watch_symbol,
+            'symbol': trigger.symbol,
+            'side': trigger.side,
+            'quantity': trigger.quantity,
+            'order_type': trigger.order_type,
+            'level': trigger.level,
+            'callback_rate': trigger.callback_rate
+        }
+
+    def add_price_trigger(self, watch_symbol: str, direction: str, level: float, symbol: str, side: str,
+                          quantity: float, limit_price: float = None) -> dict:
+        """Send an order on `symbol` once `watch_symbol` trades at/above (ABOVE) or at/below (BELOW) level"""
+        direction = direction.upper()
+        if direction not in ('ABOVE', 'BELOW') or not level or level <= 0:
+            return {'success': False, 'error': f"Invalid trigger: {direction} {level}"}
+        trigger, error = self._new_trigger(direction, watch_symbol, symbol, side, quantity, limit_price, level)
+        if trigger is None:
+            return {'success': False, 'error': error}
+
+        with self._lock:
+            self._watch(trigger.watch_symbol)
+            above, below = self._cross.setdefault(trigger.watch_symbol, (_CrossIndex(-1), _CrossIndex(1)))
+            (above if direction == 'ABOVE' else below).add(trigger)
+            return self._armed(trigger)
+
+    def add_trailing_stop(self, symbol: str, side: str, quantity: float, callback_rate: float,
+                          limit_price: float = None) -> dict:
+        """
+        Trailing stop - SELL fires callback_rate below the highest price since arming,
+        BUY fires callback_rate above the lowest. Armed from the latest price we've seen.
+        """
+        if not callback_rate or not 0 < callback_rate < 1:
+            return {'success': False, 'error': f"Invalid callback rate: {callback_rate} (must be between 0 and 1)"}
+        trigger, error = self._new_trigger('TRAILING', symbol, symbol, side, quantity, limit_price,
+                                           callback_rate=callback_rate)
+        if trigger is None:
+            return {'success': False, 'error': error}
+
+        with self._lock:
+            self._watch(trigger.symbol)
+            price = self.last_price.get(trigger.symbol)
+            if price is None:
+                self._unarmed_trailing[trigger.symbol].append(trigger)
+            else:
+                self._trailing_class(trigger).add(trigger, price)
+            return self._armed(trigger)
+
+    def add_time_trigger(self, due: float, symbol: str, side: str, quantity: float, limit_price: float = None) -> dict:
+        """Send the order at time.time() >= due"""
+        trigger, error = self._new_trigger('TIME', symbol, symbol, side, quantity, limit_price, due)
+        if trigger is None:
+            return {'success': False, 'error': error}
+        with self._lock:
+            self._watch(trigger.symbol)  # Keeps last_price current for fire_price
+            if self._scheduler is None:
+                self._scheduler = SliceScheduler(Config.CONDITIONAL_WORKERS)
+            self._scheduler.schedule(due, self._fire_time, trigger)
+            return self._armed(trigger)
+
+    def _trailing_class(self, trigger: Trigger) -> _TrailingClass:
+        sign = 1 if trigger.side == 'SELL' else -1
+        classes = self._trailing[trigger.symbol]
+        key = (sign, trigger.callback_rate)
+        if key not in classes:
+            classes[key] = _TrailingClass(sign, trigger.callback_rate)
+        return classes[key]
+
+    def on_trade(self, symbol: str, data: dict):
+        """Market stream callback (aggTrade)"""
+        self.on_price(symbol, float(data['p']), time.perf_counter())
+
+    def on_price(self, symbol: str, price: float, tick_time: float = None) -> int:
+        """Evaluate one price tick - returns how many triggers fired"""
+        tick_time = tick_time or time.perf_counter()
+        with self._lock:
+            self.ticks += 1
+            self.last_price[symbol] = price
+            fired = []
+            indexes = self._cross.get(symbol)
+            if indexes is not None:
+                fired.extend(indexes[0].crossed(price))
+                fired.extend(indexes[1].crossed(price))
+            if symbol in self._unarmed_trailing:
+                for trigger in self._unarmed_trailing.pop(symbol):
+                    self._trailing_class(trigger).add(trigger, price)
+            for trailing in self._trailing.get(symbol, {}).values():
+                if trailing.count:
+                    fired.extend(trailing.on_price(price))
+            # Claimed under the lock, so a cancel either wins outright or sees it already triggered
+            fired = [t for t in fired if self._claim(t)]  # Cancelled ones are dropped lazily right here
+
+        for trigger in fired:
+            self._fire(trigger, price, tick_time)
+        return len(fired)
+
+    def _claim(self, trigger: Trigger) -> bool:
+        """ARMED -> TRIGGERED - call with the lock held"""
+        if trigger.status != 'ARMED':
+            return False
+        trigger.status = 'TRIGGERED'
+        return True
+
+    def _fire_time(self, trigger: Trigger):
+        with self._lock:
+            claimed = self._claim(trigger)
+        if claimed:
+            self._fire(trigger, self.last_price.get(trigger.symbol), time.perf_counter(), inline=True)
+
+    def _fire(self, trigger: Trigger, price: float, tick_time: float, inline: bool = False):
+        trigger.fired_at = time.time()
+        trigger.fire_price = price
+        self.fired += 1
+        if inline:
+            self._submit(trigger, tick_time)
+        else:
+            # Order placement is network-bound - keep it off the stream thread
+            self._executor.submit(self._submit, trigger, tick_time)
+
+    def _submit(self, trigger: Trigger, tick_time: float):
+        try:
+            self.tick_to_submit.append(time.perf_counter() - tick_time)
+            if trigger.order_type == 'MARKET':
+                result = self.market_orders.place_market_order(trigger.symbol, trigger.side, trigger.quantity)
+            else:
+                result = self.limit_orders.place_limit_order(trigger.symbol, trigger.side, trigger.quantity, trigger.limit_price)
+            self.tick_to_ack.append(time.perf_counter() - tick_time)
+
+            if result['success']:
+                trigger.status = 'FILLED' if trigger.order_type == 'MARKET' else 'PLACED'
+                trigger.order_id = result['order_id']
+            else:
+                trigger.status = 'FAILED'
+                trigger.error = result['error']
+            bot_logger.log_order(f"COND_{trigger.kind}", trigger.symbol, trigger.quantity,
+                               f"Fired at {trigger.fire_price}", trigger.status)
+        except Exception as e:
+            trigger.status = 'FAILED'
+            trigger.error = str(e)
+            bot_logger.log_error(f"Conditional order {trigger.trigger_id} failed", e)
+        finally:
+            self._retire(trigger)
+
+    def _retire(self, trigger: Trigger):
+        self.triggers.pop(trigger.trigger_id, None)
+        self.archive.add(trigger.trigger_id, trigger.to_dict())
+
+    def cancel_trigger(self, trigger_id: str) -> dict:
+        """Disarm a trigger - it is skipped if its level is crossed, or dropped when its index is compacted"""
+        with self._lock:
+            trigger = self.triggers.get(trigger_id)
+            if trigger is None or trigger.status != 'ARMED':
+                return {'success': False, 'error': 'Trigger ID not found'}
+            trigger.status = 'CANCELLED'
+            self._forget(trigger)
+        self._retire(trigger)
+        bot_logger.logger.info(f"COND_CANCELLED: {trigger_id}")
+        return {'success': True, 'trigger_id': trigger_id, 'status': 'CANCELLED'}
+
+    def _forget(self, trigger: Trigger):
+        """Count a cancelled trigger against its index, compacting once they make up too much of it"""
+        if trigger.kind in ('ABOVE', 'BELOW'):
+            index = self._cross[trigger.watch_symbol][0 if trigger.kind == 'ABOVE' else 1]
+            size = len(index)
+        elif trigger.kind == 'TRAILING':
+            if trigger.bucket is None:
+                self._unarmed_trailing[trigger.symbol].remove(trigger)
+                return
+            index = trigger.bucket.root().owner
+            size = index.count
+        else:
+            return  # TIME triggers leave the scheduler when due - the status check skips them
+        index.cancelled += 1
+        if index.cancelled > 64 and index.cancelled >= size * Config.CONDITIONAL_COMPACT_SHARE:
+            index.compact()
+
+    def get_trigger_status(self, trigger_id: str) -> dict:
+        trigger = self.triggers.get(trigger_id)
+        info = trigger.to_dict() if trigger is not None else self.archive.get(trigger_id)
+        if info is None:
+            return {'success': False, 'error': 'Trigger ID not found'}
+        return {'success': True, 'trigger_info': info}
+
+    def get_metrics(self) -> dict:
+        """Trigger counts plus tick-to-submit / tick-to-ack latency percentiles in milliseconds"""
+        metrics = {'armed': len(self.triggers), 'fired': self.fired, 'ticks': self.ticks}
+        for name, samples in (('tick_to_submit', self.tick_to_submit), ('tick_to_ack', self.tick_to_ack)):
+            if samples:
+                values = np.fromiter(samples, dtype=np.float64) * 1000
+                metrics[f"{name}_p50_ms"] = float(np.percentile(values, 50))
+                metrics[f"{name}_p99_ms"] = float(np.percentile(values, 99))
+        return metrics
@@ -3,17 +3,77 @@ from binance.exceptions import BinanceAPIException
 import sys
 import os
 import time
+import json
+import random
+import itertools
+import threading
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
+from config import Config
+from rate_limiter import order_rate_limiter
+from order_records import OrderRecord, StrategyArchive
 
 # Grid trading - this is my favorite strategy! Works great in sideways markets
 # Took me a while to get the math right, but it's profitable when tuned properly
+#
+# Recentering moves the ladder instead of rebuilding it. Every level is an integer offset n from
+# the original base price (price = base + n * step), so the new ladder is just a shifted range of
+# offsets: levels in both ladders stay put, stale ones are amended onto new ones, and only the
+# rest is created or cancelled - all through the batch endpoints.
+
+# Binance caps on the batch endpoints
+BATCH_CANCEL_SIZE = 10
+# Order is gone - filled or cancelled before our amend/cancel got there
+ORDER_GONE_CODES = (-2011, -2013)
 class GridOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk - stops a big grid from eating all the margin
         self.active_grids = {}  # Track multiple grids - learned this from experience
+        self.archive = StrategyArchive()  # Stopped grids
+        self._ids = itertools.count(1)  # Grids started within the same second still get distinct ids
+        self.market_stream = None  # Trade prices drive automatic recentering
+        self._watched = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='grid')  # Recenters run off the stream thread
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def build_grid_levels(base_price: float, grid_levels: int, grid_spread: float, order_quantity: float) -> tuple:
+        """Calculate the grid ladder - shared with the backtester so it simulates exactly what we place"""
+        # Calculate grid prices - this math took me a few iterations to get right
+        buy_orders = []  # Orders below current price
+        sell_orders = []  # Orders above current price
+        
+        for i in range(1, grid_levels + 1):
+            # Buy orders: place them below base price to catch dips
+            buy_price = base_price * (1 - grid_spread * i)
+            # Sell orders: place them above base price to catch pumps
+            sell_price = base_price * (1 + grid_spread * i)
+            
+            # Round to 8 decimals - Binance precision requirement
+            buy_orders.append({'price': round(buy_price, 8), 'quantity': order_quantity, 'side': 'BUY'})
+            sell_orders.append({'price': round(sell_price, 8), 'quantity': order_quantity, 'side': 'SELL'})
+        
+        return buy_orders, sell_orders
+    
+    def _risk_allows(self, symbol: str, order_info: dict) -> bool:
+        """Each level is checked on its own, so the grid just stops growing when a limit is hit"""
+        if self.position_book is None:
+            return True
+        return self.position_book.check_order(symbol, order_info['side'], order_info['quantity'],
+                                              order_info['price'], resting=True)[0]
+    
+    def _track(self, symbol: str, order: dict, order_info: dict) -> OrderRecord:
+        if self.position_book is not None:
+            self.position_book.track_order(symbol, order['orderId'], order_info['side'],
+                                           order_info['quantity'], order_info['price'])
+        return OrderRecord.from_response(order, symbol.upper(), order_info['side'], 'LIMIT',
+                                         order_info['quantity'], order_info['price'])
     
     def start_grid_trading(self, symbol: str, base_price: float, grid_levels: int = 10, 
                           grid_spread: float = 0.01, order_quantity: float = 0.01) -> dict:
@@ -28,34 +88,30 @@ class GridOrderManager:
             if not is_valid:
                 return {'success': False, 'error': f"Grid validation failed: {', '.join(errors)}"}
             
-            # Calculate grid prices - this math took me a few iterations to get right
-            buy_orders = []  # Orders below current price
-            sell_orders = []  # Orders above current price
+            buy_orders, sell_orders = self.build_grid_levels(base_price, grid_levels, grid_spread, order_quantity)
             
-            for i in range(1, grid_levels + 1):
-                # Buy orders: place them below base price to catch dips
-                buy_price = base_price * (1 - grid_spread * i)
-                # Sell orders: place them above base price to catch pumps
-                sell_price = base_price * (1 + grid_spread * i)
-                
-                # Round to 8 decimals - Binance precision requirement
-                buy_orders.append({'price': round(buy_price, 8), 'quantity': order_quantity, 'side': 'BUY'})
-                sell_orders.append({'price': round(sell_price, 8), 'quantity': order_quantity, 'side': 'SELL'})
-            
-            grid_id = f"{symbol}_GRID_{int(time.time())}"
+            seq = next(self._ids)
+            grid_id = f"{symbol}_GRID_{int(time.time())}_{seq}"
+            tag = f"G{int(time.time())}_{seq}"  # clientOrderId prefix - finds our levels among the open orders
+            for i, order_info in enumerate(buy_orders + sell_orders):
+                n = -(i + 1) if i < grid_levels else i - grid_levels + 1
+                order_info['client_id'] = self._client_id(tag, n, 0)
             
             # Demo mode
             if self.client is None:
                 placed_orders = []
                 for order_info in buy_orders + sell_orders:
-                    import random
+                    if not self._risk_allows(symbol, order_info):
+                        continue
                     demo_order = {'orderId': random.randint(10000000, 99999999)}
-                    placed_orders.append(demo_order)
+                    placed_orders.append(self._track(symbol, demo_order, order_info))
                     bot_logger.log_order('GRID_ORDER', symbol, order_info['quantity'], order_info['price'], 'PLACED (DEMO)')
             else:
                 # Place initial orders
                 placed_orders = []
                 for order_info in buy_orders + sell_orders:
+                    if not self._risk_allows(symbol, order_info):
+                        continue
                     try:
                         order = self.client.futures_create_order(
                             symbol=symbol.upper(),
@@ -63,13 +119,33 @@ class GridOrderManager:
                             type='LIMIT',
                             quantity=order_info['quantity'],
                             price=order_info['price'],
-                            timeInForce='GTC'
+                            timeInForce='GTC',
+                            newClientOrderId=order_info['client_id']
                         )
-                        placed_orders.append(order)
+                        placed_orders.append(self._track(symbol, order, order_info))
                         bot_logger.log_order('GRID_ORDER', symbol, order_info['quantity'], order_info['price'], 'PLACED')
                     except Exception as e:
                         continue
             
+            self.active_grids[grid_id] = {
+                'symbol': symbol.upper(),
+                'base_price': base_price,
+                'grid_levels': grid_levels,
+                'grid_spread': grid_spread,
+                'order_quantity': order_quantity,
+                'start_time': time.time(),
+                'orders': placed_orders,  # One compact record per resting level
+                'status': 'ACTIVE',
+                'tag': tag,
+                'step': base_price * grid_spread,  # Fixed price gap between levels - recentering keeps it
+                'center': 0,  # Offset of the current center level from base_price
+                'generation': 0,  # Bumped per recenter so clientOrderIds never repeat
+                'recenters': 0,
+                'recenter_band': None,  # Offsets price may travel before an automatic recenter (None = manual only)
+                'busy': False,
+                'last_recenter': 0.0
+            }
+            
             # Log the grid setup - helps me track performance later
             bot_logger.log_order('GRID_START', symbol, order_quantity, f"Levels:{grid_levels}, Spread:{grid_spread*100}%", 'STARTED')
             
@@ -86,4 +162,281 @@ class GridOrderManager:
             
         except Exception as e:
             bot_logger.log_error("Failed to start grid trading", e)
-            return {'success': False, 'error': str(e)}
\ No newline at end of file
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def _client_id(tag: str, n: int, generation: int) -> str:
+        return f"{tag}_{'B' if n < 0 else 'S'}{abs(n)}_{generation}"
+
+    @staticmethod
+    def build_ladder(base_price: float, step: float, center: int, grid_levels: int, order_quantity: float) -> dict:
+        """Target ladder around a center offset - {offset: order_info}, buys below the center, sells above"""
+        return {n: {'price': round(base_price + n * step, 8), 'quantity': order_quantity,
+                    'side': 'BUY' if n < center else 'SELL'}
+                for n in range(center - grid_levels, center + grid_levels + 1) if n != center}
+
+    @staticmethod
+    def diff_ladder(live: dict, target: dict, center: int) -> dict:
+        """
+        Plan the move from live levels ({offset: side}) to the target ladder - pure, no API calls.
+        Stale levels are paired with missing ones on the same side (farthest stale onto nearest
+        missing) and amended, so most of a shifted ladder costs one request per moved level.
+        """
+        flips = sorted(n for n, side in live.items() if n in target and target[n]['side'] != side)
+        stale = [n for n in live if n not in target]
+        missing = sorted((n for n in target if live.get(n) != target[n]['side']), key=lambda n: abs(n - center))
+        amends, creates, cancels = [], [], []
+        for side in ('BUY', 'SELL'):
+            old = sorted((n for n in stale if live[n] == side), key=lambda n: -abs(n - center))
+            new = [n for n in missing if target[n]['side'] == side]
+            amends += list(zip(old, new))
+            creates += new[len(old):]
+            cancels += old[len(new):]
+        return {
+            'flips': flips,  # Cancelled first - a fresh level on the other side would cross them
+            'amends': amends,  # (from offset, to offset)
+            'creates': sorted(creates, key=lambda n: abs(n - center)),  # Nearest the price first
+            'cancels': cancels,  # Last, once the new levels are resting
+            'kept': len(live) - len(flips) - len(stale)
+        }
+
+    def _offset(self, grid: dict, price: float) -> int:
+        return round((price - grid['base_price']) / grid['step'])
+
+    def _live_levels(self, grid: dict) -> dict:
+        """{offset: record} of levels still resting - open orders are the truth, fills drop out here"""
+        records = list(grid['orders'])
+        if self.client is not None:
+            resting = {o['orderId'] for o in self.client.futures_get_open_orders(symbol=grid['symbol'])
+                       if o.get('clientOrderId', '').startswith(grid['tag'] + '_')}
+            for record in records:
+                if record.order_id not in resting and self.position_book is not None:
+                    self.position_book.untrack_order(grid['symbol'], record.order_id)
+            records = [r for r in records if r.order_id in resting]
+        return {self._offset(grid, r.price): r for r in records}
+
+    def recenter_grid(self, grid_id: str, price: float) -> dict:
+        """
+        Move a grid's center to the level nearest `price`, touching only the levels that change.
+        Sequence keeps the book covered: flipped levels are cancelled, stale levels amended onto
+        new ones (nearest the price first), the rest created, and leftovers cancelled at the end.
+        """
+        grid = self.active_grids.get(grid_id)
+        if grid is None:
+            return {'success': False, 'error': 'Grid ID not found'}
+        with self._lock:
+            if grid['busy']:
+                return {'success': False, 'error': 'Grid is already recentering'}
+            grid['busy'] = True
+        
+        try:
+            symbol = grid['symbol']
+            center = self._offset(grid, price)
+            live = self._live_levels(grid)
+            target = self.build_ladder(grid['base_price'], grid['step'], center, grid['grid_levels'], grid['order_quantity'])
+            plan = self.diff_ladder({n: r.side for n, r in live.items()}, target, center)
+            generation = grid['generation'] + 1
+            
+            flips = [live.pop(n) for n in plan['flips']]
+            cancelled = self._cancel_levels(grid, flips)
+            for record in flips[cancelled:]:
+                live[self._offset(grid, record.price)] = record  # Still resting - its level can't take the other side yet
+            
+            amended, gone, unchanged = self._amend_levels(grid, [(live.pop(old), n, target[n]) for old, n in plan['amends']])
+            live.update(amended)
+            for record in unchanged:
+                live[self._offset(grid, record.price)] = record
+            
+            creates = [n for n in plan['creates'] + sorted(gone, key=lambda n: abs(n - center)) if n not in live]
+            for n in creates:
+                target[n]['client_id'] = self._client_id(grid['tag'], n, generation)
+            created = self._create_levels(grid, [(n, target[n]) for n in creates])
+            live.update(created)
+            
+            leftovers = [live.pop(n) for n in plan['cancels']]
+            removed = self._cancel_levels(grid, leftovers)
+            for record in leftovers[removed:]:
+                live[self._offset(grid, record.price)] = record
+            failed = len(flips) - cancelled + len(unchanged) + len(creates) - len(created) + len(leftovers) - removed
+            
+            grid['orders'] = [live[n] for n in sorted(live)]
+            grid['center'] = center
+            grid['generation'] = generation
+            grid['recenters'] += 1
+            grid['last_recenter'] = time.time()
+            changed = len(plan['flips']) + len(plan['amends']) + len(plan['creates']) + len(plan['cancels'])
+            bot_logger.log_order('GRID_RECENTER', symbol, grid['order_quantity'],
+                               f"{round(grid['base_price'] + center * grid['step'], 8)} ({plan['kept']} kept, {changed} changed)",
+                               'RECENTERED (DEMO)' if self.client is None else 'RECENTERED')
+            return {
+                'success': True,
+                'grid_id': grid_id,
+                'center_price': round(grid['base_price'] + center * grid['step'], 8),
+                'kept': plan['kept'],
+                'amended': len(amended),
+                'created': len(created),
+                'cancelled': cancelled + removed,
+                'failed': failed,
+                'total_orders': len(grid['orders'])
+            }
+        
+        except Exception as e:
+            error_msg = f"Failed to recenter grid {grid_id}"
+            bot_logger.log_error(error_msg, e)
+            return {'success': False, 'error': error_msg}
+        finally:
+            grid['busy'] = False
+
+    def _create_levels(self, grid: dict, levels: list) -> dict:
+        """batchOrders in chunks of BATCH_ORDER_SIZE - returns {offset: record} for the ones that rest"""
+        symbol = grid['symbol']
+        levels = [(n, info) for n, info in levels if self._risk_allows(symbol, info)]
+        created = {}
+        for i in range(0, len(levels), Config.BATCH_ORDER_SIZE):
+            chunk = levels[i:i + Config.BATCH_ORDER_SIZE]
+            order_rate_limiter.acquire(len(chunk))
+            if self.client is None:
+                responses = [{'orderId': random.randint(10000000, 99999999)} for _ in chunk]
+            else:
+                try:
+                    # batchOrders wants every value as a string
+                    responses = self.client.futures_place_batch_order(batchOrders=[{
+                        'symbol': symbol, 'side': info['side'], 'type': 'LIMIT', 'timeInForce': 'GTC',
+                        'quantity': str(info['quantity']), 'price': str(info['price']),
+                        'newClientOrderId': info['client_id']} for _, info in chunk])
+                except BinanceAPIException as e:
+                    bot_logger.log_error(f"Failed to place grid levels for {symbol}: {e.message}", e)
+                    continue
+            for (n, info), response in zip(chunk, responses):
+                if 'orderId' not in response:
+                    bot_logger.logger.warning(f"GRID_ORDER: {symbol} {info['side']} @ {info['price']} rejected: {response.get('msg')}")
+                    continue
+                created[n] = self._track(symbol, response, info)
+        return created
+
+    def _amend_levels(self, grid: dict, moves: list) -> tuple:
+        """
+        Batch modify (PUT batchOrders) - moves stale records to new prices in place.
+        Returns ({offset: record} amended, [offsets whose order was already gone], [records left where they were]).
+        """
+        symbol = grid['symbol']
+        amended, gone, unchanged = {}, [], []
+        for i in range(0, len(moves), Config.BATCH_ORDER_SIZE):
+            chunk = moves[i:i + Config.BATCH_ORDER_SIZE]
+            order_rate_limiter.acquire(len(chunk))
+            if self.client is None:
+                responses = [{} for _ in chunk]
+            else:
+                orders = [{'symbol': symbol, 'orderId': str(record.order_id), 'side': record.side,
+                           'quantity': str(record.quantity), 'price': str(info['price'])} for record, _, info in chunk]
+                try:
+                    # python-binance has no wrapper for batch modify - encode it the way futures_place_batch_order does
+                    query = urlencode({'batchOrders': orders}).replace('%27', '%22')
+                    responses = self.client._request_futures_api('put', 'batchOrders', True,
+                                                                 data={'batchOrders': query[12:]})
+                except BinanceAPIException as e:
+                    bot_logger.log_error(f"Failed to amend grid levels for {symbol}: {e.message}", e)
+                    responses = [{'code': e.code, 'msg': e.message}] * len(chunk)
+            for (record, n, info), response in zip(chunk, responses):
+                if response.get('code') in ORDER_GONE_CODES:
+                    if self.position_book is not None:
+                        self.position_book.untrack_order(symbol, record.order_id)
+                    gone.append(n)  # Filled or cancelled under us - the level gets a fresh order instead
+                elif 'code' in response:
+                    bot_logger.logger.warning(f"GRID_ORDER: amend of {record.order_id} failed: {response.get('msg')}")
+                    unchanged.append(record)
+                else:
+                    record.price = info['price']
+                    if self.position_book is not None:
+                        self.position_book.track_order(symbol, record.order_id, record.side, record.quantity, record.price)
+                    amended[n] = record
+        return amended, gone, unchanged
+
+    def _cancel_levels(self, grid: dict, records: list) -> int:
+        """Batch cancel - returns how many of the leading records are gone (cancelled or already filled)"""
+        symbol = grid['symbol']
+        done = 0
+        for i in range(0, len(records), BATCH_CANCEL_SIZE):
+            chunk = records[i:i + BATCH_CANCEL_SIZE]
+            if self.client is not None:
+                try:
+                    responses = self.client.futures_cancel_orders(
+                        symbol=symbol, orderIdList=json.dumps([r.order_id for r in chunk], separators=(',', ':')))
+                except BinanceAPIException as e:
+                    bot_logger.log_error(f"Failed to cancel grid levels for {symbol}: {e.message}", e)
+                    break
+                if any('code' in r and r['code'] not in ORDER_GONE_CODES for r in responses):
+                    break  # Keep the records so the next recenter or stop_grid retries them
+            for record in chunk:
+                record.status = 'CANCELED'
+                if self.position_book is not None:
+                    self.position_book.untrack_order(symbol, record.order_id)
+            done += len(chunk)
+        return done
+
+    # --- automatic recentering ----------------------------------------------
+
+    def enable_auto_recenter(self, grid_id: str, band: float = None) -> dict:
+        """Recenter whenever the trade price drifts `band` levels from the center (default: Config.GRID_RECENTER_BAND)"""
+        grid = self.active_grids.get(grid_id)
+        if grid is None:
+            return {'success': False, 'error': 'Grid ID not found'}
+        grid['recenter_band'] = band or max(1.0, grid['grid_levels'] * Config.GRID_RECENTER_BAND)
+        if grid['symbol'] not in self._watched:
+            self._watched.add(grid['symbol'])
+            if self.market_stream is not None:
+                self.market_stream.subscribe(grid['symbol'], 'aggTrade', self.on_trade)
+        return {'success': True, 'grid_id': grid_id, 'recenter_band': grid['recenter_band']}
+
+    def attach_market_stream(self, stream):
+        self.market_stream = stream
+        for symbol in self._watched:
+            stream.subscribe(symbol, 'aggTrade', self.on_trade)
+
+    def on_trade(self, symbol: str, data: dict):
+        """Market stream callback - a plain comparison per grid, the recenter itself runs on the executor"""
+        price = float(data['p'])
+        now = time.time()
+        for grid_id, grid in list(self.active_grids.items()):
+            if grid['symbol'] != symbol or grid['recenter_band'] is None or grid['busy']:
+                continue
+            drift = abs((price - grid['base_price']) / grid['step'] - grid['center'])
+            if drift >= grid['recenter_band'] and now - grid['last_recenter'] >= Config.GRID_RECENTER_COOLDOWN:
+                grid['last_recenter'] = now
+                self._executor.submit(self.recenter_grid, grid_id, price)
+
+    def stop_grid(self, grid_id: str) -> dict:
+        """Cancel every resting level of a grid and move it to the archive"""
+        grid = self.active_grids.get(grid_id)
+        if grid is None:
+            return {'success': False, 'error': 'Grid ID not found'}
+        
+        order_ids = [record.order_id for record in grid['orders']]
+        failed = 0
+        if self.client is not None:
+            # batch cancel takes up to 10 ids per call
+            for i in range(0, len(order_ids), BATCH_CANCEL_SIZE):
+                chunk = order_ids[i:i + BATCH_CANCEL_SIZE]
+                try:
+                    self.client.futures_cancel_orders(symbol=grid['symbol'],
+                                                      orderIdList=json.dumps(chunk, separators=(',', ':')))
+                except BinanceAPIException as e:
+                    failed += len(chunk)
+                    bot_logger.log_error(f"Failed to cancel grid orders for {grid_id}: {e.message}", e)
+        
+        if self.position_book is not None:
+            for order_id in order_ids:
+                self.position_book.untrack_order(grid['symbol'], order_id)
+        for record in grid['orders']:
+            record.status = 'CANCELED'
+        
+        grid['status'] = 'STOPPED'
+        self.archive.add(grid_id, self.active_grids.pop(grid_id))
+        bot_logger.logger.info(f"GRID_STOPPED: {grid_id} | {len(order_ids) - failed}/{len(order_ids)} orders cancelled")
+        return {'success': True, 'grid_id': grid_id, 'cancelled': len(order_ids) - failed, 'failed': failed}
+    
+    def get_grid_status(self, grid_id: str) -> dict:
+        info = self.active_grids.get(grid_id) or self.archive.get(grid_id)
+        if info is None:
+            return {'success': False, 'error': 'Grid ID not found'}
+        return {'success': True, 'grid_info': info}
@@ -0,0 +1,248 @@
+import math
+import time
+import random
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logger import bot_logger
+from config import Config
+from limit_orders import LimitOrderManager
+from order_records import OrderRecord, StrategyArchive, order_history
+
+# Iceberg orders - work a big passive order while only a small slice shows on the book.
+# Refills are driven by ORDER_TRADE_UPDATE on the user stream: the moment a slice fills,
+# the next one is placed from a small shared pool. No polling, no thread per iceberg.
+
+# Fills can beat our own placement response back - remember that many unmatched updates
+EARLY_UPDATE_MEMORY = 1000
+
+
+class IcebergOrderManager:
+    def __init__(self, client: Client, limit_orders: LimitOrderManager):
+        self.client = client
+        self.limit_orders = limit_orders  # Every slice is a normal limit order - validation, risk, tracking
+        self.validator = limit_orders.validator
+        self.position_book = limit_orders.position_book
+        self.market_stream = None  # Book feed for the price-limit guard
+        self.active_icebergs = {}
+        self.archive = StrategyArchive()
+        self.books = {}  # symbol -> (best bid, best ask)
+        self._by_order = {}  # resting slice order id -> iceberg id
+        self._early = OrderedDict()  # order id -> update that arrived before we knew the id
+        self._book_symbols = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=Config.ICEBERG_WORKERS, thread_name_prefix='iceberg')
+
+    def attach_user_stream(self, user_stream):
+        user_stream.subscribe('ORDER_TRADE_UPDATE', self.on_order_update)
+
+    def attach_market_stream(self, stream):
+        self.market_stream = stream
+        for symbol in self._book_symbols:
+            stream.subscribe(symbol, 'bookTicker', self.on_book_ticker)
+
+    def on_book_ticker(self, symbol: str, data: dict):
+        self.books[symbol] = (float(data['b']), float(data['a']))
+
+    def place_iceberg_order(self, symbol: str, side: str, total_quantity: float, price: float, visible_quantity: float,
+                            variance: float = None, price_limit: float = None) -> dict:
+        """
+        Start an iceberg - `visible_quantity` (+/- variance) rests at `price`, refilled on every fill.
+        With a price_limit and a book feed, refills join the current touch but never go past the limit.
+        """
+        try:
+            symbol, side = symbol.upper(), side.upper()
+            variance = Config.ICEBERG_VARIANCE if variance is None else variance
+
+            is_valid, errors = self.validator.validate_order(symbol, side, 'LIMIT', total_quantity, price)
+            if not Config.MIN_QUANTITY <= visible_quantity <= total_quantity:
+                errors.append(f"Invalid visible quantity: {visible_quantity}")
+            if not 0 <= variance < 1:
+                errors.append(f"Invalid variance: {variance} (must be between 0 and 1)")
+            if price_limit is not None and (price_limit > price if side == 'SELL' else price_limit < price):
+                errors.append(f"Price limit {price_limit} is already worse than the price {price}")
+            if errors:
+                error_msg = f"Iceberg validation failed: {', '.join(errors)}"
+                bot_logger.log_error(error_msg)
+                return {'success': False, 'error': error_msg}
+
+            iceberg_id = f"{symbol}_ICEBERG_{int(time.time())}_{next(self._ids)}"
+            self.active_icebergs[iceberg_id] = {
+                'symbol': symbol,
+                'side': side,
+                'total_quantity': total_quantity,
+                'visible_quantity': visible_quantity,
+                'variance': variance,
+                'price': price,
+                'price_limit': price_limit,
+                'step_size': self.validator.step_size(symbol) or Config.ICEBERG_FALLBACK_STEP_SIZE,
+                'executed_quantity': 0.0,
+                'slices': 0,
+                'slice_order_id': None,  # The one slice resting right now
+                'slice_quantity': 0.0,
+                'slice_price': None,
+                'slice_filled': 0.0,
+                'start_time': time.time(),
+                'orders': order_history(),
+                'status': 'ACTIVE'
+            }
+
+            if price_limit is not None and self.market_stream is not None and symbol not in self._book_symbols:
+                self._book_symbols.add(symbol)
+                self.market_stream.subscribe(symbol, 'bookTicker', self.on_book_ticker)
+
+            bot_logger.log_order('ICEBERG_START', symbol, total_quantity,
+                               f"Visible:{visible_quantity} @ {price}", 'STARTING')
+            self._executor.submit(self._place_next, iceberg_id)
+
+            return {
+                'success': True,
+                'iceberg_id': iceberg_id,
+                'symbol': symbol,
+                'side': side,
+                'total_quantity': total_quantity,
+                'visible_quantity': visible_quantity,
+                'variance': variance,
+                'price': price,
+                'price_limit': price_limit,
+                'type': 'ICEBERG'
+            }
+
+        except Exception as e:
+            error_msg = "Failed to start iceberg order"
+            bot_logger.log_error(error_msg, e)
+            return {'success': False, 'error': error_msg}
+
+    def _slice_size(self, info: dict) -> float:
+        remaining = info['total_quantity'] - info['executed_quantity']
+        size = info['visible_quantity'] * (1 + info['variance'] * random.uniform(-1, 1))
+        step = info['step_size']
+        size = max(math.floor(round(size / step, 6)) * step, Config.MIN_QUANTITY)
+        if remaining - size < Config.MIN_QUANTITY:
+            size = remaining  # Don't leave a dust slice behind
+        return round(min(size, remaining), 8)
+
+    def _slice_price(self, info: dict) -> float:
+        """Fixed price - or the current touch, clamped to the price limit, when we have a book"""
+        book = self.books.get(info['symbol'])
+        if info['price_limit'] is None or book is None:
+            return info['price']
+        if info['side'] == 'BUY':
+            return min(book[0], info['price_limit'])
+        return max(book[1], info['price_limit'])
+
+    def _place_next(self, iceberg_id: str):
+        """Put the next visible slice on the book - runs on the refill pool"""
+        info = self.active_icebergs.get(iceberg_id)
+        if info is None or info['status'] != 'ACTIVE':
+            return
+        quantity = self._slice_size(info)
+        price = self._slice_price(info)
+        result = self.limit_orders.place_limit_order(info['symbol'], info['side'], quantity, price)
+        if not result['success']:
+            info['error'] = result['error']
+            info['status'] = 'FAILED'
+            self._finish(iceberg_id)
+            return
+
+        order_id = result['order_id']
+        with self._lock:
+            info['slice_order_id'] = order_id
+            info['slice_quantity'] = quantity
+            info['slice_price'] = price
+            info['slice_filled'] = 0.0
+            info['slices'] += 1
+            info['orders'].append(OrderRecord.from_response({'orderId': order_id, 'status': result['status']},
+                                                            info['symbol'], info['side'], 'LIMIT', quantity, price))
+            self._by_order[order_id] = iceberg_id
+            early = self._early.pop(order_id, None)
+            cancelled_meanwhile = info['status'] != 'ACTIVE'
+            if cancelled_meanwhile:
+                self._by_order.pop(order_id, None)
+        bot_logger.log_order('ICEBERG_SLICE', info['symbol'], quantity, price, f"Slice {info['slices']}")
+
+        if cancelled_meanwhile:
+            self._cancel_slice(info, order_id)
+        elif early is not None:
+            self.on_order_update(early)
+
+    def on_order_update(self, msg: dict):
+        """User stream callback - a filled slice triggers the next one straight away"""
+        o = msg['o']
+        order_id, status = o['i'], o['X']
+        with self._lock:
+            iceberg_id = self._by_order.get(order_id)
+            if iceberg_id is None:
+                if status in ('PARTIALLY_FILLED', 'FILLED', 'CANCELED', 'EXPIRED'):
+                    self._early[order_id] = msg
+                    while len(self._early) > EARLY_UPDATE_MEMORY:
+                        self._early.popitem(last=False)
+                return
+            info = self.active_icebergs.get(iceberg_id)
+            if info is None:
+                return
+
+            filled = float(o['z'])
+            info['executed_quantity'] += filled - info['slice_filled']
+            info['slice_filled'] = filled
+            if status not in ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'):
+                return
+            self._by_order.pop(order_id, None)
+            info['slice_order_id'] = None
+            info['orders'][-1].status = status
+            info['orders'][-1].executed_qty = filled
+
+            if status == 'FILLED' and info['total_quantity'] - info['executed_quantity'] >= Config.MIN_QUANTITY:
+                refill = info['status'] == 'ACTIVE'
+            else:
+                refill = False
+                if info['status'] == 'ACTIVE':
+                    # Done - or somebody cancelled our slice from outside, which ends the iceberg too
+                    info['status'] = 'COMPLETED' if status == 'FILLED' else 'CANCELLED'
+
+        if refill:
+            self._executor.submit(self._place_next, iceberg_id)
+        else:
+            self._finish(iceberg_id)
+
+    def _cancel_slice(self, info: dict, order_id):
+        if self.client is not None:
+            self.limit_orders.cancel_order(info['symbol'], order_id)
+        elif self.position_book is not None:
+            self.position_book.untrack_order(info['symbol'], order_id)
+
+    def _finish(self, iceberg_id: str):
+        info = self.active_icebergs.pop(iceberg_id, None)
+        if info is None:
+            return
+        info['end_time'] = time.time()
+        self.archive.add(iceberg_id, info)
+        bot_logger.log_order('ICEBERG_COMPLETE', info['symbol'], info['executed_quantity'],
+                           f"{info['slices']} slices", info['status'])
+
+    def cancel_iceberg(self, iceberg_id: str) -> dict:
+        """Stop refilling and pull the resting slice"""
+        with self._lock:
+            info = self.active_icebergs.get(iceberg_id)
+            if info is None:
+                return {'success': False, 'error': 'Iceberg ID not found'}
+            info['status'] = 'CANCELLED'
+            order_id = info['slice_order_id']
+            self._by_order.pop(order_id, None)
+        if order_id is not None:
+            self._cancel_slice(info, order_id)
+        self._finish(iceberg_id)
+        bot_logger.logger.info(f"ICEBERG_CANCELLED: {iceberg_id}")
+        return {'success': True, 'iceberg_id': iceberg_id, 'executed_quantity': info['executed_quantity'], 'status': 'CANCELLED'}
+
+    def get_iceberg_status(self, iceberg_id: str) -> dict:
+        info = self.active_icebergs.get(iceberg_id) or self.archive.get(iceberg_id)
+        if info is None:
+            return {'success': False, 'error': 'Iceberg ID not found'}
+        return {'success': True, 'iceberg_info': info}
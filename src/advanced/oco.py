@@ -5,11 +5,13 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
 
 class OCOOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk checks
     
     def place_oco_order(self, symbol: str, side: str, quantity: float, price: float, stop_price: float, stop_limit_price: float = None) -> dict:
         """
@@ -31,6 +33,12 @@ class OCOOrderManager:
                 bot_logger.log_error(error_msg)
                 return {'success': False, 'error': error_msg}
             
+            # Pre-trade risk - in-process, no API call
+            if self.position_book is not None:
+                risk_ok, risk_errors = self.position_book.check_order(symbol, side, quantity, price, resting=True)
+                if not risk_ok:
+                    return {'success': False, 'error': f"Risk check failed: {', '.join(risk_errors)}"}
+            
             bot_logger.log_order('OCO', symbol, quantity, f"TP:{price}, SL:{stop_price}", 'PLACING')
             
             # Determine OCO parameters
@@ -79,6 +87,8 @@ class OCOOrderManager:
             )
             
             bot_logger.log_order('OCO', symbol, quantity, f"TP:{price}, SL:{stop_price}", 'PLACED')
+            if self.position_book is not None:
+                self.position_book.track_order(symbol, order['orderId'], side, quantity, price)
             
             return {
                 'success': True,
@@ -5,11 +5,13 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
 
 class StopLimitOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk checks
     
     def place_stop_limit_order(self, symbol: str, side: str, quantity: float, stop_price: float, limit_price: float) -> dict:
         """
@@ -23,6 +25,12 @@ class StopLimitOrderManager:
                 bot_logger.log_error(error_msg)
                 return {'success': False, 'error': error_msg}
             
+            # Pre-trade risk - in-process, no API call
+            if self.position_book is not None:
+                risk_ok, risk_errors = self.position_book.check_order(symbol, side, quantity, limit_price, resting=True)
+                if not risk_ok:
+                    return {'success': False, 'error': f"Risk check failed: {', '.join(risk_errors)}"}
+            
             bot_logger.log_order('STOP_LIMIT', symbol, quantity, f"Stop:{stop_price}, Limit:{limit_price}", 'PLACING')
             
             # Demo mode
@@ -55,6 +63,8 @@ class StopLimitOrderManager:
             )
             
             bot_logger.log_order('STOP_LIMIT', symbol, quantity, f"Stop:{stop_price}, Limit:{limit_price}", 'PLACED')
+            if self.position_book is not None:
+                self.position_book.track_order(symbol, order['orderId'], side, quantity, limit_price)
             
             return {
                 'success': True,
@@ -1,4 +1,7 @@
+import math
 import time
+import random
+import itertools
 import threading
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
@@ -7,17 +10,39 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
 from config import Config
+from profiler import profiler
+from order_records import OrderRecord, StrategyArchive, order_history
+from kline_sync import KlineSync
+from advanced.volume_profile import VolumeProfile, SliceScheduler
 
 # TWAP (Time-Weighted Average Price) - great for large orders
 # I use this when I need to buy/sell big amounts without moving the market too much
 class TWAPOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk checks
         self.active_twaps = {}
+        self.archive = StrategyArchive()  # Finished TWAP/VWAP/POV runs - bounded, spills to disk
+        self.volume_profiles = {}  # Per-symbol intraday volume curves for VWAP/POV
+        self.kline_sync = KlineSync(client)  # One syncer for every VWAP/POV start
+        self.market_stream = None  # Live trades keep the volume curves current
+        self.order_books = None  # Local L2 books - slices can be capped to what the book absorbs
+        self._scheduler = None  # Created on first VWAP/POV order
+        self._ids = itertools.count(1)
     
-    def execute_twap_order(self, symbol: str, side: str, total_quantity: float, duration_seconds: int = None, intervals: int = None) -> dict:
+    @staticmethod
+    def build_twap_schedule(total_quantity: float, duration_seconds: float, intervals: int) -> tuple:
+        """Chunk size and spacing - the backtester uses this too so simulations match live runs"""
+        # Calculate order parameters - simple math but crucial to get right
+        chunk_size = total_quantity / intervals  # Size of each individual order
+        interval_delay = duration_seconds / intervals  # Time between orders
+        return chunk_size, interval_delay
+    
+    def execute_twap_order(self, symbol: str, side: str, total_quantity: float, duration_seconds: int = None, intervals: int = None,
+                           max_slippage_bps: float = None) -> dict:
         """
         Execute TWAP - my go-to strategy for large orders
         
@@ -41,15 +66,13 @@ class TWAPOrderManager:
                 bot_logger.log_error(error_msg)
                 return {'success': False, 'error': error_msg}
             
-            # Calculate order parameters - simple math but crucial to get right
-            chunk_size = total_quantity / intervals  # Size of each individual order
-            interval_delay = duration_seconds / intervals  # Time between orders
+            chunk_size, interval_delay = self.build_twap_schedule(total_quantity, duration_seconds, intervals)
             
             bot_logger.log_order('TWAP_START', symbol, total_quantity, 
                                f"Chunks:{intervals}, Duration:{duration_seconds}s", 'STARTING')
             
             # Generate unique TWAP ID - timestamp makes it easy to track
-            twap_id = f"{symbol}_{int(time.time())}"
+            twap_id = f"{symbol}_{int(time.time())}_{next(self._ids)}"
             
             # Store TWAP info - I track everything for later analysis
             self.active_twaps[twap_id] = {
@@ -61,7 +84,8 @@ class TWAPOrderManager:
                 'interval_delay': interval_delay,
                 'executed_chunks': 0,  # Progress tracking
                 'executed_quantity': 0,  # Running total
-                'orders': [],  # All individual orders
+                'max_slippage_bps': max_slippage_bps,  # Slices are cut down to fit, the shortfall rolls into the next one
+                'orders': order_history(),  # Most recent child orders as compact records
                 'status': 'ACTIVE'  # State management
             }
             
@@ -99,45 +123,268 @@ class TWAPOrderManager:
                 if twap_info['status'] != 'ACTIVE':
                     break
                 
-                # Calculate chunk quantity (handle remainder in last chunk)
+                # Size against the schedule, not a fixed chunk - whatever an earlier chunk couldn't do
+                # (thin book, risk block, rejected order) carries into this one, the last one takes the rest
                 if i == twap_info['intervals'] - 1:
                     chunk_qty = twap_info['total_quantity'] - twap_info['executed_quantity']
                 else:
-                    chunk_qty = twap_info['chunk_size']
+                    chunk_qty = (i + 1) * twap_info['chunk_size'] - twap_info['executed_quantity']
                 
                 # Place market order for chunk
                 try:
-                    order = self.client.futures_create_order(
-                        symbol=twap_info['symbol'],
-                        side=twap_info['side'],
-                        type='MARKET',
-                        quantity=chunk_qty
-                    )
-                    
-                    # Update TWAP info
-                    twap_info['executed_chunks'] += 1
-                    twap_info['executed_quantity'] += chunk_qty
-                    twap_info['orders'].append(order)
-                    
-                    bot_logger.log_order('TWAP_CHUNK', twap_info['symbol'], chunk_qty, 
-                                       f"Chunk {i+1}/{twap_info['intervals']}", 'EXECUTED')
-                    
+                    record = self._place_slice(twap_info, chunk_qty)
+                    if record is not None:
+                        bot_logger.log_order('TWAP_CHUNK', twap_info['symbol'], record.executed_qty, 
+                                           f"Chunk {i+1}/{twap_info['intervals']}", 'EXECUTED')
                 except BinanceAPIException as e:
                     bot_logger.log_error(f"TWAP chunk {i+1} failed: {e.message}", e)
-                    continue
                 
-                # Wait for next interval (except for last chunk)
+                # Wait for next interval (except for last chunk) - skipped chunks wait too, for liquidity to come back
                 if i < twap_info['intervals'] - 1:
                     time.sleep(twap_info['interval_delay'])
             
-            # Mark TWAP as completed
-            twap_info['status'] = 'COMPLETED'
+            # Mark TWAP as completed - unless it was cancelled along the way or came up short
+            if twap_info['status'] == 'ACTIVE':
+                remaining = twap_info['total_quantity'] - twap_info['executed_quantity']
+                twap_info['status'] = 'COMPLETED' if remaining < Config.MIN_QUANTITY else 'PARTIAL'
             bot_logger.log_order('TWAP_COMPLETE', twap_info['symbol'], twap_info['executed_quantity'], 
-                               f"Executed {twap_info['executed_chunks']}/{twap_info['intervals']} chunks", 'COMPLETED')
+                               f"Executed {twap_info['executed_chunks']}/{twap_info['intervals']} chunks", twap_info['status'])
             
         except Exception as e:
             twap_info['status'] = 'FAILED'
             bot_logger.log_error(f"TWAP execution failed for {twap_id}", e)
+        
+        self._finish(twap_id)
+    
+    def _finish(self, twap_id: str):
+        """Move a finished run out of active_twaps - status lookups fall through to the archive"""
+        info = self.active_twaps.pop(twap_id, None)
+        if info is not None:
+            self.archive.add(twap_id, info)
+    
+    def _place_slice(self, twap_info: dict, quantity: float) -> OrderRecord:
+        """Send one child market order and book it against its parent - None if risk limits block it"""
+        with profiler.span(f"{twap_info.get('mode', 'TWAP')} slice"):
+            return self._send_slice(twap_info, quantity)
+    
+    def _floor_to_step(self, symbol: str, quantity: float) -> float:
+        """Round down to the symbol's LOT_SIZE step - anything else gets a -1111 precision rejection"""
+        step = self.validator.step_size(symbol)
+        return round(math.floor(round(quantity / step, 6)) * step if step else quantity, 8)
+    
+    def _send_slice(self, twap_info: dict, quantity: float) -> OrderRecord:
+        if twap_info.get('max_slippage_bps') is not None and self.order_books is not None:
+            book = self.order_books.get(twap_info['symbol'])
+            if book is not None:
+                quantity = min(quantity, book.max_quantity(twap_info['side'], twap_info['max_slippage_bps']))
+        quantity = self._floor_to_step(twap_info['symbol'], quantity)
+        if quantity < Config.MIN_QUANTITY:
+            return None  # Too small to send (or the book is too thin) - the caller carries it over
+        
+        if self.position_book is not None:
+            risk_ok, _ = self.position_book.check_order(twap_info['symbol'], twap_info['side'], quantity)
+            if not risk_ok:
+                return None
+        
+        if self.client is None:
+            # Demo mode - same fake IDs as the other managers
+            order = {'orderId': random.randint(10000000, 99999999), 'status': 'FILLED (DEMO)', 'executedQty': quantity}
+        else:
+            order = self.client.futures_create_order(
+                symbol=twap_info['symbol'],
+                side=twap_info['side'],
+                type='MARKET',
+                quantity=quantity,
+                newOrderRespType='RESULT'
+            )
+            if self.position_book is not None:
+                self.position_book.apply_order_update(twap_info['symbol'], order['orderId'], twap_info['side'],
+                                                      float(order.get('executedQty', 0)), float(order.get('avgPrice', 0)),
+                                                      order.get('positionSide', 'BOTH'))
+        
+        # Update TWAP info
+        twap_info['executed_chunks'] += 1
+        # What actually filled - an EXPIRED or partly filled market order leaves the rest to carry
+        twap_info['executed_quantity'] += float(order.get('executedQty', 0))
+        record = OrderRecord.from_response(order, twap_info['symbol'], twap_info['side'], 'MARKET', quantity)
+        twap_info['orders'].append(record)
+        return record
+    
+    def attach_market_stream(self, stream):
+        """Feed live trades into the volume curves - POV sizes off real traded volume when this is attached"""
+        self.market_stream = stream
+        for symbol, profile in self.volume_profiles.items():
+            stream.subscribe(symbol, 'aggTrade', profile.on_trade)
+    
+    def get_volume_profile(self, symbol: str) -> VolumeProfile:
+        """Load (once) the intraday volume curve for a symbol from the synced kline store"""
+        symbol = symbol.upper()
+        if symbol not in self.volume_profiles:
+            # Top the 1m history up first - only the minutes since the last sync are fetched
+            since = int(time.time() * 1000) - Config.VOLUME_PROFILE_DAYS * 86_400_000
+            self.kline_sync.sync(symbol, '1m', since)
+            profile = VolumeProfile.from_klines(symbol)
+            self.volume_profiles[symbol] = profile
+            if self.market_stream is not None:
+                self.market_stream.subscribe(symbol, 'aggTrade', profile.on_trade)
+        return self.volume_profiles[symbol]
+    
+    def execute_vwap_order(self, symbol: str, side: str, total_quantity: float, duration_seconds: int = None, intervals: int = None,
+                           max_slippage_bps: float = None) -> dict:
+        """
+        VWAP - same slice timing as TWAP, but each slice is sized by the volume we expect
+        in its window, so more gets done when the market is actually trading.
+        """
+        return self._start_sliced_order('VWAP', symbol, side, total_quantity, duration_seconds, intervals,
+                                        max_slippage_bps=max_slippage_bps)
+    
+    def execute_pov_order(self, symbol: str, side: str, total_quantity: float, participation: float = None,
+                          duration_seconds: int = None, intervals: int = None, max_slippage_bps: float = None) -> dict:
+        """
+        Percent-of-volume - each slice trades a fixed share of the market volume since the last one.
+        Whatever isn't done when the duration runs out is left unexecuted (status EXPIRED).
+        """
+        participation = participation or Config.DEFAULT_POV_PARTICIPATION
+        if not 0 < participation < 1:
+            error_msg = f"Invalid participation rate: {participation} (must be between 0 and 1)"
+            bot_logger.log_error(error_msg)
+            return {'success': False, 'error': error_msg}
+        return self._start_sliced_order('POV', symbol, side, total_quantity, duration_seconds, intervals, participation,
+                                        max_slippage_bps)
+    
+    def _start_sliced_order(self, mode: str, symbol: str, side: str, total_quantity: float,
+                            duration_seconds: int = None, intervals: int = None, participation: float = None,
+                            max_slippage_bps: float = None) -> dict:
+        try:
+            duration_seconds = duration_seconds or Config.DEFAULT_TWAP_DURATION
+            intervals = intervals or Config.DEFAULT_TWAP_INTERVALS
+            
+            is_valid, errors = self.validator.validate_order(symbol, side, 'MARKET', total_quantity)
+            if not is_valid:
+                error_msg = f"{mode} validation failed: {', '.join(errors)}"
+                bot_logger.log_error(error_msg)
+                return {'success': False, 'error': error_msg}
+            
+            if intervals <= 0 or duration_seconds <= 0:
+                error_msg = f"Invalid {mode} parameters: intervals and duration must be positive"
+                bot_logger.log_error(error_msg)
+                return {'success': False, 'error': error_msg}
+            
+            _, interval_delay = self.build_twap_schedule(total_quantity, duration_seconds, intervals)
+            profile = self.get_volume_profile(symbol)
+            
+            start = time.time()
+            twap_id = f"{symbol}_{mode}_{int(start)}_{next(self._ids)}"
+            self.active_twaps[twap_id] = {
+                'mode': mode,
+                'symbol': symbol.upper(),
+                'side': side.upper(),
+                'total_quantity': total_quantity,
+                'participation': participation,
+                'intervals': intervals,
+                'interval_delay': interval_delay,
+                'start_time': start,
+                'end_time': start + duration_seconds,
+                'slice_index': 0,
+                'last_slice_time': start,
+                'last_traded_volume': profile.traded_volume,
+                'executed_chunks': 0,
+                'executed_quantity': 0,
+                'carry': 0.0,  # Sizes below the exchange minimum roll into the next slice
+                'max_slippage_bps': max_slippage_bps,
+                'orders': order_history(),
+                'status': 'ACTIVE'
+            }
+            
+            bot_logger.log_order(f"{mode}_START", symbol, total_quantity,
+                               f"Slices:{intervals}, Duration:{duration_seconds}s", 'STARTING')
+            
+            if self._scheduler is None:
+                self._scheduler = SliceScheduler()
+            self._scheduler.schedule(start, self._run_slice, twap_id)
+            
+            return {
+                'success': True,
+                'twap_id': twap_id,
+                'symbol': symbol,
+                'side': side,
+                'total_quantity': total_quantity,
+                'chunk_size': 'volume-weighted' if mode == 'VWAP' else f"{participation*100:.1f}% of volume",
+                'intervals': intervals,
+                'duration_seconds': duration_seconds,
+                'type': mode
+            }
+        
+        except Exception as e:
+            error_msg = f"Failed to start {mode} order"
+            bot_logger.log_error(error_msg, e)
+            return {'success': False, 'error': error_msg}
+    
+    def _slice_quantity(self, info: dict, profile: VolumeProfile, now: float) -> float:
+        """Size the next slice - O(1), just a couple of prefix-sum lookups"""
+        remaining = info['total_quantity'] - info['executed_quantity']
+        if info['mode'] == 'VWAP':
+            slice_end = min(info['start_time'] + (info['slice_index'] + 1) * info['interval_delay'], info['end_time'])
+            # Remaining quantity in proportion to this slice's share of the volume still to come,
+            # so a failed slice gets absorbed by the later ones automatically
+            # (the carry is added back by the caller, so it's left out of the share here)
+            window = profile.expected_volume(now * 1000, info['end_time'] * 1000)
+            this_slice = profile.expected_volume(now * 1000, slice_end * 1000)
+            if info['slice_index'] >= info['intervals'] - 1 or window <= 0:
+                return remaining - info['carry']
+            return (remaining - info['carry']) * this_slice / window
+        
+        # POV - live traded volume if we're attached to the stream, else the curve's estimate
+        if self.market_stream is not None:
+            market_volume = profile.traded_volume - info['last_traded_volume']
+            info['last_traded_volume'] = profile.traded_volume
+        else:
+            market_volume = profile.expected_volume(info['last_slice_time'] * 1000, now * 1000)
+        return min(remaining, info['participation'] * market_volume)
+    
+    def _run_slice(self, twap_id: str):
+        info = self.active_twaps.get(twap_id)
+        if info is None or info['status'] != 'ACTIVE':
+            return
+        
+        try:
+            now = time.time()
+            profile = self.volume_profiles[info['symbol']]
+            quantity = self._slice_quantity(info, profile, now) + info['carry']
+            quantity = min(quantity, info['total_quantity'] - info['executed_quantity'])
+            info['last_slice_time'] = now
+            info['slice_index'] += 1
+            
+            # Whatever doesn't go out - the step-size remainder, a book or risk cap, a rejected order - rolls on
+            info['carry'] = quantity
+            try:
+                record = self._place_slice(info, quantity)
+                if record is not None:
+                    info['carry'] = max(quantity - record.executed_qty, 0.0)
+                    bot_logger.log_order(f"{info['mode']}_SLICE", info['symbol'], record.executed_qty,
+                                       f"Slice {info['slice_index']}/{info['intervals']}", 'EXECUTED')
+            except BinanceAPIException as e:
+                bot_logger.log_error(f"{info['mode']} slice {info['slice_index']} failed: {e.message}", e)
+            except Exception as e:
+                # Timeouts and dropped connections roll on like a rejected order - the run must keep going
+                bot_logger.log_error(f"{info['mode']} slice {info['slice_index']} failed", e)
+            
+            remaining = info['total_quantity'] - info['executed_quantity']
+            if remaining < Config.MIN_QUANTITY:
+                info['status'] = 'COMPLETED'
+            elif info['slice_index'] >= info['intervals'] or now >= info['end_time']:
+                info['status'] = 'EXPIRED' if info['mode'] == 'POV' else 'PARTIAL'
+            else:
+                self._scheduler.schedule(info['start_time'] + info['slice_index'] * info['interval_delay'], self._run_slice, twap_id)
+                return
+        except Exception as e:
+            # Never leave a run ACTIVE with nothing scheduled - waiters poll on the status
+            info['status'] = 'FAILED'
+            bot_logger.log_error(f"{info['mode']} execution failed for {twap_id}", e)
+        
+        bot_logger.log_order(f"{info['mode']}_COMPLETE", info['symbol'], info['executed_quantity'],
+                           f"Executed {info['executed_chunks']} slices", info['status'])
+        self._finish(twap_id)
     
     def cancel_twap(self, twap_id: str) -> dict:
         """Cancel active TWAP order"""
@@ -146,12 +393,14 @@ class TWAPOrderManager:
         
         self.active_twaps[twap_id]['status'] = 'CANCELLED'
         bot_logger.logger.info(f"TWAP_CANCELLED: {twap_id}")
+        self._finish(twap_id)
         
         return {'success': True, 'twap_id': twap_id, 'status': 'CANCELLED'}
     
     def get_twap_status(self, twap_id: str) -> dict:
         """Get TWAP execution status"""
-        if twap_id not in self.active_twaps:
+        info = self.active_twaps.get(twap_id) or self.archive.get(twap_id)
+        if info is None:
             return {'success': False, 'error': 'TWAP ID not found'}
         
-        return {'success': True, 'twap_info': self.active_twaps[twap_id]}
\ No newline at end of file
+        return {'success': True, 'twap_info': info}
@@ -0,0 +1,129 @@
+import time
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logger import bot_logger
+from config import Config
+from kline_store import KlineStore
+
+MINUTES_PER_DAY = 1440
+MS_PER_MINUTE = 60_000
+
+
+# Intraday volume curve - average volume per minute of the day (UTC).
+# Stored as prefix sums so "how much volume do we expect between t0 and t1" is O(1),
+# which is all VWAP and POV slicing needs.
+class VolumeProfile:
+    def __init__(self, symbol: str, minute_volumes: np.ndarray = None):
+        self.symbol = symbol.upper()
+        if minute_volumes is None:
+            minute_volumes = np.ones(MINUTES_PER_DAY)  # Flat curve - VWAP degrades to TWAP
+        self.minute_volumes = np.asarray(minute_volumes, dtype=np.float64).copy()
+        self._rebuild()
+
+        # Live trade accounting - updated from the aggTrade stream
+        self.traded_volume = 0.0  # Running total since we attached, POV measures deltas of this
+        self._live_minute = None
+        self._live_volume = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_klines(cls, symbol: str, days: int = None, store: KlineStore = None):
+        """Build the curve from cached 1m klines - falls back to flat if nothing is stored"""
+        days = days or Config.VOLUME_PROFILE_DAYS
+        store = store or KlineStore()
+        end_ms = int(time.time() * 1000)
+        klines = store.read(symbol, '1m', start_ms=end_ms - days * MINUTES_PER_DAY * MS_PER_MINUTE)
+        if len(klines['open_time']) < MINUTES_PER_DAY:
+            bot_logger.logger.warning(f"VOLUME_PROFILE: not enough cached 1m klines for {symbol.upper()} - using a flat curve")
+            return cls(symbol)
+
+        minute = (np.asarray(klines['open_time']) // MS_PER_MINUTE) % MINUTES_PER_DAY
+        totals = np.bincount(minute, weights=np.asarray(klines['volume']), minlength=MINUTES_PER_DAY)
+        samples = np.bincount(minute, minlength=MINUTES_PER_DAY)
+        curve = np.divide(totals, samples, out=np.zeros(MINUTES_PER_DAY), where=samples > 0)
+
+        # Minutes we never saw borrow the average so the curve has no dead zones
+        curve[samples == 0] = curve[samples > 0].mean()
+        return cls(symbol, curve)
+
+    def _rebuild(self):
+        self._prefix = np.concatenate(([0.0], np.cumsum(self.minute_volumes)))
+        self._day_volume = float(self._prefix[-1])
+
+    def _cumulative(self, ts_ms: float) -> float:
+        """Expected volume from the epoch up to ts - continuous, so partial minutes are interpolated"""
+        minutes = ts_ms / MS_PER_MINUTE
+        days, minute_of_day = divmod(minutes, MINUTES_PER_DAY)
+        whole = int(minute_of_day)
+        return days * self._day_volume + self._prefix[whole] + (minute_of_day - whole) * self.minute_volumes[whole % MINUTES_PER_DAY]
+
+    def expected_volume(self, start_ms: float, end_ms: float) -> float:
+        """Expected market volume between two timestamps - O(1)"""
+        return max(self._cumulative(end_ms) - self._cumulative(start_ms), 0.0)
+
+    def on_trade(self, symbol: str, data: dict):
+        """aggTrade callback - counts live volume and folds each finished minute into the curve"""
+        qty = float(data['q'])
+        minute = int(data['T']) // MS_PER_MINUTE
+        with self._lock:
+            self.traded_volume += qty
+            if self._live_minute is None:
+                self._live_minute = minute
+            if minute != self._live_minute:
+                bucket = self._live_minute % MINUTES_PER_DAY
+                alpha = Config.VOLUME_PROFILE_ALPHA
+                self.minute_volumes[bucket] += alpha * (self._live_volume - self.minute_volumes[bucket])
+                # Once a minute, 1440 additions - nothing on the per-trade path
+                self._rebuild()
+                self._live_minute = minute
+                self._live_volume = 0.0
+            self._live_volume += qty
+
+
+# One thread runs every sliced parent order - a heap of due times instead of a sleeping thread per order
+class SliceScheduler:
+    def __init__(self, workers: int = None):
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers or Config.SLICE_WORKERS, thread_name_prefix='slice')
+        self._thread = threading.Thread(target=self._run, name='slice-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def schedule(self, due: float, callback, *args):
+        """Run callback(*args) on the worker pool at time.time() >= due"""
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (due, self._seq, callback, args))
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, callback, args = self._heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            # Order placement is network-bound, so it runs on the pool and never blocks the timer
+            self._pool.submit(self._safe_call, callback, args)
+
+    @staticmethod
+    def _safe_call(callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            bot_logger.log_error("Scheduled slice failed", e)
@@ -0,0 +1,184 @@
+import csv
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+from config import Config
+from logger import bot_logger
+from validator import OrderValidator
+from positions import PositionBook
+from rate_limiter import order_rate_limiter
+
+# Bulk order submission - stream a CSV/JSONL file of orders through batchOrders calls.
+# Rows are read one at a time, buffered per symbol only until a batch of 5 is full,
+# and results are written out as they come back, so memory stays flat however big the file is.
+
+RESTING_TYPES = ('LIMIT', 'STOP', 'TAKE_PROFIT')
+
+
+class BatchOrderManager:
+    def __init__(self, client: Client, position_book: PositionBook = None, validator: OrderValidator = None):
+        self.client = client
+        self.validator = validator or OrderValidator(client)  # Pass a loaded one in - saves another exchange info download
+        self.position_book = position_book
+
+    @staticmethod
+    def iter_rows(path: str):
+        """Yield (row_number, row dict) from a .csv or .jsonl file without loading it"""
+        with open(path, newline='') as f:
+            if path.endswith('.csv'):
+                for number, row in enumerate(csv.DictReader(f), start=1):
+                    yield number, row
+            else:
+                for number, line in enumerate(f, start=1):
+                    if line.strip():
+                        yield number, json.loads(line)
+
+    def parse_row(self, row: dict) -> tuple:
+        """Turn a file row into batchOrders params - returns (params, errors)"""
+        try:
+            symbol = str(row.get('symbol', '')).upper()
+            side = str(row.get('side', '')).upper()
+            order_type = str(row.get('type') or 'MARKET').upper()
+            quantity = float(row.get('quantity') or 0)
+            price = float(row['price']) if row.get('price') not in (None, '') else None
+            stop_price = float(row['stop_price']) if row.get('stop_price') not in (None, '') else None
+        except (TypeError, ValueError) as e:
+            return None, [f"Unparseable row: {e}"]
+
+        is_valid, errors = self.validator.validate_order(symbol, side, order_type, quantity, price)
+        if order_type in RESTING_TYPES and price is None:
+            errors.append(f"{order_type} order needs a price")
+        if order_type.startswith(('STOP', 'TAKE_PROFIT')) and stop_price is None:
+            errors.append(f"{order_type} order needs a stop_price")
+        if errors:
+            return None, errors
+
+        # batchOrders wants every value as a string
+        params = {'symbol': symbol, 'side': side, 'type': order_type, 'quantity': repr(quantity)}
+        if price is not None:
+            params['price'] = repr(price)
+        if order_type in RESTING_TYPES:
+            params['timeInForce'] = str(row.get('time_in_force') or 'GTC').upper()
+        if stop_price is not None:
+            params['stopPrice'] = repr(stop_price)
+        if str(row.get('reduce_only', '')).lower() == 'true':
+            params['reduceOnly'] = 'true'
+        if row.get('client_id'):
+            params['newClientOrderId'] = str(row['client_id'])
+        return params, []
+
+    def submit_file(self, path: str, result_path: str, concurrency: int = None, progress=None) -> dict:
+        """Validate, group by symbol and submit every order in the file - results go to result_path as JSONL"""
+        concurrency = concurrency or Config.BATCH_CONCURRENCY
+        stats = {'rows': 0, 'invalid': 0, 'submitted': 0, 'succeeded': 0, 'failed': 0, 'batches': 0}
+        stats_lock = threading.Lock()
+        in_flight = threading.Semaphore(concurrency * 2)  # Bounds buffered batches, not just threads
+        pending = {}  # symbol -> [(row_number, params)] waiting for a full batch
+        reserved = []  # (symbol, key) held in the position book until the whole file is through
+        started = time.perf_counter()
+
+        with open(result_path, 'w') as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            write_lock = threading.Lock()
+
+            def write(record: dict):
+                with write_lock:
+                    out.write(json.dumps(record) + '\n')
+
+            def finished(future):
+                in_flight.release()
+                succeeded, failed = future.result()
+                with stats_lock:
+                    stats['succeeded'] += succeeded
+                    stats['failed'] += failed
+                    if progress:
+                        progress(stats, time.perf_counter() - started)
+
+            def flush(symbol: str):
+                batch = pending.pop(symbol)
+                in_flight.acquire()
+                stats['submitted'] += len(batch)
+                stats['batches'] += 1
+                pool.submit(self._submit_batch, batch, write, result_path).add_done_callback(finished)
+
+            for number, row in self.iter_rows(path):
+                stats['rows'] += 1
+                params, errors = self.parse_row(row)
+                if params is not None and self.position_book is not None:
+                    risk_ok, errors = self._check_and_reserve(params, (result_path, number), reserved)
+                    params = params if risk_ok else None
+                if params is None:
+                    stats['invalid'] += 1
+                    write({'row': number, 'success': False, 'error': ', '.join(errors)})
+                    continue
+
+                pending.setdefault(params['symbol'], []).append((number, params))
+                if len(pending[params['symbol']]) >= Config.BATCH_ORDER_SIZE:
+                    flush(params['symbol'])
+
+            for symbol in list(pending):
+                flush(symbol)
+
+        # Every batch has answered - market fills come in through the user stream / next resync from here
+        for symbol, key in reserved:
+            self.position_book.release(symbol, key)
+
+        elapsed = time.perf_counter() - started
+        stats['elapsed_seconds'] = elapsed
+        stats['orders_per_second'] = stats['submitted'] / elapsed if elapsed > 0 else 0.0
+        bot_logger.logger.info(f"BATCH: {path} | {stats['submitted']} submitted | {stats['succeeded']} ok | "
+                               f"{stats['failed']} failed | {stats['invalid']} invalid | {stats['orders_per_second']:.1f} orders/s")
+        return {'success': True, **stats}
+
+    def _check_and_reserve(self, params: dict, key, reserved: list) -> tuple:
+        """
+        Risk-check a row against the book plus every row accepted before it, then reserve it -
+        rows are only queued here, so without this N rows could each pass a limit they break together.
+        """
+        symbol, side, quantity = params['symbol'], params['side'], float(params['quantity'])
+        price = float(params['price']) if 'price' in params else None
+        resting = params['type'] in RESTING_TYPES
+        risk_ok, errors = self.position_book.check_order(symbol, side, quantity, price, resting=resting)
+        if risk_ok:
+            if resting:
+                self.position_book.track_order(symbol, key, side, quantity, price)
+            else:
+                self.position_book.reserve(symbol, key, side, quantity, price or self.position_book.reference_price(symbol))
+            reserved.append((symbol, key))
+        return risk_ok, errors
+
+    def _submit_batch(self, batch: list, write, reservation_prefix=None) -> tuple:
+        """One batchOrders call - returns (succeeded, failed)"""
+        order_rate_limiter.acquire(len(batch))
+        try:
+            if self.client is None:
+                # Demo mode
+                responses = [{'orderId': random.randint(10000000, 99999999), 'status': 'NEW (DEMO)'} for _ in batch]
+            else:
+                responses = self.client.futures_place_batch_order(batchOrders=[params for _, params in batch])
+        except BinanceAPIException as e:
+            responses = [{'code': e.code, 'msg': e.message}] * len(batch)
+        except Exception as e:
+            bot_logger.log_error("Batch order call failed", e)
+            responses = [{'code': None, 'msg': str(e)}] * len(batch)
+
+        succeeded = 0
+        for (number, params), response in zip(batch, responses):
+            if self.position_book is not None and params['type'] in RESTING_TYPES:
+                # The row's placeholder reservation gives way to the real order id (or to nothing)
+                self.position_book.untrack_order(params['symbol'], (reservation_prefix, number))
+            if 'orderId' in response:
+                succeeded += 1
+                bot_logger.log_order(f"BATCH_{params['type']}", params['symbol'], params['quantity'], params.get('price'), 'PLACED')
+                if self.position_book is not None and params['type'] in RESTING_TYPES:
+                    self.position_book.track_order(params['symbol'], response['orderId'], params['side'],
+                                                   float(params['quantity']), float(params['price']))
+                write({'row': number, 'success': True, 'symbol': params['symbol'],
+                       'order_id': response['orderId'], 'status': response.get('status')})
+            else:
+                write({'row': number, 'success': False, 'symbol': params['symbol'],
+                       'error': f"Binance API error: {response.get('msg')}", 'code': response.get('code')})
+        return succeeded, len(batch) - succeeded
@@ -8,10 +8,12 @@ Personal Note: This took me 3 days to get right, especially the grid trading log
 Learned a lot about async programming and Binance API quirks along the way.
 """
 
+import time
+_imports_started = time.perf_counter()  # --profile reports how long our imports take
+
 import click
 import sys
 import os
-from binance.client import Client
 from colorama import init, Fore, Style
 
 # Had to add this for Windows compatibility - spent 2 hours debugging color issues!
@@ -20,12 +22,24 @@ init()
 # Import our modules
 from config import Config
 from logger import bot_logger
+from time_sync import SyncedClient
+from positions import PositionBook
 from market_orders import MarketOrderManager
 from limit_orders import LimitOrderManager
 from advanced.oco import OCOOrderManager
 from advanced.twap import TWAPOrderManager
 from advanced.grid import GridOrderManager
 from advanced.stop_limit_orders import StopLimitOrderManager
+from advanced.chase import ChaseOrderManager
+from advanced.conditional import ConditionalOrderManager
+from advanced.iceberg import IcebergOrderManager
+from batch_orders import BatchOrderManager
+from order_book import OrderBookManager
+from profiler import profiler
+# Command-only modules (streams, klines, scanner, backtest, loadtest, signal server) are imported
+# inside the commands that use them, so startup doesn't pay for websockets or the exchange stand-in
+
+_imports_seconds = time.perf_counter() - _imports_started
 
 class BinanceFuturesBot:
     """
@@ -41,10 +55,20 @@ class BinanceFuturesBot:
         self.twap_orders = None
         self.grid_orders = None  # My favorite feature!
         self.stop_limit_orders = None
+        self.batch_orders = None
+        self.chase_orders = None
+        self.conditional_orders = None  # Client-side trailing / cross / time triggers
+        self.iceberg_orders = None
+        self.order_books = None  # Local L2 books - started on demand by the commands that need depth
+        self.position_book = None  # Positions/P&L kept in memory, resynced from the account now and then
         self._initialize_client()
     
     def _initialize_client(self):
         """Initialize Binance client - learned this pattern from my previous trading projects"""
+        with profiler.span('client_init'):
+            self._connect()
+    
+    def _connect(self):
         try:
             # I always forget to set these up first time, so added a helpful error message
             if not Config.BINANCE_API_KEY or not Config.BINANCE_SECRET_KEY:
@@ -56,21 +80,37 @@ class BinanceFuturesBot:
                 print(f"{Fore.YELLOW}[DEMO MODE] Running without real API connection{Style.RESET_ALL}")
                 self.client = None  # Demo mode - no real money at risk
             else:
-                self.client = Client(
+                self.client = SyncedClient(
                     Config.BINANCE_API_KEY,
                     Config.BINANCE_SECRET_KEY,
                     testnet=Config.TESTNET
                 )
+                # Sync with server time before the first signed request - skewed clocks get -1021
+                with profiler.span('time_sync'):
+                    self.client.time_sync.start()
                 # Test connection
-                self.client.futures_account()
+                account = self.client.futures_account()
+            
+            # The connection test already fetched the account - seed the position book with it
+            self.position_book = PositionBook(self.client)
+            if self.client is not None:
+                self.position_book.load_account(account)
+            risk = self.position_book if Config.RISK_ENABLED else None
             
             # Initialize order managers (will handle demo mode)
-            self.market_orders = MarketOrderManager(self.client)
-            self.limit_orders = LimitOrderManager(self.client)
-            self.oco_orders = OCOOrderManager(self.client)
-            self.twap_orders = TWAPOrderManager(self.client)
-            self.grid_orders = GridOrderManager(self.client)
-            self.stop_limit_orders = StopLimitOrderManager(self.client)
+            self.order_books = OrderBookManager(self.client)
+            self.position_book.order_books = self.order_books
+            self.market_orders = MarketOrderManager(self.client, risk, self.order_books)
+            self.limit_orders = LimitOrderManager(self.client, risk)
+            self.oco_orders = OCOOrderManager(self.client, risk)
+            self.twap_orders = TWAPOrderManager(self.client, risk)
+            self.twap_orders.order_books = self.order_books
+            self.grid_orders = GridOrderManager(self.client, risk)
+            self.stop_limit_orders = StopLimitOrderManager(self.client, risk)
+            self.batch_orders = BatchOrderManager(self.client, risk, self.market_orders.validator)
+            self.chase_orders = ChaseOrderManager(self.client, self.limit_orders)
+            self.conditional_orders = ConditionalOrderManager(self.client, self.market_orders, self.limit_orders)
+            self.iceberg_orders = IcebergOrderManager(self.client, self.limit_orders)
             
             env_type = "DEMO" if self.client is None else ("TESTNET" if Config.TESTNET else "LIVE")
             print(f"{Fore.GREEN}[OK] Connected to Binance Futures ({env_type}){Style.RESET_ALL}")
@@ -84,56 +124,156 @@ class BinanceFuturesBot:
     def display_account_info(self):
         """Display account information"""
         try:
-            if self.client is None:
-                # Demo mode
-                print(f"\n{Fore.CYAN}=== DEMO ACCOUNT INFO ==={Style.RESET_ALL}")
-                print(f"Balance: $10,000.00 USDT (Demo)")
-                print(f"Unrealized PnL: $0.00 USDT (Demo)")
-                print(f"Available Balance: $10,000.00 USDT (Demo)")
-                return
-                
-            account = self.client.futures_account()
-            balance = float(account['totalWalletBalance'])
-            pnl = float(account['totalUnrealizedProfit'])
+            # Served from the position book - it only hits futures_account() when stale
+            self.position_book.resync()
+            summary = self.position_book.summary()
+            demo = " (Demo)" if self.client is None else ""
             
-            print(f"\n{Fore.CYAN}=== ACCOUNT INFO ==={Style.RESET_ALL}")
-            print(f"Balance: ${balance:.2f} USDT")
-            print(f"Unrealized PnL: ${pnl:.2f} USDT")
-            print(f"Available Balance: ${float(account['availableBalance']):.2f} USDT")
+            print(f"\n{Fore.CYAN}=== {'DEMO ' if demo else ''}ACCOUNT INFO ==={Style.RESET_ALL}")
+            print(f"Balance: ${summary['wallet_balance']:,.2f} USDT{demo}")
+            print(f"Unrealized PnL: ${summary['unrealized_pnl']:,.2f} USDT{demo}")
+            print(f"Available Balance: ${summary['available_balance']:,.2f} USDT{demo}")
+            print(f"Margin In Use: ${summary['margin_used']:,.2f} USDT{demo}")
+            
+            for p in summary['positions']:
+                side = '' if p.position_side == 'BOTH' else f" {p.position_side}"
+                print(f"{p.symbol}{side}: {p.quantity} @ {p.entry_price:.4f} | Mark: {p.mark_price} | "
+                      f"uPnL: {p.unrealized_pnl:.2f} | rPnL: {p.realized_pnl:.2f}")
             
         except Exception as e:
             print(f"{Fore.RED}Failed to get account info: {str(e)}{Style.RESET_ALL}")
+    
+    def display_clock_info(self):
+        """Display server clock sync metrics"""
+        if self.client is None:
+            print(f"{Fore.YELLOW}Clock sync is not used in demo mode{Style.RESET_ALL}")
+            return
+        
+        metrics = self.client.time_sync.get_metrics()
+        print(f"\n{Fore.CYAN}=== CLOCK SYNC ==={Style.RESET_ALL}")
+        print(f"Clock Skew: {metrics['clock_skew_ms']}ms (server - local)")
+        print(f"recvWindow: {metrics['recv_window_ms']}ms")
+        print(f"RTT min/p50/p99: {metrics['rtt_min_ms']}/{metrics['rtt_p50_ms']}/{metrics['rtt_p99_ms']}ms")
+        print(f"Samples: {metrics['samples']} ({metrics['rejected_samples']} rejected)")
+
+# Bot instance is created on first use - offline commands (backtest, imports) never touch the exchange
+_bot = None
+
+def get_bot() -> BinanceFuturesBot:
+    global _bot
+    if _bot is None:
+        _bot = BinanceFuturesBot()
+    return _bot
 
-# Initialize bot instance
-bot = BinanceFuturesBot()
+def _parse_list(value: str, cast=float) -> list:
+    """Parse comma-separated CLI values like '5,10,20'"""
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+def _finish_profile():
+    top = profiler.stop()
+    print(f"\n{Fore.CYAN}=== PROFILE ({profiler.output}) ==={Style.RESET_ALL}")
+    for name, count, seconds in top[:15]:
+        print(f"{seconds*1000:>10.2f}ms  {count:>6}x  {name}")
 
 @click.group()
-def cli():
+@click.option('--profile', 'profile_path', default=None, help='Write a flamegraph-compatible (folded stacks) profile to this file')
+@click.option('--profile-mode', default='spans', type=click.Choice(['spans', 'cprofile', 'sample']),
+              help='spans: named stages only, cprofile: + <file>.prof, sample: + <file>.samples for every thread')
+@click.pass_context
+def cli(ctx, profile_path, profile_mode):
     """Binance Futures Trading Bot - Professional Grade"""
-    pass
+    if profile_path:
+        profiler.start(profile_path, profile_mode)
+        profiler.record('startup;imports', _imports_seconds)
+        # Close callbacks run last-in-first-out: the command span closes, then the profile is written
+        ctx.call_on_close(_finish_profile)
+        command_span = profiler.span(f"command {ctx.invoked_subcommand}")
+        command_span.__enter__()
+        ctx.call_on_close(lambda: command_span.__exit__(None, None, None))
 
 @cli.command()
 def account():
     """Display account information"""
-    bot.display_account_info()
+    get_bot().display_account_info()
+
+@cli.command()
+def clock():
+    """Display server clock skew and recvWindow"""
+    get_bot().display_clock_info()
 
 @cli.command()
 @click.option('--symbol', required=True, help='Trading symbol (e.g., BTCUSDT)')
 @click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
 @click.option('--quantity', required=True, type=float, help='Order quantity')
-def market(symbol, side, quantity):
+@click.option('--max-slippage-bps', type=float, default=None, help='Cut the order down to what the book fills within this slippage')
+@click.option('--split', is_flag=True, help='With --max-slippage-bps, send the rest in further pieces instead of dropping it')
+def market(symbol, side, quantity, max_slippage_bps, split):
     """Place a market order"""
-    result = bot.market_orders.place_market_order(symbol, side, quantity)
+    bot = get_bot()
+    if max_slippage_bps is None:
+        result = bot.market_orders.place_market_order(symbol, side, quantity)
+    else:
+        stream = _start_order_book(bot, symbol)
+        try:
+            result = bot.market_orders.place_capped_market_order(symbol, side, quantity, max_slippage_bps, split)
+        finally:
+            stream.stop()
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] Market order placed successfully{Style.RESET_ALL}")
-        print(f"Order ID: {result['order_id']}")
+        print(f"Order ID: {result['order_id'] if 'order_id' in result else ', '.join(map(str, result['order_ids']))}")
         print(f"Symbol: {result['symbol']}")
         print(f"Side: {result['side']}")
         print(f"Quantity: {result['quantity']}")
+        if result.get('requested_quantity', result['quantity']) > result['quantity']:
+            print(f"{Fore.YELLOW}Capped from {result['requested_quantity']} - the book couldn't take more "
+                  f"within {max_slippage_bps} bps{Style.RESET_ALL}")
     else:
         print(f"{Fore.RED}[ERROR] Market order failed: {result['error']}{Style.RESET_ALL}")
 
+def _start_order_book(bot, symbol):
+    """Start the depth stream for one symbol and wait (briefly) for its book to sync"""
+    from market_stream import MarketStream
+    stream = MarketStream()
+    bot.order_books.attach(stream, [symbol])
+    stream.start()
+    if not bot.order_books.wait_ready(symbol):
+        print(f"{Fore.YELLOW}[WARNING] No order book for {symbol.upper()} yet - sending without the depth check{Style.RESET_ALL}")
+    return stream
+
+@cli.command()
+@click.option('--symbol', required=True, help='Trading symbol (e.g., BTCUSDT)')
+@click.option('--levels', default=10, help='Levels to show per side (default: 10)')
+@click.option('--quantity', type=float, default=None, help='Also show the expected fill of a market order this size')
+@click.option('--max-slippage-bps', type=float, default=None, help='Also show the largest order within this slippage')
+def book(symbol, levels, quantity, max_slippage_bps):
+    """Show the local order book and what a market order would cost"""
+    bot = get_bot()
+    stream = _start_order_book(bot, symbol)
+    try:
+        order_book = bot.order_books.get(symbol)
+        if order_book is None:
+            print(f"{Fore.RED}[ERROR] Order book for {symbol.upper()} did not sync{Style.RESET_ALL}")
+            return
+        
+        print(f"\n{Fore.CYAN}=== {order_book.symbol} ORDER BOOK (update {order_book.last_update_id}) ==={Style.RESET_ALL}")
+        for price, qty in reversed(order_book.depth('ASK', levels)):
+            print(f"{Fore.RED}{price:>14} {qty:>14}{Style.RESET_ALL}")
+        for price, qty in order_book.depth('BID', levels):
+            print(f"{Fore.GREEN}{price:>14} {qty:>14}{Style.RESET_ALL}")
+        
+        for side in ('BUY', 'SELL'):
+            if quantity is not None:
+                fill = order_book.expected_fill(side, quantity)
+                if fill is not None:
+                    print(f"{side} {quantity}: avg {fill['average_price']:.8g} | worst {fill['worst_price']:.8g} | "
+                          f"{fill['slippage_bps']:.2f} bps over {fill['levels']} levels"
+                          + (f" | book only has {fill['fillable_quantity']}" if fill['fillable_quantity'] < quantity else ''))
+            if max_slippage_bps is not None:
+                print(f"{side} max within {max_slippage_bps} bps: {order_book.max_quantity(side, max_slippage_bps):.6f}")
+    finally:
+        stream.stop()
+
 @cli.command()
 @click.option('--symbol', required=True, help='Trading symbol (e.g., BTCUSDT)')
 @click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
@@ -141,7 +281,7 @@ def market(symbol, side, quantity):
 @click.option('--price', required=True, type=float, help='Limit price')
 def limit(symbol, side, quantity, price):
     """Place a limit order"""
-    result = bot.limit_orders.place_limit_order(symbol, side, quantity, price)
+    result = get_bot().limit_orders.place_limit_order(symbol, side, quantity, price)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] Limit order placed successfully{Style.RESET_ALL}")
@@ -153,6 +293,102 @@ def limit(symbol, side, quantity, price):
     else:
         print(f"{Fore.RED}[ERROR] Limit order failed: {result['error']}{Style.RESET_ALL}")
 
+@cli.command()
+@click.option('--symbol', required=True, help='Trading symbol (e.g., BTCUSDT)')
+@click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
+@click.option('--quantity', required=True, type=float, help='Order quantity')
+@click.option('--offset', default=Config.CHASE_OFFSET_TICKS, help='Ticks behind the best bid/ask (default: 0)')
+@click.option('--max-reprices', default=Config.CHASE_MAX_REPRICES, help='Stop chasing after this many amends')
+@click.option('--debounce', default=Config.CHASE_DEBOUNCE, help='Minimum seconds between amends')
+@click.option('--keep', is_flag=True, help='Leave the order resting on Ctrl+C instead of cancelling it')
+def chase(symbol, side, quantity, offset, max_reprices, debounce, keep):
+    """Place a limit order that follows the top of book (amended in place)"""
+    from market_stream import MarketStream, UserStream
+    bot = get_bot()
+    chase_orders = bot.chase_orders
+    stream = MarketStream()
+    chase_orders.attach_market_stream(stream)
+    user_stream = None
+    if bot.client is not None:
+        # Fills end the chase straight away instead of on the next failed amend
+        user_stream = UserStream()
+        chase_orders.attach_user_stream(user_stream)
+        bot.position_book.attach(None, user_stream)
+        user_stream.start()
+    
+    result = chase_orders.chase_limit_order(symbol, side, quantity, offset, max_reprices, debounce)
+    if not result['success']:
+        print(f"{Fore.RED}[ERROR] Chase order failed: {result['error']}{Style.RESET_ALL}")
+        if user_stream is not None:
+            user_stream.stop()
+        return
+    
+    stream.start()
+    print(f"{Fore.GREEN}[SUCCESS] Chasing {result['side']} {result['quantity']} {result['symbol']} "
+          f"(offset {offset} ticks, Ctrl+C to stop){Style.RESET_ALL}")
+    try:
+        info = chase_orders.get_chase_status(result['chase_id'])['chase_info']
+        while info['status'] in ('WAITING', 'ACTIVE'):
+            time.sleep(0.5)
+            print(f"\rOrder: {info['order_id']} | Price: {info['price']} | Reprices: {info['reprices']}", end='', flush=True)
+        error = f" ({info['error']})" if info.get('error') else ''
+        print(f"\nFinished: {info['status']}{error}")
+    except KeyboardInterrupt:
+        stopped = chase_orders.cancel_chase(result['chase_id'], cancel_order=not keep)
+        print(f"\n{stopped.get('status', stopped.get('error'))}: order {stopped.get('order_id')}")
+    finally:
+        stream.stop()
+        if user_stream is not None:
+            user_stream.stop()
+
+@cli.command()
+@click.option('--symbol', required=True, help='Trading symbol (e.g., BTCUSDT)')
+@click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
+@click.option('--quantity', required=True, type=float, help='Total order quantity')
+@click.option('--price', required=True, type=float, help='Limit price of the visible slices')
+@click.option('--visible', required=True, type=float, help='Visible slice size')
+@click.option('--variance', type=float, default=None, help='Random +/- share of each slice (e.g. 0.2)')
+@click.option('--price-limit', type=float, default=None, help='Refills join the touch but never go past this price')
+def iceberg(symbol, side, quantity, price, visible, variance, price_limit):
+    """Work a large limit order showing only a small slice at a time (Ctrl+C to cancel)"""
+    from market_stream import MarketStream, UserStream
+    bot = get_bot()
+    iceberg_orders = bot.iceberg_orders
+    stream = user_stream = None
+    if price_limit is not None:
+        stream = MarketStream()
+        iceberg_orders.attach_market_stream(stream)
+    if bot.client is not None:
+        # Refills are driven by fills on the user stream
+        user_stream = UserStream()
+        iceberg_orders.attach_user_stream(user_stream)
+        bot.position_book.attach(None, user_stream)
+        user_stream.start()
+    
+    result = iceberg_orders.place_iceberg_order(symbol, side, quantity, price, visible, variance, price_limit)
+    if not result['success']:
+        print(f"{Fore.RED}[ERROR] Iceberg order failed: {result['error']}{Style.RESET_ALL}")
+    else:
+        if stream is not None:
+            stream.start()
+        print(f"{Fore.GREEN}[SUCCESS] Iceberg started: {result['iceberg_id']}{Style.RESET_ALL}")
+        if bot.client is None:
+            print(f"{Fore.YELLOW}[DEMO MODE] No user stream - the first slice rests and is never refilled{Style.RESET_ALL}")
+        try:
+            info = iceberg_orders.get_iceberg_status(result['iceberg_id'])['iceberg_info']
+            while info['status'] == 'ACTIVE':
+                time.sleep(0.5)
+                print(f"\rExecuted: {info['executed_quantity']:.6f}/{info['total_quantity']} | Slices: {info['slices']} | "
+                      f"Resting: {info['slice_quantity']} @ {info['slice_price']}", end='', flush=True)
+            print(f"\nFinished: {info['status']} {info.get('error', '')}")
+        except KeyboardInterrupt:
+            stopped = iceberg_orders.cancel_iceberg(result['iceberg_id'])
+            print(f"\nIceberg cancelled - executed {stopped.get('executed_quantity', 0):.6f}")
+    
+    for s in (stream, user_stream):
+        if s is not None:
+            s.stop()
+
 @cli.command()
 @click.option('--symbol', required=True, help='Trading symbol')
 @click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
@@ -161,7 +397,7 @@ def limit(symbol, side, quantity, price):
 @click.option('--sl-price', required=True, type=float, help='Stop loss price')
 def oco(symbol, side, quantity, tp_price, sl_price):
     """Place OCO (One-Cancels-Other) order"""
-    result = bot.oco_orders.place_oco_order(symbol, side, quantity, tp_price, sl_price)
+    result = get_bot().oco_orders.place_oco_order(symbol, side, quantity, tp_price, sl_price)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] OCO order placed successfully{Style.RESET_ALL}")
@@ -177,9 +413,32 @@ def oco(symbol, side, quantity, tp_price, sl_price):
 @click.option('--quantity', required=True, type=float, help='Total order quantity')
 @click.option('--duration', default=300, help='Duration in seconds (default: 300)')
 @click.option('--intervals', default=10, help='Number of intervals (default: 10)')
-def twap(symbol, side, quantity, duration, intervals):
+@click.option('--mode', default='twap', type=click.Choice(['twap', 'vwap', 'pov']), help='Slicing mode (default: twap)')
+@click.option('--participation', type=float, default=None, help='POV share of market volume (default: 0.05)')
+@click.option('--wait', is_flag=True, help='Stay attached until the order finishes')
+@click.option('--max-slippage-bps', type=float, default=None, help='Cap each slice to what the book fills within this slippage')
+def twap(symbol, side, quantity, duration, intervals, mode, participation, wait, max_slippage_bps):
     """Execute TWAP (Time-Weighted Average Price) order"""
-    result = bot.twap_orders.execute_twap_order(symbol, side, quantity, duration, intervals)
+    from market_stream import MarketStream
+    bot = get_bot()
+    twap_orders = bot.twap_orders
+    stream = None
+    if mode == 'pov' and bot.client is not None:
+        # POV needs live traded volume
+        stream = MarketStream()
+        twap_orders.attach_market_stream(stream)
+        stream.start()
+    if max_slippage_bps is not None:
+        # The book lives on its own stream - it has to stay up for the whole run, so this implies --wait
+        book_stream = _start_order_book(bot, symbol)
+        wait = True
+    
+    if mode == 'vwap':
+        result = twap_orders.execute_vwap_order(symbol, side, quantity, duration, intervals, max_slippage_bps)
+    elif mode == 'pov':
+        result = twap_orders.execute_pov_order(symbol, side, quantity, participation, duration, intervals, max_slippage_bps)
+    else:
+        result = twap_orders.execute_twap_order(symbol, side, quantity, duration, intervals, max_slippage_bps)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] TWAP order started successfully{Style.RESET_ALL}")
@@ -188,8 +447,21 @@ def twap(symbol, side, quantity, duration, intervals):
         print(f"Chunk Size: {result['chunk_size']}")
         print(f"Duration: {result['duration_seconds']}s")
         print(f"Intervals: {result['intervals']}")
+        
+        if wait:
+            info = twap_orders.get_twap_status(result['twap_id'])['twap_info']
+            while info['status'] == 'ACTIVE':
+                time.sleep(1)
+                print(f"\rExecuted: {info['executed_quantity']:.6f}/{info['total_quantity']} ({info['executed_chunks']} slices)", end='', flush=True)
+            error = f" ({info['error']})" if info.get('error') else ''
+        print(f"\nFinished: {info['status']}{error}")
     else:
         print(f"{Fore.RED}[ERROR] TWAP order failed: {result['error']}{Style.RESET_ALL}")
+    
+    if stream is not None:
+        stream.stop()
+    if max_slippage_bps is not None:
+        book_stream.stop()
 
 @cli.command()
 @click.option('--symbol', required=True, help='Trading symbol')
@@ -197,9 +469,13 @@ def twap(symbol, side, quantity, duration, intervals):
 @click.option('--levels', default=10, help='Number of grid levels (default: 10)')
 @click.option('--spread', default=0.01, help='Grid spread percentage (default: 0.01 = 1%)')
 @click.option('--quantity', default=0.01, help='Order quantity per level (default: 0.01)')
-def grid(symbol, base_price, levels, spread, quantity):
+@click.option('--auto-recenter', is_flag=True, help='Keep running and move the ladder when price drifts (Ctrl+C to stop following)')
+@click.option('--band', type=float, default=None, help='Levels price may drift before recentering (default: half the levels)')
+def grid(symbol, base_price, levels, spread, quantity, auto_recenter, band):
     """Start grid trading strategy"""
-    result = bot.grid_orders.start_grid_trading(symbol, base_price, levels, spread, quantity)
+    from market_stream import MarketStream
+    grid_orders = get_bot().grid_orders
+    result = grid_orders.start_grid_trading(symbol, base_price, levels, spread, quantity)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] Grid trading started successfully{Style.RESET_ALL}")
@@ -210,13 +486,32 @@ def grid(symbol, base_price, levels, spread, quantity):
         print(f"Total Orders: {result['total_orders']}")
     else:
         print(f"{Fore.RED}[ERROR] Grid trading failed: {result['error']}{Style.RESET_ALL}")
+        return
+    
+    if not auto_recenter:
+        return
+    stream = MarketStream()
+    grid_orders.attach_market_stream(stream)
+    enabled = grid_orders.enable_auto_recenter(result['grid_id'], band)
+    stream.start()
+    print(f"Following price - recenters after {enabled['recenter_band']:g} levels of drift (Ctrl+C to stop, orders stay resting)")
+    try:
+        info = grid_orders.get_grid_status(result['grid_id'])['grid_info']
+        while info['status'] == 'ACTIVE':
+            time.sleep(1)
+            center = round(info['base_price'] + info['center'] * info['step'], 8)
+            print(f"\rCenter: {center} | Recenters: {info['recenters']} | Orders: {len(info['orders'])}", end='', flush=True)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        stream.stop()
 
 @cli.command()
 @click.option('--symbol', help='Filter by symbol')
 def orders(symbol):
     """List open orders"""
     try:
-        open_orders = bot.limit_orders.get_open_orders(symbol)
+        open_orders = get_bot().limit_orders.get_open_orders(symbol)
         
         if not open_orders:
             print(f"{Fore.YELLOW}No open orders found{Style.RESET_ALL}")
@@ -234,7 +529,7 @@ def orders(symbol):
 @click.option('--order-id', required=True, type=int, help='Order ID to cancel')
 def cancel(symbol, order_id):
     """Cancel an order"""
-    result = bot.limit_orders.cancel_order(symbol, order_id)
+    result = get_bot().limit_orders.cancel_order(symbol, order_id)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] Order cancelled successfully{Style.RESET_ALL}")
@@ -249,7 +544,7 @@ def cancel(symbol, order_id):
 @click.option('--limit-price', required=True, type=float, help='Limit execution price')
 def stop_limit(symbol, side, quantity, stop_price, limit_price):
     """Place stop-limit order (triggers limit order when stop price hit)"""
-    result = bot.stop_limit_orders.place_stop_limit_order(symbol, side, quantity, stop_price, limit_price)
+    result = get_bot().stop_limit_orders.place_stop_limit_order(symbol, side, quantity, stop_price, limit_price)
     
     if result['success']:
         print(f"{Fore.GREEN}[SUCCESS] Stop-limit order placed successfully{Style.RESET_ALL}")
@@ -259,6 +554,323 @@ def stop_limit(symbol, side, quantity, stop_price, limit_price):
     else:
         print(f"{Fore.RED}[ERROR] Stop-limit order failed: {result['error']}{Style.RESET_ALL}")
 
+@cli.command()
+@click.option('--symbol', required=True, help='Symbol to trade')
+@click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
+@click.option('--quantity', required=True, type=float, help='Order quantity')
+@click.option('--trail', type=float, default=None, help='Trailing stop callback rate (e.g. 0.01 = 1%)')
+@click.option('--above', type=float, default=None, help='Fire when the watched price trades at or above this')
+@click.option('--below', type=float, default=None, help='Fire when the watched price trades at or below this')
+@click.option('--after', type=float, default=None, help='Fire after this many seconds')
+@click.option('--watch', default=None, help='Symbol whose price triggers the order (default: --symbol)')
+@click.option('--price', type=float, default=None, help='Send a limit order at this price instead of a market order')
+def conditional(symbol, side, quantity, trail, above, below, after, watch, price):
+    """Client-side trailing stop / price-cross / time trigger (runs until it fires, Ctrl+C to cancel)"""
+    from market_stream import MarketStream
+    if sum(x is not None for x in (trail, above, below, after)) != 1:
+        print(f"{Fore.RED}[ERROR] Give exactly one of --trail, --above, --below, --after{Style.RESET_ALL}")
+        return
+    
+    conditional_orders = get_bot().conditional_orders
+    stream = MarketStream()
+    conditional_orders.attach_market_stream(stream)
+    if trail is not None:
+        result = conditional_orders.add_trailing_stop(symbol, side, quantity, trail, price)
+    elif after is not None:
+        result = conditional_orders.add_time_trigger(time.time() + after, symbol, side, quantity, price)
+    else:
+        direction, level = ('ABOVE', above) if above is not None else ('BELOW', below)
+        result = conditional_orders.add_price_trigger(watch or symbol, direction, level, symbol, side, quantity, price)
+    
+    if not result['success']:
+        print(f"{Fore.RED}[ERROR] Conditional order failed: {result['error']}{Style.RESET_ALL}")
+        return
+    
+    stream.start()
+    print(f"{Fore.GREEN}[SUCCESS] {result['kind']} trigger armed: {result['trigger_id']}{Style.RESET_ALL}")
+    try:
+        info = conditional_orders.get_trigger_status(result['trigger_id'])['trigger_info']
+        while info['status'] in ('ARMED', 'TRIGGERED'):
+            time.sleep(0.5)
+            info = conditional_orders.get_trigger_status(result['trigger_id'])['trigger_info']
+            last = conditional_orders.last_price.get(info['watch_symbol'])
+            print(f"\rLast: {last} | Trigger: {info['stop_price']}", end='', flush=True)
+        print(f"\nFinished: {info['status']} | Fired at {info['fire_price']} | Order ID: {info['order_id']}")
+        metrics = conditional_orders.get_metrics()
+        if 'tick_to_submit_p50_ms' in metrics:
+            print(f"Tick to submit: {metrics['tick_to_submit_p50_ms']:.3f}ms | Tick to ack: {metrics['tick_to_ack_p50_ms']:.1f}ms")
+    except KeyboardInterrupt:
+        conditional_orders.cancel_trigger(result['trigger_id'])
+        print("\nTrigger cancelled")
+    finally:
+        stream.stop()
+
+@cli.command()
+@click.option('--file', 'path', required=True, type=click.Path(exists=True, dir_okay=False), help='Orders file (.csv or .jsonl)')
+@click.option('--results', default=None, help='Results file (default: <file>.results.jsonl)')
+@click.option('--concurrency', type=int, default=None, help=f'Batch calls in flight (default: {Config.BATCH_CONCURRENCY})')
+def batch(path, results, concurrency):
+    """Submit orders in bulk from a CSV/JSONL file (columns: symbol, side, type, quantity, price, stop_price, time_in_force, reduce_only, client_id)"""
+    results = results or f"{path}.results.jsonl"
+    
+    def progress(stats, elapsed):
+        done = stats['succeeded'] + stats['failed']
+        print(f"\rDone: {done}/{stats['submitted']} | {done / elapsed if elapsed else 0:.1f} orders/s", end='', flush=True)
+    
+    result = get_bot().batch_orders.submit_file(path, results, concurrency, progress)
+    print()
+    print(f"{Fore.GREEN}[SUCCESS] Batch finished in {result['elapsed_seconds']:.2f}s ({result['orders_per_second']:.1f} orders/s){Style.RESET_ALL}")
+    print(f"Rows: {result['rows']} | Submitted: {result['submitted']} in {result['batches']} batches")
+    print(f"Succeeded: {result['succeeded']} | Failed: {result['failed']} | Invalid: {result['invalid']}")
+    print(f"Results: {results}")
+
+@cli.command()
+@click.option('--top', type=int, default=Config.SCAN_TOP, help=f'Candidates to show (default: {Config.SCAN_TOP})')
+@click.option('--universe', type=int, default=Config.SCAN_UNIVERSE, help='Most liquid symbols to pull klines for')
+@click.option('--interval', default=Config.SCAN_INTERVAL, help=f'Kline interval (default: {Config.SCAN_INTERVAL})')
+@click.option('--lookback', type=int, default=Config.SCAN_LOOKBACK, help='Bars of history per symbol')
+@click.option('--min-volume', type=float, default=Config.SCAN_MIN_QUOTE_VOLUME, help='Minimum 24h quote volume (USDT)')
+@click.option('--refresh', is_flag=True, help='Ignore cached tickers / funding')
+@click.option('--quantity', default=0.01, help='Order quantity for the suggested grid commands')
+def scan(top, universe, interval, lookback, min_volume, refresh, quantity):
+    """Rank USDT-M perpetuals as grid candidates (bulk tickers + funding + cached klines)"""
+    from scanner import MarketScanner
+    result = MarketScanner(get_bot().client).scan(top, universe, interval, lookback, min_volume, refresh)
+    if not result['success']:
+        print(f"{Fore.RED}[ERROR] Scan failed: {result['error']}{Style.RESET_ALL}")
+        return
+    
+    print(f"\n{Fore.CYAN}=== GRID CANDIDATES ({result['symbols_ranked']} ranked of {result['symbols_scanned']}, "
+          f"{result['lookback']} x {result['interval']}, {result['elapsed_seconds']:.2f}s) ==={Style.RESET_ALL}")
+    print(f"{'Symbol':<14}{'Score':>8}{'Price':>14}{'Vol 24h':>10}{'Range':>8}{'Bar':>8}{'Eff':>6}{'Funding':>10}{'Spread':>8}{'Levels':>7}")
+    for c in result['candidates']:
+        print(f"{c['symbol']:<14}{c['score']*100:>8.3f}{c['price']:>14.8g}{c['quote_volume']/1e6:>9.0f}M"
+              f"{c['range_24h']*100:>7.2f}%{c['bar_range']*100:>7.2f}%{c['efficiency']:>6.2f}"
+              f"{c['funding_rate']*100:>9.4f}%{c['grid_spread']*100:>7.2f}%{c['grid_levels']:>7}")
+    
+    if result['candidates']:
+        best = result['candidates'][0]
+        print(f"\nTop pick: python src/bot.py grid --symbol {best['symbol']} --base-price {best['base_price']:.8g} "
+              f"--levels {best['grid_levels']} --spread {best['grid_spread']} --quantity {quantity}")
+
+@cli.command('sync-klines')
+@click.option('--symbols', required=True, help='Comma-separated symbols (e.g. BTCUSDT,ETHUSDT)')
+@click.option('--intervals', default='1m', help='Comma-separated kline intervals (default: 1m)')
+@click.option('--days', type=float, default=Config.KLINE_SYNC_DAYS, help=f'History kept in sync (default: {Config.KLINE_SYNC_DAYS})')
+@click.option('--workers', type=int, default=None, help='Parallel page fetches (default: Config.KLINE_SYNC_WORKERS)')
+@click.option('--data-dir', default=None, help='Kline store directory (default: Config.KLINE_DIR)')
+def sync_klines(symbols, intervals, days, workers, data_dir):
+    """Fetch only the klines missing from the local store (paginated, rate-limited by weight)"""
+    from kline_store import KlineStore
+    from kline_sync import KlineSync
+    bot = get_bot()
+    if bot.client is None:
+        print(f"{Fore.RED}[ERROR] Kline sync needs an API connection{Style.RESET_ALL}")
+        return
+    
+    store = KlineStore(data_dir)
+    started = time.perf_counter()
+    since = int(time.time() * 1000) - int(days * 86_400_000)
+    result = KlineSync(bot.client, store, workers).sync_many(_parse_list(symbols, str.strip), _parse_list(intervals, str.strip), since)
+    for (symbol, interval), added in result.items():
+        print(f"{symbol:<14}{interval:<6}+{added:<8}stored: {store.count(symbol, interval)}")
+    print(f"{Fore.GREEN}[SUCCESS] {sum(result.values())} klines synced in {time.perf_counter() - started:.2f}s{Style.RESET_ALL}")
+
+@cli.command('import-klines')
+@click.option('--symbol', required=True, help='Trading symbol')
+@click.option('--interval', default='1m', help='Kline interval (default: 1m)')
+@click.option('--data-dir', default=None, help='Kline store directory (default: Config.KLINE_DIR)')
+@click.argument('files', nargs=-1, required=True)
+def import_klines(symbol, interval, data_dir, files):
+    """Import Binance kline CSV/ZIP dumps into the local kline store"""
+    from kline_store import KlineStore
+    store = KlineStore(data_dir)
+    for path in files:
+        try:
+            rows = store.import_csv(symbol, interval, path)
+            print(f"{Fore.GREEN}[SUCCESS] {path}: {rows} klines imported{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}[ERROR] {path}: {str(e)}{Style.RESET_ALL}")
+    print(f"Stored: {store.count(symbol, interval)} klines for {symbol.upper()} {interval}")
+
+@cli.group()
+def backtest():
+    """Backtest strategies over stored klines (no API connection needed)"""
+    pass
+
+@backtest.command('grid')
+@click.option('--symbol', required=True, help='Trading symbol')
+@click.option('--interval', default='1m', help='Kline interval (default: 1m)')
+@click.option('--levels', default=str(Config.DEFAULT_GRID_LEVELS), help='Grid levels to test, comma-separated (e.g. 5,10,20)')
+@click.option('--spread', default=str(Config.DEFAULT_GRID_SPREAD), help='Grid spreads to test, comma-separated (e.g. 0.005,0.01)')
+@click.option('--quantity', default=0.01, help='Order quantity per level (default: 0.01)')
+@click.option('--base-price', type=float, default=None, help='Grid base price (default: first open in range)')
+@click.option('--fee', type=float, default=None, help='Fee rate per fill (default: Config.BACKTEST_FEE_RATE)')
+@click.option('--workers', type=int, default=None, help='Parallel worker processes (default: all cores)')
+@click.option('--data-dir', default=None, help='Kline store directory (default: Config.KLINE_DIR)')
+@click.option('--top', default=10, help='Number of best configurations to show (default: 10)')
+def backtest_grid(symbol, interval, levels, spread, quantity, base_price, fee, workers, data_dir, top):
+    """Sweep grid levels/spread over historical klines (each level fills once, as in the live grid)"""
+    from backtest import sweep_grid
+    try:
+        result = sweep_grid(symbol, interval, _parse_list(levels, int), _parse_list(spread), quantity,
+                            base_price=base_price, fee_rate=fee, workers=workers, data_dir=data_dir)
+    except Exception as e:
+        print(f"{Fore.RED}[ERROR] Grid backtest failed: {str(e)}{Style.RESET_ALL}")
+        return
+    
+    print(f"\n{Fore.CYAN}=== GRID BACKTEST {result['symbol']} ({result['bars']} bars, {result['configs']} configs, {result['elapsed_seconds']:.1f}s) ==={Style.RESET_ALL}")
+    print(f"{Fore.YELLOW}Levels fill once - the live grid doesn't re-arm filled levels, so neither does the backtest{Style.RESET_ALL}")
+    for r in result['results'][:top]:
+        print(f"Levels: {r['grid_levels']:>3} | Spread: {r['grid_spread']*100:.2f}% | PnL: {r['pnl']:>12.2f} | "
+              f"Round trips: {r['round_trips']:>6} | Max inv: {r['max_inventory']:.4f} | In range: {r['time_in_range']*100:.0f}%")
+
+@backtest.command('twap')
+@click.option('--symbol', required=True, help='Trading symbol')
+@click.option('--side', required=True, type=click.Choice(['BUY', 'SELL']), help='Order side')
+@click.option('--quantity', required=True, type=float, help='Total order quantity')
+@click.option('--interval', default='1m', help='Kline interval (default: 1m)')
+@click.option('--duration', default=str(Config.DEFAULT_TWAP_DURATION), help='Durations in seconds, comma-separated')
+@click.option('--intervals', 'intervals_', default=str(Config.DEFAULT_TWAP_INTERVALS), help='Chunk counts, comma-separated')
+@click.option('--stride', default=1, help='Bars between simulated start times (default: 1)')
+@click.option('--workers', type=int, default=None, help='Parallel worker processes (default: all cores)')
+@click.option('--data-dir', default=None, help='Kline store directory (default: Config.KLINE_DIR)')
+def backtest_twap(symbol, side, quantity, interval, duration, intervals_, stride, workers, data_dir):
+    """Sweep TWAP duration/intervals over historical klines"""
+    from backtest import sweep_twap
+    try:
+        result = sweep_twap(symbol, interval, side, quantity, _parse_list(duration, int), _parse_list(intervals_, int),
+                            stride=stride, workers=workers, data_dir=data_dir)
+    except Exception as e:
+        print(f"{Fore.RED}[ERROR] TWAP backtest failed: {str(e)}{Style.RESET_ALL}")
+        return
+    
+    print(f"\n{Fore.CYAN}=== TWAP BACKTEST {result['symbol']} ({result['bars']} bars, {result['configs']} configs, {result['elapsed_seconds']:.1f}s) ==={Style.RESET_ALL}")
+    for r in result['results']:
+        print(f"Duration: {r['duration_seconds']:>6}s | Intervals: {r['intervals']:>4} | Shortfall: {r['shortfall_bps_mean']:>7.2f}bps "
+              f"(p95 {r['shortfall_bps_p95']:.2f}) | vs VWAP: {r['vs_vwap_bps_mean']:>6.2f}bps | Runs: {r['runs']}")
+
+@cli.command()
+@click.option('--symbols', required=True, help='Symbols to record, comma-separated (e.g. BTCUSDT,ETHUSDT)')
+@click.option('--streams', default=','.join(Config.RECORD_STREAMS), help='Streams to record, comma-separated')
+@click.option('--dir', 'directory', default=None, help='Tick directory (default: Config.TICK_DIR)')
+def record(symbols, streams, directory):
+    """Record live market data to memory-mapped tick files (Ctrl+C to stop)"""
+    from market_stream import MarketStream
+    from tick_recorder import TickRecorder
+    recorder = TickRecorder(directory)
+    stream = MarketStream()
+    try:
+        recorder.attach(stream, [s.upper() for s in _parse_list(symbols, str)], _parse_list(streams, str))
+        stream.start()
+        print(f"{Fore.GREEN}[OK] Recording {', '.join(stream.streams())} to {recorder.directory}{Style.RESET_ALL}")
+        while True:
+            time.sleep(Config.TICK_FLUSH_INTERVAL)
+            recorder.flush()
+            print(f"\rRecords: {recorder.records}", end='', flush=True)
+    except KeyboardInterrupt:
+        print()
+    except Exception as e:
+        print(f"{Fore.RED}[ERROR] Recorder failed: {str(e)}{Style.RESET_ALL}")
+    finally:
+        stream.stop()
+        recorder.close()
+        print(f"Recorded {recorder.records} records")
+
+@cli.command()
+@click.option('--dir', 'directory', default=None, help='Tick directory (default: Config.TICK_DIR)')
+@click.option('--symbols', default=None, help='Only replay these symbols, comma-separated')
+@click.option('--speed', default=1.0, help='Replay speed multiplier, 0 = as fast as possible (default: 1)')
+@click.option('--verbose', is_flag=True, help='Print every replayed event')
+def replay(directory, symbols, speed, verbose):
+    """Replay recorded market data"""
+    from market_stream import MarketStream
+    from tick_recorder import TickReplay
+    stream = MarketStream()
+    if verbose:
+        for name in ['aggTrade', 'bookTicker', Config.DEPTH_STREAM]:
+            stream.subscribe('*', name, lambda symbol, data, name=name: print(f"{symbol}@{name} {data}"))
+    
+    result = TickReplay(directory).run(stream, speed=speed, symbols=_parse_list(symbols, str) if symbols else None)
+    print(f"{Fore.GREEN}[SUCCESS] Replayed {result['trades']} trades, {result['book_tickers']} book tickers, "
+          f"{result['depth_updates']} depth updates in {result['elapsed_seconds']:.2f}s{Style.RESET_ALL}")
+
+@cli.command()
+@click.option('--scenario', default='orders', type=click.Choice(['orders', 'grid', 'twap']), help='orders (limit + cancel, some market), grid or twap')
+@click.option('--steps', default=','.join(map(str, Config.LOADTEST_STEPS)), help='Concurrent workers per step, comma-separated')
+@click.option('--seconds', type=float, default=Config.LOADTEST_STEP_SECONDS, help='Duration of each step')
+@click.option('--latency-ms', type=float, default=Config.SIM_LATENCY_MS, help='Injected fixed latency per request')
+@click.option('--jitter-ms', type=float, default=Config.SIM_JITTER_MS, help='Mean of the injected latency tail')
+@click.option('--error-rate', type=float, default=Config.SIM_ERROR_RATE, help='Share of requests answered with an error')
+@click.option('--order-limit', type=int, default=Config.LOADTEST_ORDER_LIMIT_PER_10S, help='Orders per 10s before -1015 (default: 0 = unlimited)')
+@click.option('--p99-limit-ms', type=float, default=Config.LOADTEST_P99_LIMIT_MS, help='Stop ramping once API p99 passes this')
+@click.option('--risk', is_flag=True, help='Run the pre-trade risk checks too')
+def loadtest(scenario, steps, seconds, latency_ms, jitter_ms, error_rate, order_limit, p99_limit_ms, risk):
+    """Ramp concurrent strategies against a local exchange stand-in (no API connection needed)"""
+    from loadtest import run_load_test
+    print(f"{Fore.CYAN}=== LOAD TEST: {scenario} ({latency_ms}ms + ~{jitter_ms}ms, {error_rate*100:.1f}% errors) ==={Style.RESET_ALL}")
+    print(f"{'Workers':>8}{'Orders/s':>10}{'Req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'Op p99':>9}{'Errors':>9}{'-1015':>7}{'Lag p99':>9}")
+    
+    def progress(step):
+        color = Fore.RED if step['saturated'] else ''
+        lag = f"{step['stream_lag_p99_ms']:.1f}" if step['stream_lag_p99_ms'] is not None else '-'
+        print(f"{color}{step['concurrency']:>8}{step['orders_per_second']:>10.1f}{step['requests_per_second']:>9.1f}"
+              f"{step['api_p50_ms'] or 0:>9.1f}{step['api_p99_ms'] or 0:>9.1f}{step['op_p99_ms'] or 0:>9.1f}"
+              f"{step['error_rate']*100:>8.1f}%{step['order_limited']:>7}{lag:>9}{Style.RESET_ALL}")
+    
+    result = run_load_test(scenario, _parse_list(steps, int), seconds, latency_ms, jitter_ms, error_rate,
+                           order_limit, risk, p99_limit_ms, progress)
+    sustained = result['sustained']
+    if sustained is None:
+        print(f"{Fore.RED}Saturated at the first step{Style.RESET_ALL}")
+    else:
+        print(f"{Fore.GREEN}Sustained: {sustained['concurrency']} workers, {sustained['orders_per_second']:.1f} orders/s "
+              f"at p99 {sustained['api_p99_ms']:.1f}ms{Style.RESET_ALL}")
+    server = result['server']
+    print(f"Server: {sum(server['requests'].values())} requests | {server['rejected_orders']} orders over the limit | "
+          f"{server['injected_errors']} injected errors | {server['open_orders']} left open")
+
+@cli.command()
+@click.option('--host', default=Config.SIGNAL_HOST, help=f'HTTP bind address (default: {Config.SIGNAL_HOST})')
+@click.option('--port', type=int, default=Config.SIGNAL_PORT, help=f'HTTP port (default: {Config.SIGNAL_PORT})')
+@click.option('--unix-socket', default=Config.SIGNAL_UNIX_SOCKET, help='Also listen on this Unix socket path')
+@click.option('--no-http', is_flag=True, help='Unix socket only')
+@click.option('--workers', type=int, default=Config.SIGNAL_WORKERS, help=f'Threads placing orders (default: {Config.SIGNAL_WORKERS})')
+def serve(host, port, unix_socket, no_http, workers):
+    """Accept signed trading signals over HTTP / a Unix socket and place them with warm managers"""
+    from signal_server import SignalRouter, SignalServer
+    if not Config.SIGNAL_SECRET:
+        print(f"{Fore.RED}[ERROR] Set SIGNAL_SECRET first - every signal must be signed with it{Style.RESET_ALL}")
+        return
+    if no_http and not unix_socket:
+        print(f"{Fore.RED}[ERROR] --no-http needs --unix-socket{Style.RESET_ALL}")
+        return
+    
+    bot = get_bot()
+    router = SignalRouter(bot.market_orders, bot.limit_orders, bot.twap_orders, bot.grid_orders, workers=workers)
+    server = SignalServer(router, host, port, unix_socket, http=not no_http).start()
+    print(f"{Fore.GREEN}[SUCCESS] Accepting signals on {' and '.join(filter(None, [server.url, unix_socket]))} "
+          f"(POST /signal, GET /metrics, Ctrl+C to stop){Style.RESET_ALL}")
+    shown = 0
+    try:
+        while True:
+            time.sleep(1)
+            m = router.get_metrics()
+            done = m.get('placed', 0) + m.get('failed', 0)
+            for r in (list(router.recent)[shown - done:] if done > shown else []):
+                color = Fore.GREEN if r['success'] else Fore.RED
+                print(f"\n{color}{r['signal_id']} {r['type']} {r['symbol']} -> {r['order_id'] or r['error']} "
+                      f"({r['latency_ms']:.1f}ms){Style.RESET_ALL}")
+            shown = done
+            print(f"\rAccepted: {m.get('accepted', 0)} | Rejected: {m.get('rejected', 0)} | Duplicates: {m.get('duplicate', 0)} | "
+                  f"Placed: {m.get('placed', 0)} | Failed: {m.get('failed', 0)} | "
+                  f"Signal-to-order p50/p99: {m.get('received_to_ack_p50_ms', 0):.1f}/{m.get('received_to_ack_p99_ms', 0):.1f}ms",
+                  end='', flush=True)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.stop()
+
 if __name__ == '__main__':
     print(f"{Fore.BLUE}{'='*50}")
     print(f"  BINANCE FUTURES TRADING BOT")
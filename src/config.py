@@ -25,7 +25,158 @@ class Config:
     # Grid trading defaults - these work well for BTC in my experience
     DEFAULT_GRID_LEVELS = 10     # Sweet spot between coverage and complexity
     DEFAULT_GRID_SPREAD = 0.01   # 1% - conservative but profitable
+    GRID_RECENTER_BAND = 0.5     # Share of the levels on one side price may travel before the ladder follows
+    GRID_RECENTER_COOLDOWN = 5   # Minimum seconds between automatic recenters of one grid
     
     # TWAP defaults - based on my testing with different market conditions
     DEFAULT_TWAP_DURATION = 300  # 5 minutes - good balance for most orders
-    DEFAULT_TWAP_INTERVALS = 10  # 10 chunks - not too aggressive, not too slow
\ No newline at end of file
+    DEFAULT_TWAP_INTERVALS = 10  # 10 chunks - not too aggressive, not too slow
+    
+    # Clock sync - Binance rejects signed requests (-1021) when our clock drifts, so we track the server's
+    TIME_SYNC_INTERVAL = 60          # Seconds between background samples
+    TIME_SYNC_SMOOTHING = 0.3        # EWMA factor for the offset estimate
+    TIME_SYNC_WINDOW = 64            # Round trips kept for recvWindow sizing
+    TIME_SYNC_BURST = 5              # Samples taken at startup and after a -1021
+    TIME_SYNC_RTT_SLACK_MS = 20      # Slack before a slow sample gets thrown away
+    CLOCK_SKEW_WARN_MS = 500         # Log a warning above this much skew
+    
+    # recvWindow adapts to observed latency: factor * p99 RTT + margin, clamped
+    RECV_WINDOW_DEFAULT = 5000       # Binance's own default until we have samples
+    RECV_WINDOW_LATENCY_FACTOR = 4
+    RECV_WINDOW_MARGIN_MS = 1000
+    RECV_WINDOW_MIN = 2000
+    RECV_WINDOW_MAX = 60000          # Hard cap enforced by Binance
+    
+    # Local market data - klines live here in a columnar memory-mapped layout
+    KLINE_DIR = os.getenv('KLINE_DIR', 'data/klines')
+    KLINE_SYNC_PAGE = 1500            # Klines per request - Binance's max, 10 weight each
+    KLINE_SYNC_DAYS = 30              # History pulled the first time a series is synced
+    KLINE_SYNC_WORKERS = 8            # Pages fetched in parallel across all symbols
+    
+    # Backtesting - taker fee on USDT-M futures, used to keep simulated P&L honest
+    BACKTEST_FEE_RATE = 0.0004
+    BACKTEST_WORKERS = os.cpu_count() or 1
+    
+    # Market data streams - one multiplexed websocket feeds everything
+    DEPTH_STREAM = 'depth@100ms'     # Diff depth at the fastest update speed
+    
+    # Tick recorder - fixed-width records in a ring of memory-mapped segment files
+    TICK_DIR = os.getenv('TICK_DIR', 'data/ticks')
+    TICK_SEGMENT_RECORDS = 1_000_000  # 64 bytes each, so ~64MB per segment
+    TICK_MAX_SEGMENTS = 48            # Oldest segments get deleted beyond this
+    RECORD_STREAMS = ['aggTrade', 'bookTicker', DEPTH_STREAM]
+    TICK_FLUSH_INTERVAL = 1           # Seconds between index flushes while recording
+    
+    # VWAP / POV execution - slices sized off the intraday volume curve
+    VOLUME_PROFILE_DAYS = 14          # Days of cached 1m klines behind the curve
+    VOLUME_PROFILE_ALPHA = 0.05       # How fast live minutes pull the curve
+    DEFAULT_POV_PARTICIPATION = 0.05  # 5% of market volume
+    SLICE_WORKERS = 4                 # Threads placing child orders for all sliced parents
+    
+    # Pre-trade risk limits - checked in-process on every order, no REST call
+    RISK_ENABLED = os.getenv('RISK_ENABLED', 'true').lower() == 'true'
+    RISK_MAX_ORDER_NOTIONAL = 50_000       # USDT per order
+    RISK_MAX_POSITION_NOTIONAL = 100_000   # USDT per symbol
+    RISK_MAX_POSITION_QTY = 1000           # Contracts per symbol
+    RISK_MAX_OPEN_ORDERS = 50              # Resting orders per symbol
+    RISK_MAX_MARGIN_USAGE = 0.9            # Share of wallet balance positions + orders may tie up
+    RISK_DEFAULT_LEVERAGE = 1              # Assumed until the account tells us otherwise
+    RISK_RESYNC_INTERVAL = 300             # Seconds before the book resyncs from the account endpoint
+    RISK_FILL_MEMORY = 10_000              # Orders remembered for fill de-duplication
+    RISK_PRICE_TTL = 5                     # Seconds a fetched mark price is reused for market order checks
+    DEMO_BALANCE = 10_000.0                # Demo mode wallet
+    DEMO_PRICES = {'BTCUSDT': 45000.0, 'ETHUSDT': 3000.0, 'ADAUSDT': 0.5}
+    DEMO_DEFAULT_PRICE = 100.0
+    
+    # Rate limits - Binance allows 300 orders / 10s on futures, we stay under it
+    ORDER_RATE_LIMIT_PER_SECOND = 25
+    ORDER_RATE_LIMIT_BURST = 50
+    REQUEST_WEIGHT_PER_SECOND = 30    # 2400 weight / minute on futures - leave headroom for trading
+    REQUEST_WEIGHT_BURST = 200
+    
+    # Bulk order submission
+    BATCH_ORDER_SIZE = 5              # Binance max orders per batchOrders call
+    BATCH_CONCURRENCY = 4             # Batch calls in flight at once
+    
+    # Strategy bookkeeping - keeps memory flat over weeks of uptime
+    STRATEGY_ORDER_HISTORY = 500      # Child orders kept per strategy (totals are tracked separately)
+    STRATEGY_ARCHIVE_SIZE = 200       # Finished strategies kept in memory
+    STRATEGY_ARCHIVE_FILE = os.getenv('STRATEGY_ARCHIVE_FILE', 'data/strategy_archive.jsonl')
+    
+    # Limit-order chasing - amend in place to stay at the top of book
+    CHASE_OFFSET_TICKS = 0            # Ticks behind the best bid/ask (0 = join the touch)
+    CHASE_MAX_REPRICES = 50           # Then the order is left resting where it is
+    CHASE_DEBOUNCE = 0.5              # Minimum seconds between amends of one order
+    CHASE_MAX_ERRORS = 5              # Consecutive failed amends before the chase ends FAILED
+    CHASE_WORKERS = 4                 # Threads sending amends for all chased orders
+    CHASE_FALLBACK_TICK_SIZE = 0.01   # Used when exchange info has no tick size (demo mode)
+    
+    # Client-side conditional orders (trailing stops, price-cross and time triggers)
+    CONDITIONAL_PRICE_STREAM = 'aggTrade'   # Last traded price drives the triggers
+    CONDITIONAL_WORKERS = 4                 # Threads sending triggered orders
+    CONDITIONAL_LATENCY_SAMPLES = 10_000    # Tick-to-submit samples kept for percentiles
+    CONDITIONAL_COMPACT_SHARE = 0.5         # Rebuild an index once this share of its entries are cancelled
+    
+    # Iceberg orders - only a small slice rests on the book at a time
+    ICEBERG_VARIANCE = 0.0            # Random +/- share applied to each visible slice (0.2 = +/-20%)
+    ICEBERG_WORKERS = 4               # Threads placing refills for all icebergs
+    ICEBERG_FALLBACK_STEP_SIZE = 0.001  # Used when exchange info has no step size (demo mode)
+    
+    # Local order books (snapshot + diff depth stream)
+    ORDER_BOOK_SNAPSHOT_LIMIT = 1000  # Levels per side in the REST snapshot
+    ORDER_BOOK_BUFFER = 1000          # Depth events held while a snapshot is in flight
+    ORDER_BOOK_SYNC_TIMEOUT = 10      # Seconds commands wait for a book before sending blind
+    ORDER_BOOK_SPLIT_DELAY = 1.0      # Seconds between the pieces of a split market order
+    ORDER_BOOK_SPLIT_TIMEOUT = 60     # Seconds after which a split order drops the rest if the book is still too thin
+    
+    # Market scanner - ranks USDT-M perpetuals as grid candidates
+    SCAN_CACHE_DIR = os.getenv('SCAN_CACHE_DIR', 'data/scan')
+    SCAN_CACHE_TTL = 60               # Seconds the bulk ticker / premium index responses are reused
+    SCAN_EXCHANGE_INFO_TTL = 3600     # Listings change rarely
+    SCAN_INTERVAL = '1h'              # Kline interval behind the volatility metrics
+    SCAN_LOOKBACK = 72                # Bars per symbol (3 days of 1h)
+    SCAN_UNIVERSE = 30                # Most liquid symbols that get kline metrics
+    SCAN_TOP = 10                     # Candidates shown
+    SCAN_MIN_QUOTE_VOLUME = 50_000_000  # USDT traded in 24h - thinner books are skipped
+    SCAN_FUNDING_WEIGHT = 3           # Funding periods charged against the score (a grid sits on inventory)
+    SCAN_SPREAD_BAR_RANGE_MULT = 0.5  # Suggested spread as a share of the average bar range
+    SCAN_MIN_SPREAD = 0.002           # Below this a round trip barely covers fees
+    SCAN_MAX_SPREAD = 0.05
+    SCAN_MIN_LEVELS = 3               # Suggested levels per side
+    SCAN_MAX_LEVELS = 25
+    
+    # Signal ingest service (signal_server.py) - external alerts straight into the warm order managers
+    SIGNAL_SECRET = os.getenv('SIGNAL_SECRET')  # HMAC-SHA256 key senders sign the body with - required
+    SIGNAL_HOST = os.getenv('SIGNAL_HOST', '127.0.0.1')  # Local only unless you put a proxy in front
+    SIGNAL_PORT = int(os.getenv('SIGNAL_PORT', '8787'))
+    SIGNAL_UNIX_SOCKET = os.getenv('SIGNAL_UNIX_SOCKET')  # Optional - skips TCP for senders on the same box
+    SIGNAL_MAX_AGE_MS = 5000          # Signals timestamped further than this from now are refused (replay guard)
+    SIGNAL_MAX_BODY = 64 * 1024       # Bytes
+    SIGNAL_QUEUE_SIZE = 1000          # Accepted signals waiting for a worker - beyond this senders get a 503
+    SIGNAL_WORKERS = 4                # Threads placing orders for queued signals
+    SIGNAL_DEDUPE_SIZE = 100_000      # Signal ids remembered for de-duplication
+    SIGNAL_LATENCY_SAMPLES = 10_000   # Signal-to-order samples kept for percentiles
+    SIGNAL_RESULT_HISTORY = 20        # Recent results shown by the serve command
+    
+    # Exchange stand-in for load tests (exchange_sim.py) - nothing here touches the real API
+    SIM_SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT']
+    SIM_START_PRICES = {'BTCUSDT': 45000.0, 'ETHUSDT': 3000.0, 'BNBUSDT': 300.0, 'SOLUSDT': 100.0}
+    SIM_LATENCY_MS = 5.0              # Fixed per-request delay
+    SIM_JITTER_MS = 5.0               # Mean of the exponential tail on top
+    SIM_ERROR_RATE = 0.0              # Share of requests answered with a 5xx/429/408
+    SIM_ORDER_LIMIT_PER_10S = 300     # Binance's futures order count limit (0 = unlimited)
+    SIM_TICK_INTERVAL = 0.1           # Seconds between price steps
+    SIM_VOLATILITY = 0.0005           # Std of each price step
+    SIM_ORDER_MEMORY = 100_000        # Closed orders kept for status lookups
+    SIM_ACCEPT_BACKLOG = 256          # Pending connections the REST server queues
+    
+    # Load test ramp
+    LOADTEST_STEPS = [1, 2, 4, 8, 16, 32]  # Concurrent workers per step
+    LOADTEST_STEP_SECONDS = 10
+    LOADTEST_P99_LIMIT_MS = 500       # A step whose API p99 goes past this counts as collapsed
+    LOADTEST_MAX_ERROR_RATE = 0.05
+    LOADTEST_ORDER_LIMIT_PER_10S = 0  # Stand-in order cap during ramps - off, so a step measures latency, not -1015s
+    LOADTEST_QUANTITY = 0.01
+    LOADTEST_GRID_LEVELS = 5
+    LOADTEST_TWAP_DURATION = 2
+    LOADTEST_TWAP_INTERVALS = 5
@@ -0,0 +1,485 @@
+import json
+import time
+import hmac
+import random
+import asyncio
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from websockets.asyncio.server import serve
+from config import Config
+from logger import bot_logger
+
+# Local stand-in for the slice of the Binance USDT-M futures API the bot talks to.
+# REST on a ThreadingHTTPServer, user and market streams on a websocket server, an in-memory
+# order store and a random-walk price per symbol that fills resting limits as it crosses them.
+# Latency and errors are injected per request so a load test can push the real client code path
+# as hard as it likes without touching testnet rate limits.
+#
+# Not a matching engine: market orders fill in full at the current price, limits fill in full
+# when the price trades through them. Enough to drive every manager's happy and error paths.
+
+ORDER_GONE = (-2011, 'Unknown order sent.')
+BAD_SIGNATURE = (-1022, 'Signature for this request is not valid.')
+TOO_MANY_ORDERS = (-1015, 'Too many new orders.')
+# What the error injection answers with - (http status, code, message)
+INJECTED_ERRORS = (
+    (503, -1001, 'Internal error; unable to process your request. Please try again.'),
+    (429, -1003, 'Too many requests; current limit is 2400 requests per minute.'),
+    (408, -1007, 'Timeout waiting for response from backend server.'),
+)
+
+
+class SimulatedExchange:
+    """Order store, prices and stream fan-out - the HTTP and websocket servers are thin shells around it"""
+
+    def __init__(self, symbols: list = None, api_key: str = None, api_secret: str = None,
+                 latency_ms: float = None, jitter_ms: float = None, error_rate: float = None,
+                 order_limit_per_10s: int = None, seed: int = None):
+        self.symbols = [s.upper() for s in (symbols or Config.SIM_SYMBOLS)]
+        self.api_key = api_key
+        self.api_secret = api_secret  # Signatures are checked only when a secret is set
+        self.latency_ms = Config.SIM_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = Config.SIM_JITTER_MS if jitter_ms is None else jitter_ms
+        self.error_rate = Config.SIM_ERROR_RATE if error_rate is None else error_rate
+        self.order_limit_per_10s = Config.SIM_ORDER_LIMIT_PER_10S if order_limit_per_10s is None else order_limit_per_10s
+        self.random = random.Random(seed)
+        self.prices = {s: Config.SIM_START_PRICES.get(s, 100.0) for s in self.symbols}
+        self.orders = OrderedDict()  # order id -> order dict, open and recently closed
+        self.open_orders = defaultdict(dict)  # symbol -> {order id: order}
+        self.balance = Config.DEMO_BALANCE
+        self.positions = defaultdict(float)
+        self.requests = defaultdict(int)  # "METHOD /path" -> count
+        self.injected_errors = 0
+        self.rejected_orders = 0
+        self._order_times = deque()  # Recent order timestamps for the 10s order limit
+        self._ids = itertools.count(1_000_000)
+        self._lock = threading.Lock()
+        self._listeners = set()  # (loop, queue) of connected user streams
+        self._market_listeners = set()  # (loop, queue, streams) of connected market streams
+
+    # --- request plumbing ----------------------------------------------------
+
+    def delay(self):
+        """Injected latency - a fixed floor plus an exponential tail, like a real network"""
+        delay = self.latency_ms + (self.random.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def injected_error(self):
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            return self.random.choice(INJECTED_ERRORS)
+        return None
+
+    def check_signature(self, query: str) -> bool:
+        if not self.api_secret:
+            return True
+        payload, _, signature = query.rpartition('&signature=')
+        # requests re-quotes characters like [ ] after the client signed - accept either form, as Binance does
+        for candidate in (payload, unquote(payload)):
+            expected = hmac.new(self.api_secret.encode(), candidate.encode(), hashlib.sha256).hexdigest()
+            if hmac.compare_digest(expected, signature):
+                return True
+        return False
+
+    def _order_allowed(self, count: int = 1) -> bool:
+        if not self.order_limit_per_10s:
+            return True
+        now = time.monotonic()
+        while self._order_times and now - self._order_times[0] > 10:
+            self._order_times.popleft()
+        if len(self._order_times) + count > self.order_limit_per_10s:
+            self.rejected_orders += count
+            return False
+        self._order_times.extend([now] * count)
+        return True
+
+    # --- orders --------------------------------------------------------------
+
+    def create_order(self, params: dict) -> dict:
+        symbol = params.get('symbol', '').upper()
+        if symbol not in self.prices:
+            raise SimError(-1121, 'Invalid symbol.')
+        order_type = params.get('type', 'LIMIT')
+        if order_type not in ('MARKET', 'LIMIT'):
+            raise SimError(-1116, 'Invalid orderType.')
+        try:
+            quantity = float(params['quantity'])
+            price = float(params.get('price') or 0)
+        except (KeyError, ValueError):
+            raise SimError(-1102, 'Mandatory parameter was not sent, was empty/null, or malformed.')
+        if quantity <= 0 or (order_type == 'LIMIT' and price <= 0):
+            raise SimError(-4003, 'Quantity/price less than or equal to zero.')
+
+        with self._lock:
+            if not self._order_allowed():
+                raise SimError(*TOO_MANY_ORDERS)
+            order = {
+                'orderId': next(self._ids),
+                'symbol': symbol,
+                'status': 'NEW',
+                'clientOrderId': params.get('newClientOrderId') or f"sim{self.random.getrandbits(48):x}",
+                'price': f"{price}",
+                'avgPrice': '0',
+                'origQty': f"{quantity}",
+                'executedQty': '0',
+                'cumQuote': '0',
+                'timeInForce': params.get('timeInForce', 'GTC'),
+                'type': order_type,
+                'reduceOnly': params.get('reduceOnly') == 'true',
+                'side': params.get('side', 'BUY').upper(),
+                'stopPrice': '0',
+                'positionSide': 'BOTH',
+                'updateTime': int(time.time() * 1000)
+            }
+            self.orders[order['orderId']] = order
+            while len(self.orders) > Config.SIM_ORDER_MEMORY:
+                self.orders.popitem(last=False)  # Resting orders stay reachable through open_orders
+            current = self.prices[symbol]
+            marketable = order_type == 'MARKET' or (order['side'] == 'BUY' and price >= current) or \
+                (order['side'] == 'SELL' and price <= current)
+            if marketable:
+                self._fill(order, current if order_type == 'MARKET' else price)
+            else:
+                self.open_orders[symbol][order['orderId']] = order
+            events = [self._order_event(order)]
+        self._publish(events)
+        return dict(order)
+
+    def cancel_order(self, symbol: str, order_id) -> dict:
+        with self._lock:
+            order = self.open_orders[symbol.upper()].pop(int(order_id), None)
+            if order is None:
+                raise SimError(*ORDER_GONE)
+            order['status'] = 'CANCELED'
+            order['updateTime'] = int(time.time() * 1000)
+            events = [self._order_event(order)]
+        self._publish(events)
+        return dict(order)
+
+    def modify_order(self, params: dict) -> dict:
+        symbol = params.get('symbol', '').upper()
+        with self._lock:
+            order = self.open_orders[symbol].get(int(params.get('orderId', 0)))
+            if order is None:
+                raise SimError(*ORDER_GONE)
+            price = float(params['price'])
+            if f"{price}" == order['price']:
+                raise SimError(-5027, 'No need to modify the order.')
+            order['price'] = f"{price}"
+            order['origQty'] = f"{float(params.get('quantity', order['origQty']))}"
+            order['updateTime'] = int(time.time() * 1000)
+            current = self.prices[symbol]
+            if (order['side'] == 'BUY' and price >= current) or (order['side'] == 'SELL' and price <= current):
+                del self.open_orders[symbol][order['orderId']]
+                self._fill(order, price)
+            events = [self._order_event(order)]
+        self._publish(events)
+        return dict(order)
+
+    def get_order(self, symbol: str, order_id) -> dict:
+        order = self.orders.get(int(order_id)) or self.open_orders[symbol.upper()].get(int(order_id))
+        if order is None or order['symbol'] != symbol.upper():
+            raise SimError(-2013, 'Order does not exist.')
+        return dict(order)
+
+    def get_open_orders(self, symbol: str = None) -> list:
+        with self._lock:
+            books = [self.open_orders[symbol.upper()]] if symbol else list(self.open_orders.values())
+            return [dict(o) for book in books for o in book.values()]
+
+    def _fill(self, order: dict, price: float):
+        """Fill in full - call with the lock held"""
+        quantity = float(order['origQty'])
+        order['status'] = 'FILLED'
+        order['executedQty'] = order['origQty']
+        order['avgPrice'] = f"{price}"
+        order['cumQuote'] = f"{quantity * price}"
+        order['updateTime'] = int(time.time() * 1000)
+        self.positions[order['symbol']] += quantity if order['side'] == 'BUY' else -quantity
+
+    def _order_event(self, order: dict) -> dict:
+        """ORDER_TRADE_UPDATE in the user stream's shape"""
+        now = int(time.time() * 1000)
+        return {
+            'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now,
+            'o': {
+                's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+                'f': order['timeInForce'], 'q': order['origQty'], 'p': order['price'], 'ap': order['avgPrice'],
+                'sp': '0', 'x': 'TRADE' if order['status'] == 'FILLED' else order['status'],
+                'X': order['status'], 'i': order['orderId'], 'l': order['executedQty'], 'z': order['executedQty'],
+                'L': order['avgPrice'], 'T': now, 'R': order['reduceOnly'], 'ps': 'BOTH'
+            }
+        }
+
+    # --- prices --------------------------------------------------------------
+
+    def tick(self):
+        """Move every price one random-walk step and fill the resting orders it crossed"""
+        events, market = [], []
+        now = int(time.time() * 1000)
+        with self._lock:
+            for symbol, price in self.prices.items():
+                price = round(price * (1 + self.random.gauss(0, Config.SIM_VOLATILITY)), 2)
+                self.prices[symbol] = price
+                crossed = [o for o in self.open_orders[symbol].values()
+                           if (o['side'] == 'BUY' and float(o['price']) >= price) or
+                              (o['side'] == 'SELL' and float(o['price']) <= price)]
+                for order in crossed:
+                    del self.open_orders[symbol][order['orderId']]
+                    self._fill(order, float(order['price']))
+                    events.append(self._order_event(order))
+                market.append((symbol, 'aggTrade', {'e': 'aggTrade', 'E': now, 's': symbol, 'p': f"{price}",
+                                                    'q': '1', 'T': now, 'm': False}))
+                market.append((symbol, 'bookTicker', {'e': 'bookTicker', 'E': now, 's': symbol,
+                                                      'b': f"{price - 0.01:.2f}", 'B': '10',
+                                                      'a': f"{price + 0.01:.2f}", 'A': '10'}))
+        self._publish(events)
+        self._publish_market(market)
+
+    def depth(self, symbol: str, limit: int) -> dict:
+        price = self.prices[symbol.upper()]
+        levels = range(1, min(int(limit), 1000) + 1)
+        return {
+            'lastUpdateId': next(self._ids),
+            'bids': [[f"{price - 0.1 * i:.2f}", '1.000'] for i in levels],
+            'asks': [[f"{price + 0.1 * i:.2f}", '1.000'] for i in levels]
+        }
+
+    def exchange_info(self) -> dict:
+        return {
+            'timezone': 'UTC',
+            'serverTime': int(time.time() * 1000),
+            'symbols': [{
+                'symbol': s, 'status': 'TRADING', 'contractType': 'PERPETUAL', 'quoteAsset': 'USDT',
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'tickSize': '0.01', 'minPrice': '0.01', 'maxPrice': '1000000'},
+                    {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'}
+                ]
+            } for s in self.symbols]
+        }
+
+    def account(self) -> dict:
+        with self._lock:
+            return {
+                'totalWalletBalance': f"{self.balance}",
+                'availableBalance': f"{self.balance}",
+                'assets': [{'asset': 'USDT', 'walletBalance': f"{self.balance}"}],
+                'positions': [{'symbol': s, 'positionAmt': f"{q}", 'entryPrice': f"{self.prices[s]}",
+                               'unrealizedProfit': '0', 'leverage': '1'} for s, q in self.positions.items()]
+            }
+
+    # --- streams -------------------------------------------------------------
+
+    def _publish(self, events: list):
+        for loop, queue in list(self._listeners):
+            for event in events:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def _publish_market(self, payloads: list):
+        for loop, queue, streams in list(self._market_listeners):
+            for symbol, name, data in payloads:
+                stream = f"{symbol.lower()}@{name}"
+                if stream in streams:
+                    loop.call_soon_threadsafe(queue.put_nowait, {'stream': stream, 'data': data})
+
+    async def handle_socket(self, connection):
+        """/ws/<listenKey> is the user stream, /stream?streams=a/b is a combined market stream"""
+        path = urlparse(connection.request.path)
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        if path.path.startswith('/ws/'):
+            listener, listeners = (loop, queue), self._listeners
+        else:
+            streams = frozenset(parse_qs(path.query).get('streams', [''])[0].split('/'))
+            listener, listeners = (loop, queue, streams), self._market_listeners
+        listeners.add(listener)
+        try:
+            while True:
+                msg = await queue.get()
+                if msg is None:
+                    break  # Server shutting down
+                await connection.send(json.dumps(msg))
+        except Exception:
+            pass  # Client went away
+        finally:
+            listeners.discard(listener)
+
+
+class SimError(Exception):
+    def __init__(self, code: int, message: str, status: int = 400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+class _Handler(BaseHTTPRequestHandler):
+    exchange = None  # Set on the per-server subclass
+    protocol_version = 'HTTP/1.1'  # Keep-alive - requests.Session reuses connections like it would in production
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes - don't let delayed ACKs add 40ms
+
+    def log_message(self, format, *args):
+        pass  # Thousands of requests a second - the stats say enough
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        query = url.query or body
+        params = {k: v[0] for k, v in parse_qs(query).items()}
+        ex = self.exchange
+        ex.requests[f"{method} {url.path}"] += 1
+        ex.delay()
+
+        injected = ex.injected_error()
+        if injected is not None:
+            status, code, message = injected
+            return self._send(status, {'code': code, 'msg': message})
+        if 'signature' in params and not ex.check_signature(query):
+            return self._send(400, {'code': BAD_SIGNATURE[0], 'msg': BAD_SIGNATURE[1]})
+        try:
+            self._send(200, self._route(method, url.path, params))
+        except SimError as e:
+            self._send(e.status, {'code': e.code, 'msg': e.message})
+        except KeyError as e:
+            self._send(400, {'code': -1102, 'msg': f"Mandatory parameter {e} was not sent"})
+
+    def _route(self, method: str, path: str, params: dict):
+        ex = self.exchange
+        route = (method, path)
+        if route in (('GET', '/api/v3/ping'), ('GET', '/fapi/v1/ping')):
+            return {}
+        if route == ('GET', '/fapi/v1/time'):
+            return {'serverTime': int(time.time() * 1000)}
+        if route == ('GET', '/fapi/v1/exchangeInfo'):
+            return ex.exchange_info()
+        if route == ('GET', '/fapi/v2/account'):
+            return ex.account()
+        if route == ('GET', '/fapi/v1/openOrders'):
+            return ex.get_open_orders(params.get('symbol'))
+        if route == ('GET', '/fapi/v1/ticker/price'):
+            return {'symbol': params['symbol'].upper(), 'price': f"{ex.prices[params['symbol'].upper()]}"}
+        if route == ('GET', '/fapi/v1/premiumIndex'):
+            return {'symbol': params['symbol'].upper(), 'markPrice': f"{ex.prices[params['symbol'].upper()]}",
+                    'lastFundingRate': '0.0001', 'time': int(time.time() * 1000)}
+        if route == ('GET', '/fapi/v1/depth'):
+            return ex.depth(params['symbol'], params.get('limit', 500))
+        if path == '/fapi/v1/order':
+            if method == 'POST':
+                return ex.create_order(params)
+            if method == 'DELETE':
+                return ex.cancel_order(params['symbol'], params['orderId'])
+            if method == 'PUT':
+                return ex.modify_order(params)
+            return ex.get_order(params['symbol'], params['orderId'])
+        if path == '/fapi/v1/batchOrders':
+            if method == 'POST':
+                batch = json.loads(params['batchOrders'])
+                return [self._try(ex.create_order, order) for order in batch]
+            if method == 'PUT':
+                batch = json.loads(params['batchOrders'])
+                return [self._try(ex.modify_order, order) for order in batch]
+            ids = json.loads(params['orderIdList'])
+            return [self._try(ex.cancel_order, params['symbol'], order_id) for order_id in ids]
+        if path == '/fapi/v1/listenKey':
+            return {'listenKey': f"sim{ex.random.getrandbits(64):016x}"} if method == 'POST' else {}
+        raise SimError(-1000, f"Not simulated: {method} {path}", 404)
+
+    @staticmethod
+    def _try(call, *args):
+        """Batch endpoints answer per entry - one bad order doesn't fail the call"""
+        try:
+            return call(*args)
+        except SimError as e:
+            return {'code': e.code, 'msg': e.message}
+
+    def _send(self, status: int, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _SimHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = Config.SIM_ACCEPT_BACKLOG  # The default of 5 drops connections long before the handlers are busy
+
+
+class ExchangeSimulator:
+    """Runs the REST server, the websocket server and the price ticker on background threads"""
+
+    def __init__(self, exchange: SimulatedExchange = None, host: str = '127.0.0.1', port: int = 0, ws_port: int = 0):
+        self.exchange = exchange or SimulatedExchange()
+        handler = type('SimHandler', (_Handler,), {'exchange': self.exchange})
+        self.http = _SimHTTPServer((host, port), handler)
+        self.host = host
+        self.ws_port = ws_port
+        self._loop = None
+        self._ws_server = None
+        self._ws_ready = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.http.server_address[1]}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.ws_port}"
+
+    def start(self):
+        for target, name in ((self.http.serve_forever, 'sim-http'), (self._run_ws, 'sim-ws'), (self._run_ticker, 'sim-ticker')):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+        self._ws_ready.wait(5)
+        bot_logger.logger.info(f"SIM: exchange stand-in on {self.base_url} / {self.ws_url}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.http.shutdown()
+        self.http.server_close()
+        if self._loop is not None:
+            # Close the connections properly first - stopping the loop under them leaves tasks dangling
+            asyncio.run_coroutine_threadsafe(self._close_ws(), self._loop).result(5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run_ws(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._open_ws())
+        self._ws_ready.set()
+        self._loop.run_forever()
+    
+    async def _open_ws(self):
+        self._ws_server = await serve(self.exchange.handle_socket, self.host, self.ws_port)
+        self.ws_port = self._ws_server.sockets[0].getsockname()[1]
+    
+    async def _close_ws(self):
+        for listener in list(self.exchange._listeners) + list(self.exchange._market_listeners):
+            listener[1].put_nowait(None)  # Handlers sit in queue.get() - wake them so they can exit
+        self._ws_server.close()
+        await self._ws_server.wait_closed()
+
+    def _run_ticker(self):
+        while not self._stop.wait(Config.SIM_TICK_INTERVAL):
+            self.exchange.tick()
@@ -0,0 +1,142 @@
+import os
+import csv
+import io
+import json
+import zipfile
+import numpy as np
+from config import Config
+from logger import bot_logger
+
+# Local kline storage - one flat binary file per column so reads are a plain np.memmap.
+# Layout: <root>/<SYMBOL>/<interval>/<column>.bin plus a small meta.json
+# Appending is just writing bytes to the end of each column file, no rewrite needed.
+KLINE_COLUMNS = (
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+)
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000,
+}
+
+
+class KlineStore:
+    def __init__(self, root: str = None):
+        self.root = root or Config.KLINE_DIR
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def _column_file(self, symbol: str, interval: str, column: str) -> str:
+        return os.path.join(self.path(symbol, interval), f"{column}.bin")
+
+    def count(self, symbol: str, interval: str) -> int:
+        """Number of stored klines - derived from the open_time file size, no reads needed"""
+        path = self._column_file(symbol, interval, 'open_time')
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(np.int64).itemsize
+
+    def read(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> dict:
+        """Memory-map every column - slices are views, nothing is copied until you touch it"""
+        n = self.count(symbol, interval)
+        if n == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS}
+
+        columns = {
+            name: np.memmap(self._column_file(symbol, interval, name), dtype=dtype, mode='r', shape=(n,))
+            for name, dtype in KLINE_COLUMNS
+        }
+
+        # open_time is sorted, so range selection is two binary searches
+        lo = 0 if start_ms is None else int(np.searchsorted(columns['open_time'], start_ms, side='left'))
+        hi = n if end_ms is None else int(np.searchsorted(columns['open_time'], end_ms, side='right'))
+        return {name: col[lo:hi] for name, col in columns.items()}
+
+    def tail(self, symbol: str, interval: str, bars: int) -> dict:
+        """The most recent `bars` klines as memmap views - fewer if the store doesn't have that many yet"""
+        n = self.count(symbol, interval)
+        if n == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in KLINE_COLUMNS}
+        return {name: col[max(n - bars, 0):] for name, col in self.read(symbol, interval).items()}
+
+    def last_open_time(self, symbol: str, interval: str):
+        n = self.count(symbol, interval)
+        if n == 0:
+            return None
+        times = np.memmap(self._column_file(symbol, interval, 'open_time'), dtype=np.int64, mode='r', shape=(n,))
+        return int(times[-1])
+
+    def append(self, symbol: str, interval: str, columns: dict) -> int:
+        """Append klines (dict of equal-length arrays). Rows at or before the last stored kline are skipped."""
+        open_time = np.asarray(columns['open_time'], dtype=np.int64)
+        last = self.last_open_time(symbol, interval)
+        keep = open_time > last if last is not None else np.ones(len(open_time), dtype=bool)
+        if not keep.any():
+            return 0
+
+        os.makedirs(self.path(symbol, interval), exist_ok=True)
+        # open_time goes last - count() comes from its size, so a reader mid-append never maps past the other columns
+        for name, dtype in KLINE_COLUMNS[1:] + KLINE_COLUMNS[:1]:
+            values = np.ascontiguousarray(np.asarray(columns[name], dtype=dtype)[keep])
+            with open(self._column_file(symbol, interval, name), 'ab') as f:
+                f.write(values.tobytes())
+
+        self._write_meta(symbol, interval)
+        return int(keep.sum())
+
+    def _write_meta(self, symbol: str, interval: str):
+        meta = {
+            'symbol': symbol.upper(),
+            'interval': interval,
+            'count': self.count(symbol, interval),
+            'last_open_time': self.last_open_time(symbol, interval),
+            'columns': [name for name, _ in KLINE_COLUMNS],
+        }
+        with open(os.path.join(self.path(symbol, interval), 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def import_csv(self, symbol: str, interval: str, csv_path: str, chunk_rows: int = 100_000) -> int:
+        """Import Binance kline CSV dumps (plain or .zip, like data.binance.vision) in fixed-size chunks"""
+        imported = 0
+        for rows in self._iter_csv_chunks(csv_path, chunk_rows):
+            data = np.array(rows, dtype=np.float64)
+            imported += self.append(symbol, interval, {
+                'open_time': data[:, 0].astype(np.int64),
+                'open': data[:, 1],
+                'high': data[:, 2],
+                'low': data[:, 3],
+                'close': data[:, 4],
+                'volume': data[:, 5],
+            })
+        bot_logger.logger.info(f"KLINES: imported {imported} rows into {symbol.upper()} {interval} from {csv_path}")
+        return imported
+
+    def _iter_csv_chunks(self, csv_path: str, chunk_rows: int):
+        if csv_path.endswith('.zip'):
+            with zipfile.ZipFile(csv_path) as zf:
+                for name in zf.namelist():
+                    with zf.open(name) as raw:
+                        yield from self._read_rows(io.TextIOWrapper(raw), chunk_rows)
+        else:
+            with open(csv_path, newline='') as f:
+                yield from self._read_rows(f, chunk_rows)
+
+    @staticmethod
+    def _read_rows(f, chunk_rows: int):
+        rows = []
+        for row in csv.reader(f):
+            if not row or not row[0].strip().isdigit():
+                continue  # Newer dumps have a header line
+            rows.append(row[:6])
+            if len(rows) >= chunk_rows:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
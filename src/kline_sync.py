@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from binance.client import Client
+from config import Config
+from logger import bot_logger
+from kline_store import KlineStore, INTERVAL_MS
+from rate_limiter import request_weight_limiter
+
+# Incremental kline sync - tops the local store up from the exchange instead of re-downloading.
+# Only the range after the last stored kline is fetched. That range is cut into fixed-size pages
+# up front, so every page of every symbol goes through one shared pool in parallel, under the
+# request-weight limiter, and each series is still appended strictly in order.
+
+# Binance futures kline weight by limit
+KLINE_PAGE_WEIGHTS = ((100, 1), (500, 2), (1000, 5))
+
+# One lock per series directory, shared by every KlineSync - the store's files are shared too
+_series_locks = {}
+_series_locks_lock = threading.Lock()
+
+
+def kline_weight(limit: int) -> int:
+    for bound, weight in KLINE_PAGE_WEIGHTS:
+        if limit < bound:
+            return weight
+    return 10
+
+
+class KlineSync:
+    def __init__(self, client: Client, store: KlineStore = None, workers: int = None):
+        self.client = client
+        self.store = store or KlineStore()
+        self.workers = workers or Config.KLINE_SYNC_WORKERS
+
+    def _series_lock(self, symbol: str, interval: str) -> threading.Lock:
+        """So two syncs of one series never interleave appends, whichever instance runs them"""
+        key = os.path.abspath(self.store.path(symbol, interval))
+        with _series_locks_lock:
+            return _series_locks.setdefault(key, threading.Lock())
+
+    def pages(self, symbol: str, interval: str, since_ms: int = None, now_ms: int = None) -> list:
+        """(start, end) windows still missing from the store - empty when it's up to date"""
+        step = INTERVAL_MS[interval]
+        now_ms = now_ms or int(time.time() * 1000)
+        since_ms = since_ms or now_ms - Config.KLINE_SYNC_DAYS * 86_400_000
+        last = self.store.last_open_time(symbol, interval)
+        start = since_ms // step * step if last is None else last + step
+        if last is not None and start < since_ms - step:
+            # Stored history ends before the window we care about - leave a gap rather than backfill it
+            bot_logger.logger.debug(f"KLINES: {symbol} {interval} skipping {(since_ms - start) // step} bars of old history")
+            start = since_ms // step * step
+        end = now_ms // step * step - 1  # Up to the last kline that has closed
+        page = Config.KLINE_SYNC_PAGE * step
+        return [(t, min(t + page - 1, end)) for t in range(start, end + 1, page)]
+
+    def _fetch(self, symbol: str, interval: str, start: int, end: int) -> list:
+        # Ask for only the bars in the window - a short tail page costs weight 1, not a full page's weight
+        limit = min(Config.KLINE_SYNC_PAGE, (end - start) // INTERVAL_MS[interval] + 1)
+        request_weight_limiter.acquire(kline_weight(limit))
+        return self.client.futures_klines(symbol=symbol, interval=interval, startTime=start, endTime=end,
+                                          limit=limit)
+
+    def sync(self, symbol: str, interval: str, since_ms: int = None) -> int:
+        return self.sync_many([symbol], [interval], since_ms)[(symbol.upper(), interval)]
+
+    def sync_many(self, symbols: list, intervals: list, since_ms: int = None) -> dict:
+        """Bring every (symbol, interval) up to date - returns {(symbol, interval): new klines}"""
+        results = {}
+        if self.client is None:
+            return {(s.upper(), i): 0 for s in symbols for i in intervals}
+
+        now_ms = int(time.time() * 1000)
+        # Sorted, so two overlapping sync_many calls take the series locks in the same order
+        series = sorted({(s.upper(), i) for s in symbols for i in intervals})
+        locks = [self._series_lock(*key) for key in series]
+        for lock in locks:
+            lock.acquire()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='klines') as pool:
+                pending = [(key, [pool.submit(self._fetch, *key, start, end)
+                                  for start, end in self.pages(*key, since_ms, now_ms)])
+                           for key in series]
+                # Pages come back in any order; append each series front to back so the store stays sorted
+                for (symbol, interval), futures in pending:
+                    added = 0
+                    try:
+                        for future in futures:
+                            rows = [r for r in future.result() if r[6] < now_ms]
+                            if rows:
+                                added += self.store.append(symbol, interval, self._columns(rows))
+                    except Exception as e:
+                        # Stop at the first failed page - the next sync resumes right after what we stored
+                        bot_logger.log_error(f"Kline sync failed for {symbol} {interval}", e)
+                    results[(symbol, interval)] = added
+        finally:
+            for lock in locks:
+                lock.release()
+
+        total = sum(results.values())
+        if total:
+            bot_logger.logger.info(f"KLINES: synced {total} klines across {len(series)} series")
+        return results
+
+    @staticmethod
+    def _columns(rows: list) -> dict:
+        data = np.array([r[:6] for r in rows], dtype=np.float64)
+        return {'open_time': data[:, 0].astype(np.int64), 'open': data[:, 1], 'high': data[:, 2],
+                'low': data[:, 3], 'close': data[:, 4], 'volume': data[:, 5]}
@@ -2,11 +2,13 @@ from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
 
 class LimitOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk checks + open order tracking
     
     def place_limit_order(self, symbol: str, side: str, quantity: float, price: float, time_in_force: str = 'GTC') -> dict:
         """Place a limit order"""
@@ -17,6 +19,12 @@ class LimitOrderManager:
                 bot_logger.log_error(error_msg)
                 return {'success': False, 'error': error_msg}
             
+            # Pre-trade risk - in-process, no API call
+            if self.position_book is not None:
+                risk_ok, risk_errors = self.position_book.check_order(symbol, side, quantity, price, resting=True)
+                if not risk_ok:
+                    return {'success': False, 'error': f"Risk check failed: {', '.join(risk_errors)}"}
+            
             # Log order attempt
             bot_logger.log_order('LIMIT', symbol, quantity, price, 'PLACING')
             
@@ -25,6 +33,8 @@ class LimitOrderManager:
                 import random
                 demo_order_id = random.randint(10000000, 99999999)
                 bot_logger.log_order('LIMIT', symbol, quantity, price, 'PLACED (DEMO)')
+                if self.position_book is not None:
+                    self.position_book.track_order(symbol, demo_order_id, side, quantity, price)
                 
                 return {
                     'success': True,
@@ -50,6 +60,8 @@ class LimitOrderManager:
             
             # Log successful order
             bot_logger.log_order('LIMIT', symbol, quantity, price, 'PLACED')
+            if self.position_book is not None:
+                self.position_book.track_order(symbol, order['orderId'], side, quantity, price)
             
             return {
                 'success': True,
@@ -77,6 +89,8 @@ class LimitOrderManager:
         try:
             result = self.client.futures_cancel_order(symbol=symbol.upper(), orderId=order_id)
             bot_logger.logger.info(f"CANCELLED: OrderID: {order_id} | {symbol}")
+            if self.position_book is not None:
+                self.position_book.untrack_order(symbol, order_id)
             return {'success': True, 'order_id': order_id, 'status': 'CANCELLED'}
         except Exception as e:
             error_msg = f"Failed to cancel order {order_id}"
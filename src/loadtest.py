@@ -0,0 +1,262 @@
+import json
+import time
+import threading
+from urllib.parse import urlparse
+import numpy as np
+from requests.adapters import HTTPAdapter
+from binance.exceptions import BinanceAPIException
+from websockets.sync.client import connect
+from config import Config
+from logger import bot_logger
+from time_sync import SyncedClient
+from market_stream import UserStream
+from positions import PositionBook
+from market_orders import MarketOrderManager
+from limit_orders import LimitOrderManager
+from advanced.twap import TWAPOrderManager
+from advanced.grid import GridOrderManager
+from exchange_sim import ExchangeSimulator, SimulatedExchange
+
+# Load test - ramps concurrent strategies through the real managers and the real Client
+# (signing, recvWindow, session, response handling) against the local exchange stand-in,
+# and reports throughput and tail latency per step until latency or errors fall over.
+SCENARIOS = ('orders', 'grid', 'twap')
+
+
+class LocalClient(SyncedClient):
+    """The production client pointed at another base URL - every request records its latency"""
+
+    def __init__(self, base_url: str, api_key: str = 'sim', api_secret: str = 'sim', pool_size: int = 10):
+        # BaseClient formats these as templates - plain URLs pass through untouched
+        self.API_URL = f"{base_url}/api"
+        self.FUTURES_URL = f"{base_url}/fapi"
+        self.samples = []  # (path, milliseconds, ok, error code) since the last drain
+        super().__init__(api_key, api_secret, testnet=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        started = time.perf_counter()
+        ok, code = False, None
+        try:
+            result = super()._request(method, uri, signed, force_params, **kwargs)
+            ok = True
+            return result
+        except BinanceAPIException as e:
+            code = e.code
+            raise
+        finally:
+            self.samples.append((f"{method.upper()} {urlparse(uri).path}", (time.perf_counter() - started) * 1000, ok, code))
+
+    def drain(self) -> list:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+class LocalUserStream(UserStream):
+    """User stream off the stand-in's websocket - same dispatch as the real one"""
+
+    def __init__(self, client: LocalClient, ws_url: str):
+        super().__init__(client.API_KEY, client.API_SECRET, testnet=False)
+        self.client = client
+        self.ws_url = ws_url
+        self._socket = None
+        self.lags = []  # Event time to dispatch, milliseconds
+
+    def start(self):
+        listen_key = self.client.futures_stream_get_listen_key()
+        self._socket = connect(f"{self.ws_url}/ws/{listen_key}")
+        thread = threading.Thread(target=self._run, name='sim-user-stream')
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        try:
+            for raw in self._socket:
+                msg = json.loads(raw)
+                self.lags.append(time.time() * 1000 - msg['E'])
+                self.dispatch(msg)
+        except Exception:
+            pass  # Closed by stop()
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def _percentile(values, q) -> float:
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, ws_url: str = None, symbols: list = None, risk: bool = False, pool_size: int = 10):
+        self.client = LocalClient(base_url, pool_size=pool_size)
+        self.symbols = [s.upper() for s in (symbols or Config.SIM_SYMBOLS)]
+        self.position_book = None
+        if risk:
+            self.position_book = PositionBook(self.client)
+            self.position_book.load_account(self.client.futures_account())
+        self.market_orders = MarketOrderManager(self.client, self.position_book)
+        self.limit_orders = LimitOrderManager(self.client, self.position_book)
+        self.twap_orders = TWAPOrderManager(self.client, self.position_book)
+        self.grid_orders = GridOrderManager(self.client, self.position_book)
+        self.user_stream = None
+        self.events = 0
+        if ws_url:
+            self.user_stream = LocalUserStream(self.client, ws_url)
+            self.user_stream.subscribe('ORDER_TRADE_UPDATE', self._on_event)
+            if self.position_book is not None:
+                self.position_book.attach(None, self.user_stream)
+            self.user_stream.start()
+        self._prices = {s: self.market_orders.get_market_price(s) for s in self.symbols}
+
+    def _on_event(self, msg: dict):
+        self.events += 1
+
+    # --- one unit of work per scenario --------------------------------------
+
+    def _orders_op(self, worker: int, i: int) -> int:
+        """Rest a limit well away from the price and cancel it, with a market order every tenth round"""
+        symbol = self.symbols[worker % len(self.symbols)]
+        if i % 10 == 9:
+            return int(self.market_orders.place_market_order(symbol, 'BUY', Config.LOADTEST_QUANTITY)['success'])
+        price = round(self._prices[symbol] * 0.8, 2)
+        placed = self.limit_orders.place_limit_order(symbol, 'BUY', Config.LOADTEST_QUANTITY, price)
+        if not placed['success']:
+            return 0
+        return 1 + int(self.limit_orders.cancel_order(symbol, placed['order_id'])['success'])
+
+    def _grid_op(self, worker: int, i: int) -> int:
+        """Lay a full grid and tear it down again"""
+        symbol = self.symbols[worker % len(self.symbols)]
+        result = self.grid_orders.start_grid_trading(symbol, self._prices[symbol], Config.LOADTEST_GRID_LEVELS,
+                                                     Config.DEFAULT_GRID_SPREAD, Config.LOADTEST_QUANTITY)
+        if not result['success']:
+            return 0
+        stopped = self.grid_orders.stop_grid(result['grid_id'])
+        return result['total_orders'] + stopped.get('cancelled', 0)
+
+    def _twap_op(self, worker: int, i: int) -> int:
+        """Run one short TWAP to completion"""
+        symbol = self.symbols[worker % len(self.symbols)]
+        result = self.twap_orders.execute_twap_order(symbol, 'BUY', Config.LOADTEST_QUANTITY * Config.LOADTEST_TWAP_INTERVALS,
+                                                     Config.LOADTEST_TWAP_DURATION, Config.LOADTEST_TWAP_INTERVALS)
+        if not result['success']:
+            return 0
+        info = self.twap_orders.get_twap_status(result['twap_id'])['twap_info']
+        # Bounded - a run that never finishes is cancelled rather than hanging the worker
+        deadline = time.time() + Config.LOADTEST_TWAP_DURATION * 2 + 5
+        while info['status'] == 'ACTIVE':
+            if time.time() > deadline:
+                self.twap_orders.cancel_twap(result['twap_id'])
+                bot_logger.log_error(f"Load test TWAP {result['twap_id']} didn't finish in time - cancelled")
+                break
+            time.sleep(0.05)
+        return info['executed_chunks']
+
+    # --- ramp ----------------------------------------------------------------
+
+    def run_step(self, scenario: str, concurrency: int, seconds: float) -> dict:
+        """`concurrency` workers repeating the scenario's unit of work for `seconds`"""
+        op = getattr(self, f"_{scenario}_op")
+        deadline = time.perf_counter() + seconds
+        op_times, orders = [], [0] * concurrency
+        self.client.drain()
+        events_before = self.events
+        lag_start = len(self.user_stream.lags) if self.user_stream else 0
+
+        def work(worker):
+            i = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    orders[worker] += op(worker, i)
+                except Exception as e:
+                    bot_logger.log_error(f"Load test {scenario} worker {worker} failed", e)
+                op_times.append((time.perf_counter() - started) * 1000)
+                i += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=work, args=(w,), name=f"load-{w}") for w in range(concurrency)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        samples = self.client.drain()
+        latencies = np.array([ms for _, ms, _, _ in samples])
+        # -1015 is the stand-in's order cap doing its job, not the client falling over - counted on its own
+        limited = sum(1 for _, _, ok, code in samples if not ok and code == -1015)
+        errors = sum(1 for _, _, ok, _ in samples if not ok) - limited
+        lags = self.user_stream.lags[lag_start:] if self.user_stream else []
+        return {
+            'scenario': scenario,
+            'concurrency': concurrency,
+            'elapsed_seconds': elapsed,
+            'operations': len(op_times),
+            'orders': sum(orders),
+            'orders_per_second': sum(orders) / elapsed,
+            'requests': len(samples),
+            'requests_per_second': len(samples) / elapsed,
+            'errors': errors,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'order_limited': limited,
+            'api_p50_ms': _percentile(latencies, 50),
+            'api_p99_ms': _percentile(latencies, 99),
+            'api_max_ms': float(latencies.max()) if len(latencies) else None,
+            'op_p50_ms': _percentile(op_times, 50),
+            'op_p99_ms': _percentile(op_times, 99),
+            'events': self.events - events_before,
+            'stream_lag_p99_ms': _percentile(lags, 99),
+        }
+
+    def ramp(self, scenario: str, steps: list, seconds: float = None, p99_limit_ms: float = None,
+             max_error_rate: float = None, progress=None) -> dict:
+        """Run the steps in order, stopping at the first one where p99 or the error rate blows its limit"""
+        seconds = seconds or Config.LOADTEST_STEP_SECONDS
+        p99_limit_ms = p99_limit_ms or Config.LOADTEST_P99_LIMIT_MS
+        max_error_rate = Config.LOADTEST_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        results, sustained = [], None
+        for concurrency in steps:
+            step = self.run_step(scenario, concurrency, seconds)
+            step['saturated'] = (step['api_p99_ms'] or 0) > p99_limit_ms or step['error_rate'] > max_error_rate
+            results.append(step)
+            if progress is not None:
+                progress(step)
+            if step['saturated']:
+                break
+            sustained = step
+        return {'scenario': scenario, 'steps': results, 'sustained': sustained}
+
+    def close(self):
+        if self.user_stream is not None:
+            self.user_stream.stop()
+
+
+def run_load_test(scenario: str, steps: list, seconds: float = None, latency_ms: float = None, jitter_ms: float = None,
+                  error_rate: float = None, order_limit_per_10s: int = None, risk: bool = False,
+                  p99_limit_ms: float = None, progress=None) -> dict:
+    """Start a stand-in exchange in-process, ramp the scenario against it and tear everything down"""
+    order_limit_per_10s = Config.LOADTEST_ORDER_LIMIT_PER_10S if order_limit_per_10s is None else order_limit_per_10s
+    exchange = SimulatedExchange(api_key='sim', api_secret='sim', latency_ms=latency_ms, jitter_ms=jitter_ms,
+                                 error_rate=error_rate, order_limit_per_10s=order_limit_per_10s)
+    simulator = ExchangeSimulator(exchange).start()
+    driver = None
+    try:
+        # One pooled connection per worker - otherwise urllib3 churns sockets and that's all we'd measure
+        driver = LoadDriver(simulator.base_url, simulator.ws_url, risk=risk, pool_size=max(steps))
+        result = driver.ramp(scenario, steps, seconds, p99_limit_ms, progress=progress)
+        result['server'] = {
+            'requests': dict(exchange.requests),
+            'injected_errors': exchange.injected_errors,
+            'rejected_orders': exchange.rejected_orders,
+            'open_orders': sum(len(book) for book in exchange.open_orders.values())
+        }
+        return result
+    finally:
+        if driver is not None:
+            driver.close()
+        simulator.stop()
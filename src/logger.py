@@ -2,6 +2,7 @@ import logging
 import os
 from datetime import datetime
 from config import Config
+from profiler import profiler
 
 # Custom logging class - I got tired of print statements everywhere!
 # This makes debugging so much easier, especially when things go wrong at 2 AM
@@ -30,17 +31,20 @@ class BotLogger:
     
     def log_order(self, order_type, symbol, quantity, price=None, status='PENDING'):
         # Custom order logging format - makes it easy to grep through logs later
-        self.logger.info(f"ORDER: {order_type} | {symbol} | Qty: {quantity} | Price: {price} | Status: {status}")
+        with profiler.span('logging'):
+            self.logger.info(f"ORDER: {order_type} | {symbol} | Qty: {quantity} | Price: {price} | Status: {status}")
     
     def log_error(self, error_msg, exception=None):
         # Error logging with optional exception details - saved me hours of debugging
-        if exception:
-            self.logger.error(f"ERROR: {error_msg} | Exception: {str(exception)}")
-        else:
-            self.logger.error(f"ERROR: {error_msg}")
+        with profiler.span('logging'):
+            if exception:
+                self.logger.error(f"ERROR: {error_msg} | Exception: {str(exception)}")
+            else:
+                self.logger.error(f"ERROR: {error_msg}")
     
     def log_execution(self, order_id, symbol, executed_qty, avg_price):
         # Track executions for P&L analysis - this data is gold for strategy optimization
-        self.logger.info(f"EXECUTION: OrderID: {order_id} | {symbol} | Executed: {executed_qty} | Avg Price: {avg_price}")
+        with profiler.span('logging'):
+            self.logger.info(f"EXECUTION: OrderID: {order_id} | {symbol} | Executed: {executed_qty} | Avg Price: {avg_price}")
 
 bot_logger = BotLogger()
\ No newline at end of file
@@ -1,13 +1,19 @@
+import math
+import time
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from logger import bot_logger
 from validator import OrderValidator
+from positions import PositionBook
+from config import Config
 
 # Market orders are the simplest but most important - get these right first!
 class MarketOrderManager:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, position_book: PositionBook = None, order_books=None):
         self.client = client
         self.validator = OrderValidator(client)
+        self.position_book = position_book  # Pre-trade risk checks + fill tracking
+        self.order_books = order_books  # Local L2 books - lets us see how deep the book is before sending
     
     def place_market_order(self, symbol: str, side: str, quantity: float) -> dict:
         """Place a market order - I prefer this over limit orders for quick entries"""
@@ -18,6 +24,12 @@ class MarketOrderManager:
                 bot_logger.log_error(error_msg)
                 return {'success': False, 'error': error_msg}
             
+            # Pre-trade risk - in-process, no API call
+            if self.position_book is not None:
+                risk_ok, risk_errors = self.position_book.check_order(symbol, side, quantity)
+                if not risk_ok:
+                    return {'success': False, 'error': f"Risk check failed: {', '.join(risk_errors)}"}
+            
             # Log order attempt
             bot_logger.log_order('MARKET', symbol, quantity, None, 'PLACING')
             
@@ -27,6 +39,8 @@ class MarketOrderManager:
                 demo_order_id = random.randint(10000000, 99999999)  # Binance-like order ID format
                 bot_logger.log_order('MARKET', symbol, quantity, None, 'PLACED (DEMO)')
                 bot_logger.log_execution(demo_order_id, symbol, quantity, 'MARKET_PRICE (DEMO)')
+                if self.position_book is not None:
+                    self.position_book.apply_order_update(symbol, demo_order_id, side, quantity, self.get_market_price(symbol))
                 
                 return {
                     'success': True,
@@ -43,9 +57,15 @@ class MarketOrderManager:
                 symbol=symbol.upper(),
                 side=side.upper(),
                 type='MARKET',
-                quantity=quantity
+                quantity=quantity,
+                newOrderRespType='RESULT'  # Fill details in the response - the position book needs them
             )
             
+            if self.position_book is not None:
+                self.position_book.apply_order_update(symbol, order['orderId'], side,
+                                                      float(order.get('executedQty', 0)), float(order.get('avgPrice', 0)),
+                                                      order.get('positionSide', 'BOTH'))
+            
             # Log successful order
             bot_logger.log_order('MARKET', symbol, quantity, None, 'PLACED')
             bot_logger.log_execution(order['orderId'], symbol, quantity, 'MARKET_PRICE')
@@ -69,13 +89,73 @@ class MarketOrderManager:
             bot_logger.log_error(error_msg, e)
             return {'success': False, 'error': error_msg}
     
+    def capped_quantity(self, symbol: str, side: str, quantity: float, max_slippage_bps: float) -> float:
+        """
+        Largest part of `quantity` the local book can absorb within max_slippage_bps of the touch.
+        No synced book means we can't tell - the full quantity goes through, same as before.
+        """
+        book = self.order_books.get(symbol) if self.order_books is not None else None
+        if book is None:
+            return quantity
+        capped = book.max_quantity(side, max_slippage_bps)
+        if capped >= quantity:
+            return quantity
+        step = self.validator.step_size(symbol)
+        return math.floor(round(capped / step, 6)) * step if step else capped
+    
+    def place_capped_market_order(self, symbol: str, side: str, quantity: float, max_slippage_bps: float,
+                                  split: bool = False, split_delay: float = None) -> dict:
+        """
+        Market order that won't sweep the book past max_slippage_bps.
+        Without split the size is cut down to what fits; with split the rest follows in
+        further pieces, each sized off the book again after it has had time to refill.
+        """
+        split_delay = Config.ORDER_BOOK_SPLIT_DELAY if split_delay is None else split_delay
+        deadline = time.time() + Config.ORDER_BOOK_SPLIT_TIMEOUT
+        remaining, orders = quantity, []
+        while remaining >= Config.MIN_QUANTITY:
+            size = round(self.capped_quantity(symbol, side, remaining, max_slippage_bps), 8)
+            if size < Config.MIN_QUANTITY:
+                if not split or time.time() > deadline:
+                    break
+                time.sleep(split_delay)  # Book too thin right now - wait for it to refill
+                continue
+            result = self.place_market_order(symbol, side, size)
+            if not result['success']:
+                if not orders:
+                    return result
+                break
+            orders.append(result)
+            remaining = round(remaining - size, 8)
+            if not split:
+                break
+            if remaining >= Config.MIN_QUANTITY:
+                time.sleep(split_delay)
+        
+        if not orders:
+            error_msg = f"Book too thin: nothing fits within {max_slippage_bps} bps of the touch"
+            bot_logger.log_error(error_msg)
+            return {'success': False, 'error': error_msg}
+        executed = round(quantity - remaining, 8)
+        if executed < quantity:
+            bot_logger.log_order('MARKET_CAPPED', symbol, executed, None, f"{remaining} LEFT UNFILLED")
+        return {
+            'success': True,
+            'order_ids': [o['order_id'] for o in orders],
+            'symbol': symbol,
+            'side': side,
+            'quantity': executed,
+            'requested_quantity': quantity,
+            'type': 'MARKET',
+            'status': orders[-1]['status']
+        }
+    
     def get_market_price(self, symbol: str) -> float:
         """Get current market price - useful for calculating order values"""
         try:
             if self.client is None:
                 # Realistic demo prices based on current market levels (Oct 2024)
-                demo_prices = {'BTCUSDT': 45000.0, 'ETHUSDT': 3000.0, 'ADAUSDT': 0.5}
-                return demo_prices.get(symbol.upper(), 100.0)  # Default fallback price
+                return Config.DEMO_PRICES.get(symbol.upper(), Config.DEMO_DEFAULT_PRICE)
                 
             ticker = self.client.futures_symbol_ticker(symbol=symbol.upper())
             return float(ticker['price'])
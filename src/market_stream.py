@@ -0,0 +1,127 @@
+import threading
+from collections import defaultdict
+from binance import ThreadedWebsocketManager
+from config import Config
+from logger import bot_logger
+
+# One multiplexed futures websocket for everything that needs live market data.
+# Components subscribe to (symbol, stream) pairs and get the raw stream payload - the recorder,
+# replay and strategies all speak the same format, so a replay can stand in for the live feed.
+
+
+class MarketStream:
+    def __init__(self, testnet: bool = None):
+        self.testnet = Config.TESTNET if testnet is None else testnet
+        self._subscribers = defaultdict(list)  # (symbol, stream) -> callbacks; symbol '*' means every symbol
+        self._lock = threading.Lock()
+        self._twm = None
+        self._socket = None
+        self.messages = 0
+        self.errors = 0
+
+    def subscribe(self, symbol: str, stream: str, callback):
+        """Register callback(symbol, data) for e.g. ('BTCUSDT', 'bookTicker') or ('BTCUSDT', 'depth@100ms')"""
+        key = (symbol.upper(), stream)
+        with self._lock:
+            is_new = key not in self._subscribers
+            self._subscribers[key].append(callback)
+        # New stream on a running socket - reconnect with the full list
+        if is_new and self._twm is not None and symbol != '*':
+            self._reconnect()
+
+    def unsubscribe(self, symbol: str, stream: str, callback):
+        key = (symbol.upper(), stream)
+        with self._lock:
+            if callback in self._subscribers.get(key, []):
+                self._subscribers[key].remove(callback)
+
+    def streams(self) -> list:
+        with self._lock:
+            return sorted(f"{symbol.lower()}@{stream}" for symbol, stream in self._subscribers if symbol != '*')
+
+    def start(self):
+        if self._twm is not None:
+            return
+        self._twm = ThreadedWebsocketManager(testnet=self.testnet)
+        self._twm.daemon = True
+        self._twm.start()
+        self._open_socket()
+
+    def stop(self):
+        if self._twm is None:
+            return
+        self._twm.stop()
+        self._twm = None
+        self._socket = None
+
+    def _open_socket(self):
+        streams = self.streams()
+        if not streams:
+            return
+        self._socket = self._twm.start_futures_multiplex_socket(callback=self._on_message, streams=streams)
+        bot_logger.logger.info(f"STREAM: subscribed to {len(streams)} streams")
+
+    def _reconnect(self):
+        if self._socket:
+            self._twm.stop_socket(self._socket)
+        self._open_socket()
+
+    def _on_message(self, msg: dict):
+        if msg.get('e') == 'error':
+            self.errors += 1
+            bot_logger.log_error(f"Market stream error: {msg.get('m')}")
+            return
+        stream = msg.get('stream', '')
+        symbol, _, name = stream.partition('@')
+        self.dispatch(symbol, name, msg.get('data', {}))
+
+    def dispatch(self, symbol: str, stream: str, data: dict):
+        """Deliver one payload to its subscribers - also the entry point replay uses"""
+        self.messages += 1
+        symbol = symbol.upper()
+        callbacks = self._subscribers.get((symbol, stream), []) + self._subscribers.get(('*', stream), [])
+        for callback in callbacks:
+            try:
+                callback(symbol, data)
+            except Exception as e:
+                # One bad subscriber must not take the feed down for everybody else
+                bot_logger.log_error(f"Stream callback failed for {symbol}@{stream}", e)
+
+
+class UserStream:
+    """Futures user data stream - order updates and account changes, dispatched by event type"""
+
+    def __init__(self, api_key: str = None, api_secret: str = None, testnet: bool = None):
+        self.api_key = api_key or Config.BINANCE_API_KEY
+        self.api_secret = api_secret or Config.BINANCE_SECRET_KEY
+        self.testnet = Config.TESTNET if testnet is None else testnet
+        self._subscribers = defaultdict(list)  # event type ('ORDER_TRADE_UPDATE', ...) -> callbacks
+        self._twm = None
+
+    def subscribe(self, event_type: str, callback):
+        self._subscribers[event_type].append(callback)
+
+    def start(self):
+        if self._twm is not None:
+            return
+        # python-binance handles the listenKey and its keepalive for us
+        self._twm = ThreadedWebsocketManager(self.api_key, self.api_secret, testnet=self.testnet)
+        self._twm.daemon = True
+        self._twm.start()
+        self._twm.start_futures_user_socket(callback=self.dispatch)
+        bot_logger.logger.info("STREAM: user data stream started")
+
+    def stop(self):
+        if self._twm is not None:
+            self._twm.stop()
+            self._twm = None
+
+    def dispatch(self, msg: dict):
+        if msg.get('e') == 'error':
+            bot_logger.log_error(f"User stream error: {msg.get('m')}")
+            return
+        for callback in self._subscribers.get(msg.get('e'), []):
+            try:
+                callback(msg)
+            except Exception as e:
+                bot_logger.log_error(f"User stream callback failed for {msg.get('e')}", e)
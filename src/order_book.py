@@ -0,0 +1,255 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from binance.client import Client
+from config import Config
+from logger import bot_logger
+
+# Local L2 order books - REST snapshot plus the diff-depth stream, kept in sorted numpy arrays.
+# "What would X cost right now" is a cumulative sum plus one searchsorted, so order paths can
+# check the book before every market order or TWAP slice without an API call.
+#
+# Sync follows the Binance futures recipe: buffer the stream, take a snapshot, drop events
+# older than its lastUpdateId, accept the first event that straddles it (U <= lastUpdateId + 1 <= u),
+# then require every later event's pu to equal the previous u.
+# Any gap means the book can't be trusted - it's marked stale and rebuilt from a new snapshot.
+
+BID, ASK = 0, 1
+
+
+class OrderBook:
+    """
+    One symbol's book. Both sides are stored with ascending keys - bids keyed by -price - so
+    index 0 is always the best level and a fill walks the arrays front to back.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_update_id = 0
+        self.synced = False  # Set by the manager once the stream has caught up with the snapshot
+        self.awaiting_first = False  # Synced off a bare snapshot - the next event is checked by U/u range, not pu
+        self._keys = [np.empty(0), np.empty(0)]
+        self._qtys = [np.empty(0), np.empty(0)]
+        self._cum = [None, None]  # (cumulative qty, cumulative notional) - rebuilt lazily after updates
+        self._lock = threading.Lock()
+
+    def load_snapshot(self, snapshot: dict):
+        """Replace the book with a REST /fapi/v1/depth response"""
+        with self._lock:
+            for side, rows, sign in ((BID, snapshot['bids'], -1), (ASK, snapshot['asks'], 1)):
+                levels = np.array(rows, dtype=np.float64).reshape(-1, 2)
+                order = np.argsort(sign * levels[:, 0], kind='stable')
+                self._keys[side] = sign * levels[order, 0]
+                self._qtys[side] = levels[order, 1]
+                self._cum[side] = None
+            self.last_update_id = snapshot['lastUpdateId']
+
+    def apply_diff(self, bids: list, asks: list, update_id: int):
+        """Apply one depth event's levels - quantity 0 removes the level"""
+        with self._lock:
+            for side, rows, sign in ((BID, bids, -1), (ASK, asks, 1)):
+                if rows:
+                    levels = np.array(rows, dtype=np.float64).reshape(-1, 2)
+                    self._merge(side, sign * levels[:, 0], levels[:, 1])
+            self.last_update_id = update_id
+
+    def _merge(self, side: int, keys: np.ndarray, qtys: np.ndarray):
+        # Sorted updates, so new levels landing in the same gap go in the right order
+        order = np.argsort(keys, kind='stable')
+        keys, qtys = keys[order], qtys[order]
+        book_keys, book_qtys = self._keys[side], self._qtys[side]
+        idx = np.searchsorted(book_keys, keys)
+        found = idx < len(book_keys)
+        found[found] = book_keys[idx[found]] == keys[found]
+        # Existing levels change in place, new ones go in with a single insert, empties come out
+        book_qtys[idx[found]] = qtys[found]
+        new = ~found & (qtys > 0)
+        if new.any():
+            book_keys = np.insert(book_keys, idx[new], keys[new])
+            book_qtys = np.insert(book_qtys, idx[new], qtys[new])
+        keep = book_qtys > 0
+        if not keep.all():
+            book_keys, book_qtys = book_keys[keep], book_qtys[keep]
+        self._keys[side], self._qtys[side] = book_keys, book_qtys
+        self._cum[side] = None
+
+    def _levels(self, side: int) -> tuple:
+        """(prices, cumulative qty, cumulative notional) - call with the lock held"""
+        prices = np.abs(self._keys[side])
+        if self._cum[side] is None:
+            self._cum[side] = (np.cumsum(self._qtys[side]), np.cumsum(prices * self._qtys[side]))
+        return (prices,) + self._cum[side]
+
+    def best(self) -> tuple:
+        """(best bid, best ask) - None for an empty side"""
+        with self._lock:
+            bid = -self._keys[BID][0] if len(self._keys[BID]) else None
+            ask = self._keys[ASK][0] if len(self._keys[ASK]) else None
+            return bid, ask
+
+    def depth(self, side: str, levels: int = 10) -> list:
+        """Top levels of one side as [(price, qty)] - side is the book side, 'BID' or 'ASK'"""
+        s = BID if side.upper() == 'BID' else ASK
+        with self._lock:
+            return [(abs(k), q) for k, q in zip(self._keys[s][:levels].tolist(), self._qtys[s][:levels].tolist())]
+
+    def expected_fill(self, order_side: str, quantity: float) -> dict:
+        """
+        Walk the book for a market order - BUY takes asks, SELL takes bids.
+        Returns average and worst price, how much the book can absorb, and slippage vs. the touch.
+        """
+        side = ASK if order_side.upper() == 'BUY' else BID
+        with self._lock:
+            prices, cum_qty, cum_notional = self._levels(side)
+            if not len(prices):
+                return None
+            i = int(np.searchsorted(cum_qty, quantity))  # First level that completes the order
+            if i >= len(prices):
+                filled, notional, worst = float(cum_qty[-1]), float(cum_notional[-1]), float(prices[-1])
+            else:
+                before_qty = cum_qty[i - 1] if i else 0.0
+                before_notional = cum_notional[i - 1] if i else 0.0
+                filled, worst = quantity, float(prices[i])
+                notional = float(before_notional + (quantity - before_qty) * prices[i])
+            best = float(prices[0])
+        avg = notional / filled
+        return {
+            'symbol': self.symbol,
+            'side': order_side.upper(),
+            'quantity': quantity,
+            'fillable_quantity': filled,
+            'average_price': avg,
+            'worst_price': worst,
+            'best_price': best,
+            'slippage_bps': abs(avg - best) / best * 10_000,
+            'levels': min(i + 1, len(prices))
+        }
+
+    def max_quantity(self, order_side: str, max_slippage_bps: float) -> float:
+        """Largest market order whose average price stays within max_slippage_bps of the touch"""
+        side = ASK if order_side.upper() == 'BUY' else BID
+        with self._lock:
+            prices, cum_qty, cum_notional = self._levels(side)
+            if not len(prices):
+                return 0.0
+            direction = 1 if side == ASK else -1
+            limit = prices[0] * (1 + direction * max_slippage_bps / 10_000)
+            # Average price after taking whole levels is monotonic - find the last one that's still OK
+            ok = direction * (cum_notional / cum_qty - limit) <= 1e-12
+            k = int(np.argmin(ok)) if not ok.all() else len(prices)
+            if k == len(prices):
+                return float(cum_qty[-1])
+            # Part of level k: solve (N + (q - Q) * p) / q = limit for q
+            before_qty = cum_qty[k - 1] if k else 0.0
+            before_notional = cum_notional[k - 1] if k else 0.0
+            p = prices[k]
+            return float((before_qty * p - before_notional) / (p - limit))
+
+
+class OrderBookManager:
+    """Keeps local books in sync for any number of symbols off the shared market stream"""
+
+    def __init__(self, client: Client):
+        self.client = client
+        self.books = {}
+        self.resyncs = 0
+        self._buffers = {}  # symbol -> depth events seen while the snapshot is in flight
+        self._syncing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='orderbook')
+        self._ready = {}  # symbol -> Event set once the book is in sync
+
+    def attach(self, market_stream, symbols: list):
+        for symbol in symbols:
+            symbol = symbol.upper()
+            with self._lock:
+                if symbol in self.books:
+                    continue
+                self.books[symbol] = OrderBook(symbol)
+                self._ready[symbol] = threading.Event()
+            market_stream.subscribe(symbol, Config.DEPTH_STREAM, self.on_depth)
+
+    def get(self, symbol: str) -> OrderBook:
+        """The symbol's book if it's in sync, else None - callers fall back to sending blind"""
+        book = self.books.get(symbol.upper())
+        return book if book is not None and book.synced else None
+
+    def wait_ready(self, symbol: str, timeout: float = None) -> bool:
+        ready = self._ready.get(symbol.upper())
+        return ready is not None and ready.wait(Config.ORDER_BOOK_SYNC_TIMEOUT if timeout is None else timeout)
+
+    def on_depth(self, symbol: str, data: dict):
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        with self._lock:
+            if book.synced and self._apply(book, data):
+                return
+            buffer = self._buffers.setdefault(symbol, [])
+            buffer.append(data)
+            if len(buffer) > Config.ORDER_BOOK_BUFFER:
+                del buffer[0]  # Never synced (demo mode) - don't grow forever
+            if symbol not in self._syncing:
+                self._syncing.add(symbol)
+                self._executor.submit(self._sync, symbol)
+
+    def _apply(self, book: OrderBook, data: dict) -> bool:
+        if book.awaiting_first:
+            # First event after a snapshot: its pu predates the snapshot, so check the U/u range instead
+            if data['u'] <= book.last_update_id:
+                return True  # Already in the snapshot
+            if data['U'] > book.last_update_id + 1:
+                self._invalidate(book, f"first event starts at {data['U']}, snapshot ends at {book.last_update_id}")
+                return False
+            book.awaiting_first = False
+        # A gap in the pu -> u chain means we missed an event - the book is wrong from here on
+        elif data['pu'] != book.last_update_id:
+            self._invalidate(book, f"sequence gap (pu {data['pu']} != {book.last_update_id})")
+            return False
+        book.apply_diff(data['b'], data['a'], data['u'])
+        return True
+
+    def _invalidate(self, book: OrderBook, reason: str):
+        bot_logger.logger.warning(f"ORDER_BOOK: {book.symbol} out of sync - {reason}, resyncing")
+        self.resyncs += 1
+        book.synced = False
+        self._ready[book.symbol].clear()
+
+    def _sync(self, symbol: str):
+        """Snapshot, then replay whatever the stream buffered meanwhile"""
+        try:
+            if self.client is None:
+                return  # Demo mode - books can only be loaded by hand (load_snapshot)
+            snapshot = self.client.futures_order_book(symbol=symbol, limit=Config.ORDER_BOOK_SNAPSHOT_LIMIT)
+            self.load_snapshot(symbol, snapshot)
+        except Exception as e:
+            bot_logger.log_error(f"Order book snapshot failed for {symbol}", e)
+        finally:
+            with self._lock:
+                self._syncing.discard(symbol)
+
+    def load_snapshot(self, symbol: str, snapshot: dict):
+        """Seed a book and catch up on the buffered events"""
+        book = self.books[symbol.upper()]
+        with self._lock:
+            book.load_snapshot(snapshot)
+            buffered = self._buffers.pop(book.symbol, [])
+            last_id = snapshot['lastUpdateId']
+            # Drop what the snapshot already has; the first event kept must straddle lastUpdateId
+            pending = [e for e in buffered if e['u'] > last_id]
+            if pending and pending[0]['U'] > last_id + 1:
+                # Snapshot is older than the stream - keep the events and retry on the next one
+                self._buffers[book.symbol] = pending
+                bot_logger.logger.warning(f"ORDER_BOOK: {book.symbol} snapshot too old, retrying")
+                return
+            for i, data in enumerate(pending):
+                if i and data['pu'] != book.last_update_id:
+                    self.resyncs += 1
+                    bot_logger.logger.warning(f"ORDER_BOOK: {book.symbol} gap in buffered events, retrying")
+                    return
+                book.apply_diff(data['b'], data['a'], data['u'])
+            # Nothing buffered past the snapshot - the first live event still needs the range check
+            book.awaiting_first = not pending
+            book.synced = True
+            self._ready[book.symbol].set()
+        bot_logger.logger.info(f"ORDER_BOOK: {book.symbol} in sync at update {book.last_update_id}")
@@ -0,0 +1,109 @@
+import os
+import json
+import threading
+from collections import OrderedDict, deque
+from config import Config
+from logger import bot_logger
+
+# Compact order records - a full futures_create_order response is a ~20 key dict of strings,
+# and strategies used to keep every one of them forever. This keeps the fields we actually
+# use, parsed to numbers once, in a __slots__ object a fraction of the size.
+
+
+class OrderRecord:
+    __slots__ = ('order_id', 'symbol', 'side', 'order_type', 'status', 'quantity',
+                 'executed_qty', 'price', 'avg_price', 'update_time')
+
+    def __init__(self, order_id, symbol, side, order_type, status, quantity,
+                 executed_qty=0.0, price=0.0, avg_price=0.0, update_time=0):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.status = status
+        self.quantity = quantity
+        self.executed_qty = executed_qty
+        self.price = price
+        self.avg_price = avg_price
+        self.update_time = update_time
+
+    @classmethod
+    def from_response(cls, order: dict, symbol: str = None, side: str = None, order_type: str = None,
+                      quantity: float = None, price: float = None):
+        """Build from an API response - anything the response leaves out comes from what we sent"""
+        return cls(
+            order['orderId'],
+            order.get('symbol', symbol),
+            order.get('side', side),
+            order.get('type', order_type),
+            order.get('status', 'NEW'),
+            float(order.get('origQty', quantity or 0)),
+            float(order.get('executedQty', 0)),
+            float(order.get('price', price or 0)),
+            float(order.get('avgPrice', 0)),
+            int(order.get('updateTime', 0)),
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"OrderRecord({self.order_id} {self.symbol} {self.side} {self.order_type} {self.quantity}@{self.price} {self.status})"
+
+
+def order_history() -> deque:
+    """Per-strategy order list - bounded, the running totals live on the strategy itself"""
+    return deque(maxlen=Config.STRATEGY_ORDER_HISTORY)
+
+
+class StrategyArchive:
+    """
+    Finished strategies (TWAP, VWAP, grids...) - the most recent stay in memory,
+    older ones spill to a JSONL file, so a long-running process doesn't keep growing.
+    """
+
+    def __init__(self, max_entries: int = None, path: str = None):
+        self.max_entries = max_entries or Config.STRATEGY_ARCHIVE_SIZE
+        self.path = Config.STRATEGY_ARCHIVE_FILE if path is None else path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, strategy_id: str, info: dict):
+        with self._lock:
+            self._entries[strategy_id] = info
+            self._entries.move_to_end(strategy_id)
+            while len(self._entries) > self.max_entries:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._spill(evicted_id, evicted)
+
+    def get(self, strategy_id: str):
+        """Memory first, then the on-disk archive (a linear scan - fine for the odd status lookup)"""
+        with self._lock:
+            if strategy_id in self._entries:
+                self._entries.move_to_end(strategy_id)
+                return self._entries[strategy_id]
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['id'] == strategy_id:
+                    return entry['info']
+        return None
+
+    def __contains__(self, strategy_id: str) -> bool:
+        return self.get(strategy_id) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _spill(self, strategy_id: str, info: dict):
+        if not self.path:
+            return  # Memory-only archive - evicted strategies are simply dropped
+        try:
+            record = {key: ([o.to_dict() for o in value] if key == 'orders' else value) for key, value in info.items()}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'id': strategy_id, 'info': record}, default=str) + '\n')
+        except Exception as e:
+            bot_logger.log_error(f"Failed to archive strategy {strategy_id}", e)
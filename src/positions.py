@@ -0,0 +1,328 @@
+import time
+import threading
+from collections import OrderedDict
+from binance.client import Client
+from config import Config
+from logger import bot_logger
+
+# In-memory position book - positions, P&L and margin tracked from fills as they happen,
+# so pre-trade risk checks are a few dict lookups instead of a heavy futures_account() call.
+# The account endpoint is only used to resync every now and then.
+
+
+class Position:
+    __slots__ = ('symbol', 'position_side', 'quantity', 'entry_price', 'realized_pnl', 'mark_price', 'leverage')
+
+    def __init__(self, symbol: str, position_side: str = 'BOTH'):
+        self.symbol = symbol
+        self.position_side = position_side  # BOTH in one-way mode, LONG / SHORT in hedge mode
+        self.quantity = 0.0  # Signed: positive = long, negative = short
+        self.entry_price = 0.0
+        self.realized_pnl = 0.0
+        self.mark_price = None
+        self.leverage = Config.RISK_DEFAULT_LEVERAGE
+
+    @property
+    def unrealized_pnl(self) -> float:
+        if self.mark_price is None or self.quantity == 0:
+            return 0.0
+        return self.quantity * (self.mark_price - self.entry_price)
+
+    @property
+    def notional(self) -> float:
+        price = self.mark_price if self.mark_price is not None else self.entry_price
+        return abs(self.quantity) * price
+
+    def apply_fill(self, signed_qty: float, price: float) -> float:
+        """Fold one fill into the position, returns the P&L it realized"""
+        realized = 0.0
+        if self.quantity == 0 or (self.quantity > 0) == (signed_qty > 0):
+            # Opening or adding - entry becomes the size-weighted average
+            new_qty = self.quantity + signed_qty
+            self.entry_price = (self.entry_price * self.quantity + price * signed_qty) / new_qty
+            self.quantity = new_qty
+        else:
+            closed = min(abs(signed_qty), abs(self.quantity))
+            direction = 1 if self.quantity > 0 else -1
+            realized = closed * (price - self.entry_price) * direction
+            self.quantity += signed_qty
+            if abs(self.quantity) < 1e-12:
+                self.quantity, self.entry_price = 0.0, 0.0
+            elif (self.quantity > 0) != (direction > 0):
+                self.entry_price = price  # Flipped through zero - the remainder opened at this price
+        self.realized_pnl += realized
+        return realized
+
+
+class PositionBook:
+    def __init__(self, client: Client):
+        self.client = client
+        self.positions = {}  # (symbol, position side) -> Position - hedge mode holds a LONG and a SHORT per symbol
+        self.open_orders = {}  # symbol -> {order_id: signed notional reserved by the resting order}
+        self.wallet_balance = Config.DEMO_BALANCE if client is None else 0.0
+        self.available_balance = self.wallet_balance
+        self.last_sync = None
+        self.open_orders_synced = client is None  # Nothing to fetch in demo mode
+        self._order_fills = OrderedDict()  # order_id -> (cumulative qty, avg price), so repeated updates aren't double counted
+        self._lock = threading.RLock()
+        self.reservations = {}  # symbol -> {key: (signed qty, notional)} for accepted market orders not yet filled
+        self.order_books = None  # Local L2 books - a free reference price for market orders when attached
+        self._reference_prices = {}  # symbol -> (mark price, fetched at) for symbols we hold no position in
+        self.balance_streamed = False  # Once ACCOUNT_UPDATE feeds the balance, fills stop adjusting it
+
+    def _position(self, symbol: str, position_side: str = 'BOTH') -> Position:
+        key = (symbol, position_side)
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = Position(symbol, position_side)
+        return position
+
+    def _symbol_positions(self, symbol: str) -> list:
+        return [p for (s, _), p in list(self.positions.items()) if s == symbol]
+
+    def _leverage(self, symbol: str) -> float:
+        positions = self._symbol_positions(symbol)
+        return positions[0].leverage if positions else Config.RISK_DEFAULT_LEVERAGE
+
+    # --- Incremental updates -------------------------------------------------
+
+    def apply_order_update(self, symbol: str, order_id, side: str, cum_qty: float, avg_price: float,
+                           position_side: str = 'BOTH') -> float:
+        """
+        Apply an order's cumulative fill (REST RESULT response or user stream update).
+        Only the part we haven't seen yet gets booked, so both sources can report the same order.
+        """
+        if cum_qty <= 0:
+            return 0.0
+        symbol = symbol.upper()
+        with self._lock:
+            seen_qty, seen_avg = self._order_fills.get(order_id, (0.0, 0.0))
+            delta = cum_qty - seen_qty
+            if delta <= 1e-12:
+                return 0.0
+            price = (cum_qty * avg_price - seen_qty * seen_avg) / delta
+            self._order_fills[order_id] = (cum_qty, avg_price)
+            self._order_fills.move_to_end(order_id)
+            while len(self._order_fills) > Config.RISK_FILL_MEMORY:
+                self._order_fills.popitem(last=False)
+
+            signed = delta if side.upper() == 'BUY' else -delta
+            realized = self._position(symbol, position_side or 'BOTH').apply_fill(signed, price)
+            if not self.balance_streamed:
+                self.wallet_balance += realized
+                self.available_balance += realized
+            return realized
+
+    def update_mark(self, symbol: str, price: float):
+        for position in self._symbol_positions(symbol.upper()):
+            position.mark_price = price
+
+    def track_order(self, symbol: str, order_id, side: str, quantity: float, price: float):
+        """A resting order now reserves margin and counts against the open-order limit"""
+        signed = quantity * price if side.upper() == 'BUY' else -quantity * price
+        with self._lock:
+            self.open_orders.setdefault(symbol.upper(), {})[order_id] = signed
+
+    def untrack_order(self, symbol: str, order_id):
+        with self._lock:
+            self.open_orders.get(symbol.upper(), {}).pop(order_id, None)
+
+    def reserve(self, symbol: str, key, side: str, quantity: float, price: float):
+        """Hold a market order's size and margin until it fills - so a burst of orders is checked as a whole"""
+        signed = quantity if side.upper() == 'BUY' else -quantity
+        with self._lock:
+            self.reservations.setdefault(symbol.upper(), {})[key] = (signed, quantity * (price or 0.0))
+
+    def release(self, symbol: str, key):
+        with self._lock:
+            self.reservations.get(symbol.upper(), {}).pop(key, None)
+
+    # --- Pre-trade risk --------------------------------------------------------
+
+    def reference_price(self, symbol: str) -> float:
+        """
+        Price to size a market order's notional by: position mark, then the local book's mid,
+        then a recently fetched mark price - None only if all of those are unavailable.
+        """
+        symbol = symbol.upper()
+        for position in self._symbol_positions(symbol):
+            if position.mark_price or position.entry_price:
+                return position.mark_price or position.entry_price
+        book = self.order_books.get(symbol) if self.order_books is not None else None
+        if book is not None:
+            bid, ask = book.best()
+            if bid and ask:
+                return (bid + ask) / 2
+        cached = self._reference_prices.get(symbol)
+        if cached is not None and time.time() - cached[1] < Config.RISK_PRICE_TTL:
+            return cached[0]
+        if self.client is None:
+            return Config.DEMO_PRICES.get(symbol, Config.DEMO_DEFAULT_PRICE)
+        try:
+            price = float(self.client.futures_mark_price(symbol=symbol)['markPrice'])
+        except Exception as e:
+            bot_logger.log_error(f"Failed to get a reference price for {symbol}", e)
+            return None
+        self._reference_prices[symbol] = (price, time.time())
+        return price
+
+    def check_order(self, symbol: str, side: str, quantity: float, price: float = None, resting: bool = False) -> tuple:
+        """
+        In-process risk limits - returns (ok, errors) like OrderValidator.validate_order.
+        price is the limit price, or None for market orders (reference_price() is used instead).
+        """
+        errors = []
+        symbol = symbol.upper()
+        if price is None:
+            price = self.reference_price(symbol)  # Outside the lock - it may have to ask the exchange
+        with self._lock:
+            # Net across position sides - a hedge-mode LONG and SHORT offset each other here
+            current_qty = sum(p.quantity for p in self._symbol_positions(symbol))
+            current_qty += sum(qty for qty, _ in self.reservations.get(symbol, {}).values())
+
+            signed = quantity if side.upper() == 'BUY' else -quantity
+            projected = current_qty + signed
+            reduces = abs(projected) < abs(current_qty)
+
+            if abs(projected) > Config.RISK_MAX_POSITION_QTY and not reduces:
+                errors.append(f"Position limit: {abs(projected)} > {Config.RISK_MAX_POSITION_QTY} {symbol}")
+
+            if resting:
+                if not self.open_orders_synced:
+                    self._sync_open_orders()
+                orders = self.open_orders.get(symbol, {})
+                if len(orders) >= Config.RISK_MAX_OPEN_ORDERS:
+                    errors.append(f"Open order limit: {len(orders)} orders on {symbol} (max {Config.RISK_MAX_OPEN_ORDERS})")
+
+            # Notional and margin checks need a price - with none at all the order is refused, not waved through
+            if not price:
+                errors.append(f"No reference price for {symbol} - notional and margin can't be checked")
+            else:
+                order_notional = quantity * price
+                if order_notional > Config.RISK_MAX_ORDER_NOTIONAL:
+                    errors.append(f"Order notional {order_notional:.2f} > {Config.RISK_MAX_ORDER_NOTIONAL}")
+                if abs(projected) * price > Config.RISK_MAX_POSITION_NOTIONAL and not reduces:
+                    errors.append(f"Position notional {abs(projected) * price:.2f} > {Config.RISK_MAX_POSITION_NOTIONAL}")
+                if not reduces:
+                    leverage = self._leverage(symbol)
+                    required = order_notional / leverage
+                    if self.margin_used() + required > self.wallet_balance * Config.RISK_MAX_MARGIN_USAGE:
+                        errors.append(f"Margin: {required:.2f} more would exceed {Config.RISK_MAX_MARGIN_USAGE*100:.0f}% of wallet")
+
+        if errors:
+            bot_logger.log_error(f"Risk check rejected {side} {quantity} {symbol}: {', '.join(errors)}")
+        return len(errors) == 0, errors
+
+    def margin_used(self) -> float:
+        """Initial margin for open positions plus what resting orders reserve"""
+        used = 0.0
+        for position in self.positions.values():
+            used += position.notional / position.leverage
+        for symbol, orders in self.open_orders.items():
+            used += sum(abs(n) for n in orders.values()) / self._leverage(symbol)
+        for symbol, reserved in self.reservations.items():
+            leverage = self._leverage(symbol)
+            used += sum(notional for _, notional in reserved.values()) / leverage
+        return used
+
+    # --- Exchange sync -------------------------------------------------------
+
+    def is_fresh(self) -> bool:
+        return self.last_sync is not None and time.time() - self.last_sync < Config.RISK_RESYNC_INTERVAL
+
+    def load_account(self, account: dict):
+        """Replace our view with a futures_account() snapshot - exchange numbers win"""
+        with self._lock:
+            self.wallet_balance = float(account['totalWalletBalance'])
+            self.available_balance = float(account['availableBalance'])
+            for p in account.get('positions', []):
+                qty = float(p['positionAmt'])
+                leverage = float(p.get('leverage', Config.RISK_DEFAULT_LEVERAGE))
+                key = (p['symbol'], p.get('positionSide', 'BOTH'))
+                if qty == 0 and key not in self.positions:
+                    continue
+                position = self._position(*key)
+                position.quantity = qty
+                position.entry_price = float(p['entryPrice'])
+                position.leverage = leverage
+                if qty:
+                    # Mark isn't in the account payload, but unrealized P&L is - back it out
+                    position.mark_price = position.entry_price + float(p['unrealizedProfit']) / qty
+            self.last_sync = time.time()
+
+    def _sync_open_orders(self):
+        if self.client is None:
+            return
+        try:
+            orders = self.client.futures_get_open_orders()
+        except Exception as e:
+            bot_logger.log_error("Failed to sync open orders for risk checks", e)
+            return
+        self.open_orders = {}
+        for o in orders:
+            price = float(o.get('price') or 0) or float(o.get('stopPrice') or 0)
+            self.track_order(o['symbol'], o['orderId'], o['side'], float(o['origQty']) - float(o.get('executedQty', 0)), price)
+        self.open_orders_synced = True
+
+    def resync(self, force: bool = False) -> bool:
+        """Refresh from the account endpoint - only when stale, unless forced"""
+        if self.client is None or (self.is_fresh() and not force):
+            return False
+        try:
+            self.load_account(self.client.futures_account())
+            self._sync_open_orders()
+            bot_logger.logger.info(f"POSITIONS: resynced {len(self.positions)} positions from account")
+            return True
+        except Exception as e:
+            bot_logger.log_error("Position book resync failed", e)
+            return False
+
+    # --- Stream handlers -----------------------------------------------------
+
+    def attach(self, market_stream=None, user_stream=None, symbols: list = None):
+        """Wire live fills (user stream) and marks (markPrice stream) into the book"""
+        if user_stream is not None:
+            self.balance_streamed = True
+            user_stream.subscribe('ORDER_TRADE_UPDATE', self.on_order_update)
+            user_stream.subscribe('ACCOUNT_UPDATE', self.on_account_update)
+        if market_stream is not None:
+            for symbol in symbols or sorted({s for s, _ in self.positions}):
+                market_stream.subscribe(symbol, 'markPrice@1s', self.on_mark_price)
+
+    def on_mark_price(self, symbol: str, data: dict):
+        self.update_mark(symbol, float(data['p']))
+
+    def on_order_update(self, msg: dict):
+        o = msg['o']
+        status = o['X']
+        if status == 'NEW' and o['o'] != 'MARKET':
+            self.track_order(o['s'], o['i'], o['S'], float(o['q']), float(o['p']) or float(o['sp']))
+        if float(o['z']) > 0:
+            self.apply_order_update(o['s'], o['i'], o['S'], float(o['z']), float(o['ap']), o.get('ps', 'BOTH'))
+        if status in ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'):
+            self.untrack_order(o['s'], o['i'])
+
+    def on_account_update(self, msg: dict):
+        """
+        Balance only. Its position amounts are absolute and can land before or after the REST
+        RESULT for the same fill, so positions stay fill-driven (order updates) plus resync().
+        """
+        with self._lock:
+            for b in msg['a'].get('B', []):
+                if b['a'] == 'USDT':
+                    wallet = float(b['wb'])
+                    self.available_balance += wallet - self.wallet_balance
+                    self.wallet_balance = wallet
+
+    def summary(self) -> dict:
+        with self._lock:
+            unrealized = sum(p.unrealized_pnl for p in self.positions.values())
+            return {
+                'wallet_balance': self.wallet_balance,
+                'available_balance': self.available_balance,
+                'unrealized_pnl': unrealized,
+                'realized_pnl': sum(p.realized_pnl for p in self.positions.values()),
+                'margin_used': self.margin_used(),
+                'positions': [p for p in self.positions.values() if p.quantity != 0],
+                'last_sync': self.last_sync,
+            }
@@ -0,0 +1,139 @@
+import sys
+import time
+import threading
+import cProfile
+from collections import defaultdict
+
+# Built-in profiler - answers "where did the time go" for any command.
+# Spans are cheap named timers around startup, client init, validation, API calls and logging.
+# Output is folded-stack text ("thread;span;child microseconds"), which flamegraph.pl and
+# speedscope load directly. Disabled spans cost one attribute check.
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start', 'children')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.children = 0.0
+        self.profiler._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        path = ';'.join([threading.current_thread().name] + [s.name for s in stack] + [self.name])
+        self.profiler._record(path, self.name, elapsed, elapsed - self.children)
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.mode = None
+        self.output = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._self_time = defaultdict(float)  # folded path -> self seconds
+        self._totals = defaultdict(lambda: [0, 0.0])  # span name -> [count, inclusive seconds]
+        self._samples = defaultdict(int)  # folded python stack -> sample count
+        self._cprofile = None
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    def start(self, output: str, mode: str = 'spans', sample_interval: float = 0.005):
+        """mode: 'spans' (named spans only), 'cprofile' (+ cProfile of the main thread), 'sample' (+ stack sampling of every thread)"""
+        self.enabled = True
+        self.mode = mode
+        self.output = output
+        if mode == 'cprofile':
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif mode == 'sample':
+            # Sampling sees every thread, including TWAP/grid workers started by the command
+            self._sampler = threading.Thread(target=self._sample_loop, args=(sample_interval,), name='profiler-sampler')
+            self._sampler.daemon = True
+            self._sampler.start()
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        """Record a span measured elsewhere (e.g. import time, taken before the profiler existed)"""
+        if self.enabled:
+            self._record(f"{threading.current_thread().name};{name}", name.split(';')[-1], seconds, seconds)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path: str, name: str, inclusive: float, self_time: float):
+        with self._lock:
+            self._self_time[path] += self_time
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += inclusive
+
+    def _sample_loop(self, interval: float):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop_sampling.wait(interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._samples[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> list:
+        """Write the profile and return the top spans as (name, count, total seconds)"""
+        if not self.enabled:
+            return []
+        self.enabled = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(f"{self.output}.prof")
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+
+        with self._lock:
+            with open(self.output, 'w') as f:
+                for path, seconds in sorted(self._self_time.items()):
+                    f.write(f"{path} {max(int(seconds * 1e6), 0)}\n")
+            if self._samples:
+                with open(f"{self.output}.samples", 'w') as f:
+                    for path, count in sorted(self._samples.items()):
+                        f.write(f"{path} {count}\n")
+            return sorted(((name, c, t) for name, (c, t) in self._totals.items()), key=lambda x: x[2], reverse=True)
+
+
+profiler = Profiler()
@@ -0,0 +1,37 @@
+import time
+import threading
+from config import Config
+
+# Token bucket - I got banned once for hammering the API, never again.
+# acquire() blocks just long enough to stay under the limit, shared safely between threads.
+
+
+class RateLimiter:
+    def __init__(self, rate_per_second: float, burst: float = None):
+        self.rate = rate_per_second
+        self.capacity = burst or rate_per_second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Take tokens, sleeping if needed - returns how long we waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Order-count limit shared by everything that places orders in bulk
+order_rate_limiter = RateLimiter(Config.ORDER_RATE_LIMIT_PER_SECOND, Config.ORDER_RATE_LIMIT_BURST)
+
+# Request weight (the per-minute IP budget) for bulk market data pulls
+request_weight_limiter = RateLimiter(Config.REQUEST_WEIGHT_PER_SECOND, Config.REQUEST_WEIGHT_BURST)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import numpy as np
+from binance.client import Client
+from config import Config
+from logger import bot_logger
+from kline_store import KlineStore, INTERVAL_MS
+from kline_sync import KlineSync
+
+# Market scanner - ranks every USDT-M perpetual as a grid candidate.
+# Three bulk calls cover the whole market (24hr tickers, premium index, exchange info),
+# klines are only pulled for the most liquid symbols and cached in the kline store, and
+# every metric is one NumPy expression over a symbols x bars matrix - no per-symbol loops.
+#
+# A good grid market moves a lot but goes nowhere: wide bars, low efficiency (net move over
+# path length), and cheap funding since the grid sits on inventory.
+
+
+class MarketScanner:
+    def __init__(self, client: Client, store: KlineStore = None, cache_dir: str = None):
+        self.client = client
+        self.store = store or KlineStore()
+        self.syncer = KlineSync(client, self.store)
+        self.cache_dir = Config.SCAN_CACHE_DIR if cache_dir is None else cache_dir
+
+    def _cached(self, name: str, fetch, ttl: float, refresh: bool = False):
+        """Bulk responses live in small JSON files - re-running a scan within the TTL costs no API weight"""
+        path = os.path.join(self.cache_dir, f"{name}.json")
+        fresh = os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl
+        if self.client is None or (fresh and not refresh):
+            # Demo mode scans whatever was cached last, however old
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+            return None
+        data = fetch()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return data
+
+    def _perpetuals(self, refresh: bool) -> set:
+        """Trading USDT-margined perpetuals - None if exchange info is unavailable"""
+        info = self._cached('exchange_info', self.client.futures_exchange_info if self.client else None,
+                            Config.SCAN_EXCHANGE_INFO_TTL, refresh)
+        if not info:
+            return None
+        return {s['symbol'] for s in info['symbols']
+                if s.get('contractType') == 'PERPETUAL' and s.get('quoteAsset') == 'USDT' and s.get('status') == 'TRADING'}
+
+    def _kline_matrix(self, symbols: list, interval: str, lookback: int) -> tuple:
+        """(symbols, highs, lows, closes) - one row per symbol with a full lookback, oldest bar first"""
+        keep, highs, lows, closes = [], [], [], []
+        for symbol in symbols:
+            k = self.store.tail(symbol, interval, lookback)
+            if len(k['close']) < lookback:
+                continue  # New listing or never synced - not enough history to judge
+            keep.append(symbol)
+            highs.append(k['high'])
+            lows.append(k['low'])
+            closes.append(k['close'])
+        if not keep:
+            return keep, np.empty((0, lookback)), np.empty((0, lookback)), np.empty((0, lookback))
+        return keep, np.vstack(highs), np.vstack(lows), np.vstack(closes)
+
+    def scan(self, top: int = None, universe: int = None, interval: str = None, lookback: int = None,
+             min_quote_volume: float = None, refresh: bool = False) -> dict:
+        """
+        Rank grid candidates. `universe` most liquid symbols get kline metrics, the best
+        `top` are returned with a suggested base price, spread and number of levels.
+        """
+        top = top or Config.SCAN_TOP
+        universe = universe or Config.SCAN_UNIVERSE
+        interval = interval or Config.SCAN_INTERVAL
+        lookback = lookback or Config.SCAN_LOOKBACK
+        min_quote_volume = Config.SCAN_MIN_QUOTE_VOLUME if min_quote_volume is None else min_quote_volume
+        started = time.perf_counter()
+
+        try:
+            tickers = self._cached('ticker_24hr', self.client.futures_ticker if self.client else None,
+                                   Config.SCAN_CACHE_TTL, refresh)
+            premium = self._cached('premium_index', self.client.futures_mark_price if self.client else None,
+                                   Config.SCAN_CACHE_TTL, refresh)
+            if not tickers or not premium:
+                return {'success': False, 'error': 'No market data - needs an API connection (or a cached scan)'}
+            perpetuals = self._perpetuals(refresh)
+
+            # Whole-market columns straight from the bulk tickers
+            tickers = [t for t in tickers if t['symbol'].endswith('USDT') and (perpetuals is None or t['symbol'] in perpetuals)]
+            symbols = np.array([t['symbol'] for t in tickers])
+            ticker = np.array([[t['lastPrice'], t['highPrice'], t['lowPrice'], t['quoteVolume'], t['priceChangePercent']]
+                               for t in tickers], dtype=np.float64).reshape(-1, 5)
+            last, high, low, quote_volume, change = ticker.T
+            funding_by_symbol = {p['symbol']: (float(p['markPrice']), float(p['lastFundingRate'] or 0)) for p in premium}
+            mark, funding = np.array([funding_by_symbol.get(s, (np.nan, 0.0)) for s in symbols]).reshape(-1, 2).T
+            mark = np.where(np.isnan(mark), last, mark)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                range_24h = np.where(last > 0, (high - low) / last, 0.0)
+
+            # Klines only for the liquid end of the market - parallel, each one incremental
+            liquid = (quote_volume >= min_quote_volume) & (last > 0)
+            order = np.argsort(-quote_volume[liquid], kind='stable')[:universe]
+            candidates = symbols[liquid][order].tolist()
+            since = int(time.time() * 1000) - (lookback + 1) * INTERVAL_MS[interval]
+            synced = sum(self.syncer.sync_many(candidates, [interval], since).values())
+
+            scored, highs, lows, closes = self._kline_matrix(candidates, interval, lookback)
+            if not scored:
+                return {'success': False, 'error': f"No {interval} klines for any candidate - nothing to rank"}
+            metrics = self.grid_metrics(highs, lows, closes)
+
+            index = {s: i for i, s in enumerate(symbols.tolist())}
+            rows = np.array([index[s] for s in scored])
+            funding_cost = np.abs(funding[rows]) * Config.SCAN_FUNDING_WEIGHT
+            score = metrics['bar_range'] * (1 - metrics['efficiency']) - funding_cost
+
+            spread = np.clip(metrics['bar_range'] * Config.SCAN_SPREAD_BAR_RANGE_MULT, Config.SCAN_MIN_SPREAD, Config.SCAN_MAX_SPREAD)
+            # Enough levels on each side to cover half the lookback range
+            levels = np.clip(np.ceil(metrics['lookback_range'] / 2 / spread), Config.SCAN_MIN_LEVELS, Config.SCAN_MAX_LEVELS)
+
+            ranked = np.argsort(-score, kind='stable')[:top]
+            results = [{
+                'symbol': scored[i],
+                'score': float(score[i]),
+                'price': float(last[rows[i]]),
+                'mark_price': float(mark[rows[i]]),
+                'quote_volume': float(quote_volume[rows[i]]),
+                'change_24h_pct': float(change[rows[i]]),
+                'range_24h': float(range_24h[rows[i]]),
+                'volatility': float(metrics['volatility'][i]),
+                'bar_range': float(metrics['bar_range'][i]),
+                'lookback_range': float(metrics['lookback_range'][i]),
+                'efficiency': float(metrics['efficiency'][i]),
+                'funding_rate': float(funding[rows[i]]),
+                'base_price': float(mark[rows[i]]),
+                'grid_spread': round(float(spread[i]), 4),
+                'grid_levels': int(levels[i]),
+            } for i in ranked]
+
+            return {
+                'success': True,
+                'candidates': results,
+                'symbols_scanned': len(symbols),
+                'symbols_ranked': len(scored),
+                'klines_synced': synced,
+                'interval': interval,
+                'lookback': lookback,
+                'elapsed_seconds': time.perf_counter() - started
+            }
+
+        except Exception as e:
+            error_msg = "Market scan failed"
+            bot_logger.log_error(error_msg, e)
+            return {'success': False, 'error': error_msg}
+
+    @staticmethod
+    def grid_metrics(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> dict:
+        """Per-row metrics over symbols x bars matrices - all vectorized along axis 1"""
+        log_close = np.log(closes)
+        returns = np.diff(log_close, axis=1)
+        path = np.abs(returns).sum(axis=1)
+        net = np.abs(log_close[:, -1] - log_close[:, 0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            efficiency = np.where(path > 0, net / path, 1.0)  # 0 = pure chop, 1 = straight line
+        return {
+            'volatility': returns.std(axis=1),  # Per-bar log return std
+            'bar_range': ((highs - lows) / closes).mean(axis=1),  # Average high-low swing per bar
+            'lookback_range': (highs.max(axis=1) - lows.min(axis=1)) / closes[:, -1],
+            'efficiency': efficiency,
+        }
@@ -0,0 +1,329 @@
+import os
+import json
+import hmac
+import math
+import time
+import queue
+import hashlib
+import threading
+import socketserver
+from collections import OrderedDict, Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from config import Config
+from logger import bot_logger
+
+# Signal ingest - a long-running process that turns external alerts (webhooks, models) into orders
+# without paying a process spawn, exchange info load and connection setup per order.
+# The HTTP handler only authenticates, validates against the cached filters and de-duplicates,
+# then queues the signal and answers 202; worker threads pull from the queue and call the
+# already-warm order managers. Signal-to-order latency is measured from the first byte we parsed.
+#
+# Wire format: POST /signal with a JSON body and X-Signature = hex HMAC-SHA256(body, SIGNAL_SECRET).
+# timestamp (ms) is required and must be within SIGNAL_MAX_AGE_MS of our clock.
+#   {"id": "abc-1", "timestamp": 1700000000000, "symbol": "BTCUSDT", "side": "BUY", "type": "LIMIT",
+#    "quantity": 0.01, "price": 44000}
+# type MARKET | LIMIT (price) | TWAP (duration, intervals) | GRID (base_price, levels, spread)
+SIGNAL_TYPES = ('MARKET', 'LIMIT', 'TWAP', 'GRID')
+
+
+class SignalRouter:
+    """Auth, validation, de-duplication and the dispatch queue - independent of the transport"""
+
+    def __init__(self, market_orders, limit_orders, twap_orders=None, grid_orders=None, secret: str = None,
+                 workers: int = None):
+        self.market_orders = market_orders
+        self.limit_orders = limit_orders
+        self.twap_orders = twap_orders
+        self.grid_orders = grid_orders
+        self.validator = market_orders.validator  # Exchange info is already loaded - filters come from here
+        self.secret = (secret or Config.SIGNAL_SECRET or '').encode()
+        self.queue = queue.Queue(maxsize=Config.SIGNAL_QUEUE_SIZE)
+        self.counts = Counter()  # accepted / rejected / duplicate / placed / failed
+        self._counts_lock = threading.Lock()  # Bumped from handler and worker threads alike
+        self.received_to_dispatch = deque(maxlen=Config.SIGNAL_LATENCY_SAMPLES)  # Parsed -> picked up by a worker
+        self.received_to_ack = deque(maxlen=Config.SIGNAL_LATENCY_SAMPLES)  # Parsed -> manager returned
+        self.recent = deque(maxlen=Config.SIGNAL_RESULT_HISTORY)  # Last results, for the serve screen
+        self._seen = OrderedDict()  # Signal ids - bounded, oldest forgotten first
+        self._seen_lock = threading.Lock()
+        self._workers = []
+        for i in range(workers or Config.SIGNAL_WORKERS):
+            thread = threading.Thread(target=self._run, name=f"signal-{i}")
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    # --- ingest (handler threads) --------------------------------------------
+
+    def verify(self, body: bytes, signature: str) -> bool:
+        if not self.secret or not signature:
+            return False
+        expected = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature.strip().lower())
+
+    def submit(self, body: bytes, signature: str, received: float = None) -> tuple:
+        """Returns (http status, response) - the order itself is placed later by a worker"""
+        received = received or time.perf_counter()
+        if not self.verify(body, signature):
+            self._count('rejected')
+            return 401, {'accepted': False, 'error': 'Bad signature'}
+        try:
+            signal = json.loads(body)
+        except ValueError:
+            self._count('rejected')
+            return 400, {'accepted': False, 'error': 'Body is not valid JSON'}
+
+        signal, errors = self.parse(signal)
+        if errors:
+            self._count('rejected')
+            bot_logger.logger.warning(f"SIGNAL: rejected {signal.get('id')}: {', '.join(errors)}")
+            return 400, {'accepted': False, 'signal_id': signal.get('id'), 'errors': errors}
+        if not self._first_sighting(signal['id']):
+            self._count('duplicate')
+            return 200, {'accepted': False, 'signal_id': signal['id'], 'error': 'Duplicate signal'}
+        try:
+            self.queue.put_nowait((received, signal))
+        except queue.Full:
+            self._forget(signal['id'])  # Let the sender retry it
+            self._count('rejected')
+            return 503, {'accepted': False, 'signal_id': signal['id'], 'error': 'Queue full'}
+        self._count('accepted')
+        return 202, {'accepted': True, 'signal_id': signal['id']}
+
+    def _count(self, name: str):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def parse(self, raw) -> tuple:
+        """Normalize a signal and check it against the cached symbol filters - returns (signal, errors)"""
+        if not isinstance(raw, dict):
+            return {}, ['Signal must be a JSON object']
+        errors = []
+        signal_id = str(raw.get('id') or '')
+        if not signal_id or len(signal_id) > 64:
+            errors.append('id is required (at most 64 characters)')
+
+        # Required, and close to now either way - with de-duplication only in memory, this is what stops
+        # a captured body from being replayed after a restart or once its id has been forgotten
+        timestamp = raw.get('timestamp')
+        if timestamp is None:
+            errors.append('timestamp is required (milliseconds since the epoch)')
+        else:
+            try:
+                age = time.time() * 1000 - self._finite(timestamp)
+                if abs(age) > Config.SIGNAL_MAX_AGE_MS:
+                    errors.append(f"Signal timestamp is {age:.0f}ms off (max {Config.SIGNAL_MAX_AGE_MS})")
+            except (TypeError, ValueError):
+                errors.append(f"Invalid timestamp: {timestamp}")
+
+        order_type = str(raw.get('type', 'MARKET')).upper()
+        if order_type not in SIGNAL_TYPES:
+            return {'id': signal_id}, errors + [f"Invalid type: {order_type}"]
+        signal = {'id': signal_id, 'type': order_type, 'symbol': str(raw.get('symbol', '')).upper(),
+                  'side': str(raw.get('side', 'BUY')).upper()}
+        numbers = {'quantity': True, 'price': order_type == 'LIMIT', 'duration': False, 'intervals': False,
+                   'base_price': order_type == 'GRID', 'levels': False, 'spread': False, 'max_slippage_bps': False}
+        for field, required in numbers.items():
+            value = raw.get(field)
+            if value is None:
+                if required:
+                    errors.append(f"{field} is required for {order_type}")
+                continue
+            try:
+                signal[field] = self._finite(value)
+            except (TypeError, ValueError):
+                errors.append(f"Invalid {field}: {value}")
+        if errors:
+            return signal, errors
+
+        # Same checks the managers run, plus the exchange's step/tick filters - so bad signals bounce at the door
+        price = signal.get('price', signal.get('base_price'))
+        _, validation_errors = self.validator.validate_order(
+            signal['symbol'], signal['side'], 'LIMIT' if price is not None else 'MARKET', signal['quantity'], price)
+        errors += validation_errors
+        errors += self._filter_errors(signal['symbol'], 'quantity', signal['quantity'], self.validator.step_size(signal['symbol']))
+        if order_type == 'LIMIT':
+            errors += self._filter_errors(signal['symbol'], 'price', price, self.validator.tick_size(signal['symbol']))
+        if order_type == 'TWAP' and self.twap_orders is None or order_type == 'GRID' and self.grid_orders is None:
+            errors.append(f"{order_type} signals are not enabled")
+        return signal, errors
+
+    @staticmethod
+    def _finite(value) -> float:
+        # float() takes 'nan' and 'inf' - NaN slips past every comparison, so refuse both up front
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(value)
+        return number
+
+    @staticmethod
+    def _filter_errors(symbol: str, field: str, value: float, increment: float) -> list:
+        if not increment:
+            return []  # No exchange info (demo mode) - the manager's own checks still apply
+        steps = value / increment
+        if abs(steps - round(steps)) > 1e-6:
+            return [f"{field} {value} is not a multiple of {increment:g} for {symbol}"]
+        return []
+
+    def _first_sighting(self, signal_id: str) -> bool:
+        with self._seen_lock:
+            if signal_id in self._seen:
+                return False
+            self._seen[signal_id] = time.time()
+            while len(self._seen) > Config.SIGNAL_DEDUPE_SIZE:
+                self._seen.popitem(last=False)
+            return True
+
+    def _forget(self, signal_id: str):
+        with self._seen_lock:
+            self._seen.pop(signal_id, None)
+
+    # --- dispatch (worker threads) -------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break  # Shutting down
+            received, signal = item
+            self.received_to_dispatch.append(time.perf_counter() - received)
+            try:
+                result = self.dispatch(signal)
+            except Exception as e:
+                bot_logger.log_error(f"Signal {signal['id']} dispatch failed", e)
+                result = {'success': False, 'error': str(e)}
+            elapsed = time.perf_counter() - received
+            self.received_to_ack.append(elapsed)
+            self._count('placed' if result.get('success') else 'failed')
+            self.recent.append({'signal_id': signal['id'], 'type': signal['type'], 'symbol': signal['symbol'],
+                                'success': bool(result.get('success')), 'latency_ms': elapsed * 1000,
+                                'order_id': result.get('order_id') or result.get('twap_id') or result.get('grid_id'),
+                                'error': result.get('error')})
+            bot_logger.logger.info(f"SIGNAL: {signal['id']} {signal['type']} {signal['symbol']} -> "
+                                   f"{'OK' if result.get('success') else result.get('error')} in {elapsed * 1000:.1f}ms")
+
+    def dispatch(self, signal: dict) -> dict:
+        """Hand a validated signal to the manager for its type"""
+        symbol, side, quantity = signal['symbol'], signal['side'], signal['quantity']
+        if signal['type'] == 'MARKET':
+            if signal.get('max_slippage_bps') is not None:
+                return self.market_orders.place_capped_market_order(symbol, side, quantity, signal['max_slippage_bps'])
+            return self.market_orders.place_market_order(symbol, side, quantity)
+        if signal['type'] == 'LIMIT':
+            return self.limit_orders.place_limit_order(symbol, side, quantity, signal['price'])
+        if signal['type'] == 'TWAP':
+            intervals = signal.get('intervals')
+            return self.twap_orders.execute_twap_order(symbol, side, quantity, signal.get('duration'),
+                                                       int(intervals) if intervals else None, signal.get('max_slippage_bps'))
+        levels = signal.get('levels')
+        return self.grid_orders.start_grid_trading(symbol, signal['base_price'],
+                                                   int(levels) if levels else Config.DEFAULT_GRID_LEVELS,
+                                                   signal.get('spread') or Config.DEFAULT_GRID_SPREAD, quantity)
+
+    def get_metrics(self) -> dict:
+        """Signal counts plus received-to-dispatch / received-to-ack latency percentiles in milliseconds"""
+        with self._counts_lock:
+            metrics = dict(self.counts)
+        metrics['queued'] = self.queue.qsize()
+        for name, samples in (('received_to_dispatch', self.received_to_dispatch), ('received_to_ack', self.received_to_ack)):
+            if samples:
+                values = np.fromiter(list(samples), dtype=np.float64) * 1000
+                metrics[f"{name}_p50_ms"] = float(np.percentile(values, 50))
+                metrics[f"{name}_p99_ms"] = float(np.percentile(values, 99))
+        return metrics
+
+    def stop(self):
+        for _ in self._workers:
+            self.queue.put(None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    router = None  # Set on the per-server subclass
+    protocol_version = 'HTTP/1.1'  # Keep-alive - a sender posting a burst of signals reuses its connection
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes - don't let delayed ACKs add 40ms
+
+    def log_message(self, format, *args):
+        pass  # Every signal is logged by the router
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            return self._send(200, self.router.get_metrics())
+        self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        received = time.perf_counter()
+        if self.path.split('?')[0] != '/signal':
+            return self._send(404, {'error': 'Not found'})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > Config.SIGNAL_MAX_BODY:
+            self.close_connection = True  # Don't read it
+            return self._send(413, {'accepted': False, 'error': 'Body too large'})
+        body = self.rfile.read(length)
+        self._send(*self.router.submit(body, self.headers.get('X-Signature'), received))
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _UnixHandler(_Handler):
+    disable_nagle_algorithm = False  # No TCP under a Unix socket
+
+    def address_string(self):
+        return 'unix'  # client_address is an empty string here
+
+
+class _SignalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _SignalUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class SignalServer:
+    """HTTP on host:port and/or a Unix socket - both feed the same router"""
+
+    def __init__(self, router: SignalRouter, host: str = None, port: int = None, unix_socket: str = None,
+                 http: bool = True):
+        self.router = router
+        self.servers = []
+        self.http = None
+        if http:
+            handler = type('SignalHandler', (_Handler,), {'router': router})
+            self.http = _SignalHTTPServer((host or Config.SIGNAL_HOST, Config.SIGNAL_PORT if port is None else port), handler)
+            self.servers.append(self.http)
+        self.unix_socket = unix_socket
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.unlink(unix_socket)  # Left over from a previous run
+            handler = type('SignalUnixHandler', (_UnixHandler,), {'router': router})
+            self.servers.append(_SignalUnixServer(unix_socket, handler))
+            os.chmod(unix_socket, 0o600)  # Only this user can post signals through it
+
+    @property
+    def url(self) -> str:
+        if self.http is None:
+            return None
+        host, port = self.http.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        for i, server in enumerate(self.servers):
+            thread = threading.Thread(target=server.serve_forever, name=f"signal-server-{i}")
+            thread.daemon = True
+            thread.start()
+        bot_logger.logger.info(f"SIGNAL: listening on {' and '.join(filter(None, [self.url, self.unix_socket]))}")
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.unlink(self.unix_socket)
+        self.router.stop()
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from config import Config
+from logger import bot_logger
+from market_stream import MarketStream
+
+# Market data recorder - captures what the bot saw so incidents can be replayed later.
+# Every event becomes one fixed-width 64 byte record appended to a memory-mapped segment file.
+# Segments roll over when full and the oldest get deleted, so disk use is a fixed ring.
+
+TICK_DTYPE = np.dtype([
+    ('ts', '<i8'),        # Local receive time (microseconds) - monotonic within a recording, used for the time index
+    ('event_ts', '<i8'),  # Exchange event time (milliseconds)
+    ('seq', '<i8'),       # aggTrade id / book update id
+    ('price', '<f8'),
+    ('qty', '<f8'),
+    ('price2', '<f8'),    # bookTicker: ask price | depth: first update id (U)
+    ('qty2', '<f8'),      # bookTicker: ask qty   | depth: previous final update id (pu)
+    ('symbol', '<u2'),
+    ('kind', 'u1'),
+    ('flags', 'u1'),
+    ('pad', '<u4'),
+])
+
+KIND_TRADE = 1
+KIND_BOOK = 2
+KIND_DEPTH_BID = 3
+KIND_DEPTH_ASK = 4
+
+FLAG_BUYER_MAKER = 1
+FLAG_LAST_LEVEL = 2  # Last level of a depth event - replay regroups levels on this
+
+INDEX_FILE = 'index.json'
+
+
+class TickRecorder:
+    def __init__(self, directory: str = None, segment_records: int = None, max_segments: int = None):
+        self.directory = directory or Config.TICK_DIR
+        self.segment_records = segment_records or Config.TICK_SEGMENT_RECORDS
+        self.max_segments = max_segments or Config.TICK_MAX_SEGMENTS
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.index = _load_index(self.directory)
+        self._symbol_ids = {s: i for i, s in enumerate(self.index['symbols'])}
+        self._lock = threading.Lock()
+        self._segment = None
+        self._mm = None
+        self._pos = 0
+        self._last_ts = 0
+        self.records = 0
+
+    def attach(self, stream: MarketStream, symbols: list, streams: list = None):
+        """Subscribe the recorder to every configured stream for the given symbols"""
+        handlers = {'aggTrade': self.on_trade, 'bookTicker': self.on_book_ticker}
+        for symbol in symbols:
+            for name in streams or Config.RECORD_STREAMS:
+                handler = self.on_depth if name.startswith('depth') else handlers.get(name)
+                if handler is None:
+                    raise ValueError(f"Recorder can't store stream type: {name}")
+                stream.subscribe(symbol, name, handler)
+
+    def on_trade(self, symbol: str, data: dict):
+        flags = FLAG_BUYER_MAKER if data.get('m') else 0
+        self._write(symbol, KIND_TRADE, data.get('T', data.get('E', 0)), data.get('a', 0),
+                    float(data['p']), float(data['q']), 0.0, 0.0, flags)
+
+    def on_book_ticker(self, symbol: str, data: dict):
+        self._write(symbol, KIND_BOOK, data.get('T', data.get('E', 0)), data.get('u', 0),
+                    float(data['b']), float(data['B']), float(data['a']), float(data['A']), 0)
+
+    def on_depth(self, symbol: str, data: dict):
+        levels = [(KIND_DEPTH_BID, p, q) for p, q in data.get('b', [])] + \
+                 [(KIND_DEPTH_ASK, p, q) for p, q in data.get('a', [])]
+        if not levels:
+            # Still record the event - its u is the next event's pu, and replay checks the chain
+            levels = [(KIND_DEPTH_BID, 0.0, 0.0)]
+        last = len(levels) - 1
+        for i, (kind, price, qty) in enumerate(levels):
+            self._write(symbol, kind, data.get('E', 0), data['u'], float(price), float(qty),
+                        float(data.get('U', 0)), float(data.get('pu', 0)), FLAG_LAST_LEVEL if i == last else 0)
+
+    def _symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.index['symbols'])
+            self.index['symbols'].append(symbol)
+            self._symbol_ids[symbol] = symbol_id
+        return symbol_id
+
+    def _write(self, symbol, kind, event_ts, seq, price, qty, price2, qty2, flags):
+        with self._lock:
+            if self._mm is None or self._pos >= self.segment_records:
+                self._roll()
+
+            # Keep the time index sortable even if the wall clock steps backwards
+            ts = max(time.time_ns() // 1000, self._last_ts)
+            self._last_ts = ts
+            self._mm[self._pos] = (ts, event_ts, seq, price, qty, price2, qty2, self._symbol_id(symbol), kind, flags, 0)
+
+            segment = self._segment
+            if self._pos == 0:
+                segment['first_ts'] = ts
+            segment['last_ts'] = ts
+            self._pos += 1
+            segment['count'] = self._pos
+            self.records += 1
+
+    def _roll(self):
+        """Close the current segment and open the next one, dropping the oldest beyond the ring size"""
+        self._close_segment()
+
+        name = f"ticks-{time.time_ns() // 1000}.bin"
+        self._mm = np.memmap(os.path.join(self.directory, name), dtype=TICK_DTYPE, mode='w+', shape=(self.segment_records,))
+        self._segment = {'file': name, 'first_ts': None, 'last_ts': None, 'count': 0}
+        self._pos = 0
+        self.index['segments'].append(self._segment)
+
+        while len(self.index['segments']) > self.max_segments:
+            old = self.index['segments'].pop(0)
+            try:
+                os.remove(os.path.join(self.directory, old['file']))
+            except OSError as e:
+                bot_logger.log_error(f"Failed to remove old tick segment {old['file']}", e)
+        self._save_index()
+
+    def _close_segment(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm = None
+            self._save_index()
+
+    def _save_index(self):
+        tmp = os.path.join(self.directory, INDEX_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, os.path.join(self.directory, INDEX_FILE))
+
+    def flush(self):
+        """Persist written records and the index - readers only see what the index says is there"""
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+            self._save_index()
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+
+class TickReplay:
+    """Feed recorded ticks back through a MarketStream (or anything with dispatch()) at real or accelerated speed"""
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or Config.TICK_DIR
+        self.index = _load_index(self.directory)
+        self.symbols = self.index['symbols']
+
+    def records(self, start_us: int = None, end_us: int = None, block: int = 4096):
+        """Yield record blocks in time order without loading whole segments"""
+        for segment in self.index['segments']:
+            count = segment['count']
+            if not count:
+                continue
+            if start_us is not None and segment['last_ts'] < start_us:
+                continue
+            if end_us is not None and segment['first_ts'] > end_us:
+                break
+
+            mm = np.memmap(os.path.join(self.directory, segment['file']), dtype=TICK_DTYPE, mode='r', shape=(count,))
+            lo = 0 if start_us is None else int(np.searchsorted(mm['ts'], start_us, side='left'))
+            hi = count if end_us is None else int(np.searchsorted(mm['ts'], end_us, side='right'))
+            for i in range(lo, hi, block):
+                yield mm[i:min(i + block, hi)]
+
+    def run(self, target, start_us: int = None, end_us: int = None, speed: float = 1.0, symbols: list = None) -> dict:
+        """
+        Replay into target.dispatch(symbol, stream, data).
+        speed=1 is real time, 10 is ten times faster, 0 replays as fast as possible.
+        """
+        wanted = None
+        if symbols:
+            wanted = {i for i, s in enumerate(self.symbols) if s in {x.upper() for x in symbols}}
+
+        counts = {'trades': 0, 'book_tickers': 0, 'depth_updates': 0}
+        depth_pending = {}  # symbol id -> payload being regrouped
+        wall_start = time.perf_counter()
+        first_ts = None
+
+        for block in self.records(start_us, end_us):
+            for rec in block:
+                symbol_id = int(rec['symbol'])
+                if wanted is not None and symbol_id not in wanted:
+                    continue
+
+                ts = int(rec['ts'])
+                if first_ts is None:
+                    first_ts = ts
+                if speed > 0:
+                    # Sleep until this record is due at the requested replay speed
+                    ahead = (ts - first_ts) / 1e6 / speed - (time.perf_counter() - wall_start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+                symbol = self.symbols[symbol_id]
+                kind = int(rec['kind'])
+                if kind == KIND_TRADE:
+                    target.dispatch(symbol, 'aggTrade', {
+                        'e': 'aggTrade', 's': symbol, 'E': int(rec['event_ts']), 'T': int(rec['event_ts']),
+                        'a': int(rec['seq']), 'p': repr(float(rec['price'])), 'q': repr(float(rec['qty'])),
+                        'm': bool(rec['flags'] & FLAG_BUYER_MAKER)})
+                    counts['trades'] += 1
+                elif kind == KIND_BOOK:
+                    target.dispatch(symbol, 'bookTicker', {
+                        'e': 'bookTicker', 's': symbol, 'E': int(rec['event_ts']), 'T': int(rec['event_ts']),
+                        'u': int(rec['seq']), 'b': repr(float(rec['price'])), 'B': repr(float(rec['qty'])),
+                        'a': repr(float(rec['price2'])), 'A': repr(float(rec['qty2']))})
+                    counts['book_tickers'] += 1
+                else:
+                    payload = depth_pending.setdefault(symbol_id, {
+                        'e': 'depthUpdate', 's': symbol, 'E': int(rec['event_ts']), 'T': int(rec['event_ts']),
+                        'U': int(rec['price2']), 'u': int(rec['seq']), 'pu': int(rec['qty2']), 'b': [], 'a': []})
+                    if rec['price'] > 0:  # Price 0 marks an event that carried no levels
+                        side = 'b' if kind == KIND_DEPTH_BID else 'a'
+                        payload[side].append([repr(float(rec['price'])), repr(float(rec['qty']))])
+                    if rec['flags'] & FLAG_LAST_LEVEL:
+                        target.dispatch(symbol, Config.DEPTH_STREAM, depth_pending.pop(symbol_id))
+                        counts['depth_updates'] += 1
+
+        counts['elapsed_seconds'] = time.perf_counter() - wall_start
+        return counts
+
+
+def _load_index(directory: str) -> dict:
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return {'symbols': [], 'segments': []}
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,153 @@
+import time
+import threading
+from urllib.parse import urlparse
+from collections import deque
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+from config import Config
+from logger import bot_logger
+from profiler import profiler
+
+# Binance rejects signed requests with -1021 when our clock drifts away from theirs.
+# This keeps a smoothed estimate of the server clock offset so every signed request
+# carries a timestamp the exchange agrees with - no more "Timestamp outside recvWindow" at 2 AM.
+TIMESTAMP_ERROR_CODE = -1021
+
+
+class ServerTimeSync:
+    def __init__(self, client: Client, interval: float = None, smoothing: float = None):
+        self.client = client
+        self.interval = interval or Config.TIME_SYNC_INTERVAL
+        self.smoothing = smoothing or Config.TIME_SYNC_SMOOTHING
+        self.offset_ms = 0.0  # server_time - local_time, smoothed
+        self.recv_window = Config.RECV_WINDOW_DEFAULT
+        self.rtts = deque(maxlen=Config.TIME_SYNC_WINDOW)  # Recent round-trip times for recvWindow sizing
+        self.samples = 0
+        self.rejected_samples = 0
+        self.last_sync = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _measure(self) -> tuple:
+        """Take one offset sample - the midpoint of the round trip is our best guess of when the server stamped it"""
+        sent = time.time() * 1000
+        server_time = self.client.futures_time()['serverTime']
+        received = time.time() * 1000
+        rtt = received - sent
+        return server_time - (sent + received) / 2, rtt
+
+    def _apply_sample(self, offset: float, rtt: float):
+        with self._lock:
+            self.rtts.append(rtt)
+            best_rtt = min(self.rtts)
+
+            # Slow round trips have an asymmetric delay we can't see, so their offset is unreliable.
+            # Drop them unless we have nothing better yet (NTP does the same kind of filtering)
+            if self.samples > 0 and rtt > best_rtt * 2 + Config.TIME_SYNC_RTT_SLACK_MS:
+                self.rejected_samples += 1
+            elif self.samples == 0:
+                self.offset_ms = offset
+                self.samples += 1
+            else:
+                # Weight the update by how clean this sample is - the fastest round trip gets the full smoothing factor
+                weight = self.smoothing * (best_rtt + 1) / (rtt + 1)
+                self.offset_ms += weight * (offset - self.offset_ms)
+                self.samples += 1
+
+            self.recv_window = self._compute_recv_window()
+            self.last_sync = time.time()
+
+        # The client reads this on every signed request
+        self.client.timestamp_offset = int(round(self.offset_ms))
+
+    def _compute_recv_window(self) -> int:
+        """Size recvWindow from observed latency - tight when the link is fast, generous when it isn't"""
+        ordered = sorted(self.rtts)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        window = Config.RECV_WINDOW_LATENCY_FACTOR * p99 + Config.RECV_WINDOW_MARGIN_MS
+        return int(min(max(window, Config.RECV_WINDOW_MIN), Config.RECV_WINDOW_MAX))
+
+    def sync(self, samples: int = 1) -> bool:
+        """Take one or more samples and fold them into the estimate"""
+        synced = False
+        for _ in range(samples):
+            try:
+                offset, rtt = self._measure()
+                self._apply_sample(offset, rtt)
+                synced = True
+            except Exception as e:
+                bot_logger.log_error("Server time sync failed", e)
+
+        if synced:
+            skew = self.offset_ms
+            log = bot_logger.logger.warning if abs(skew) > Config.CLOCK_SKEW_WARN_MS else bot_logger.logger.debug
+            log(f"CLOCK: skew {skew:.1f}ms | recvWindow {self.recv_window}ms | rtt {self.rtts[-1]:.1f}ms")
+        return synced
+
+    def resync(self) -> bool:
+        """Burst resync - used right after the exchange tells us our timestamp was off"""
+        return self.sync(samples=Config.TIME_SYNC_BURST)
+
+    def start(self):
+        """Initial burst then a background thread that keeps the estimate fresh"""
+        self.resync()
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='time-sync')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sync()
+
+    def get_metrics(self) -> dict:
+        """Clock health snapshot - skew is what you want to alert on"""
+        with self._lock:
+            ordered = sorted(self.rtts)
+            return {
+                'clock_skew_ms': round(self.offset_ms, 2),
+                'recv_window_ms': self.recv_window,
+                'rtt_min_ms': round(ordered[0], 2) if ordered else None,
+                'rtt_p50_ms': round(ordered[len(ordered) // 2], 2) if ordered else None,
+                'rtt_p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2) if ordered else None,
+                'samples': self.samples,
+                'rejected_samples': self.rejected_samples,
+                'last_sync_age_s': round(time.time() - self.last_sync, 1) if self.last_sync else None
+            }
+
+
+class SyncedClient(Client):
+    """Client that stamps every signed request with the synced clock and an adaptive recvWindow"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.time_sync = ServerTimeSync(self)
+
+    def _get_request_kwargs(self, method, signed: bool, force_params: bool = False, **kwargs):
+        if signed:
+            data = kwargs.setdefault('data', {})
+            if isinstance(data, dict) and 'recvWindow' not in data:
+                data['recvWindow'] = self.time_sync.recv_window
+        return super()._get_request_kwargs(method, signed, force_params, **kwargs)
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        # Keep a pristine copy - the parent mutates data into a signed, sorted list
+        retry_kwargs = dict(kwargs)
+        if isinstance(kwargs.get('data'), dict):
+            retry_kwargs['data'] = dict(kwargs['data'])
+        try:
+            with profiler.span(f"api {method.upper()} {urlparse(uri).path}"):
+                return super()._request(method, uri, signed, force_params, **kwargs)
+        except BinanceAPIException as e:
+            if not signed or e.code != TIMESTAMP_ERROR_CODE:
+                raise
+            # -1021 means the exchange never processed the request, so one retry after a resync is safe
+            bot_logger.logger.warning(f"CLOCK: timestamp rejected ({e.message}) - resyncing and retrying once")
+            self.time_sync.resync()
+            return super()._request(method, uri, signed, force_params, **retry_kwargs)
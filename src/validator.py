@@ -2,16 +2,20 @@ import re
 from binance.client import Client
 from config import Config
 from logger import bot_logger
+from profiler import profiler
 
 class OrderValidator:
     def __init__(self, client: Client):
         self.client = client
         self.exchange_info = None
+        self._symbols = None  # Set of valid symbols, built once - bulk validation calls this a lot
+        self._filters = {}  # (filterType, field) -> {symbol: value}
         self._load_exchange_info()
     
     def _load_exchange_info(self):
         try:
-            self.exchange_info = self.client.futures_exchange_info()
+            with profiler.span('exchange_info'):
+                self.exchange_info = self.client.futures_exchange_info()
         except Exception as e:
             bot_logger.log_error("Failed to load exchange info", e)
     
@@ -23,8 +27,29 @@ class OrderValidator:
         if not self.exchange_info:
             return True  # Skip validation if exchange info unavailable
         
-        symbols = [s['symbol'] for s in self.exchange_info['symbols']]
-        return symbol in symbols
+        if self._symbols is None:
+            self._symbols = {s['symbol'] for s in self.exchange_info['symbols']}
+        return symbol in self._symbols
+    
+    def tick_size(self, symbol: str) -> float:
+        """Price increment for a symbol - None if exchange info is unavailable"""
+        return self._filter_value(symbol, 'PRICE_FILTER', 'tickSize')
+    
+    def step_size(self, symbol: str) -> float:
+        """Quantity increment for a symbol - None if exchange info is unavailable"""
+        return self._filter_value(symbol, 'LOT_SIZE', 'stepSize')
+    
+    def _filter_value(self, symbol: str, filter_type: str, field: str) -> float:
+        if not self.exchange_info:
+            return None
+        key = (filter_type, field)
+        if key not in self._filters:
+            self._filters[key] = {
+                s['symbol']: float(f[field])
+                for s in self.exchange_info['symbols']
+                for f in s.get('filters', []) if f['filterType'] == filter_type
+            }
+        return self._filters[key].get(symbol.upper())
     
     def validate_quantity(self, symbol: str, quantity: float) -> bool:
         if not isinstance(quantity, (int, float)) or quantity <= 0:
@@ -52,6 +77,10 @@ class OrderValidator:
         return order_type.upper() in valid_types
     
     def validate_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None) -> tuple:
+        with profiler.span('validation'):
+            return self._validate_order(symbol, side, order_type, quantity, price)
+    
+    def _validate_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None) -> tuple:
         errors = []
         
         if not self.validate_symbol(symbol):